@@ -1,9 +1,36 @@
+from django.conf import settings
 from django.contrib import admin
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django.contrib import messages
-from .models import Artists, Labels, Albums, ArtistLabels, AlbumCollabs, Categories, Puzzle, GameSubmission
-from .utils import update_artist_image
-from .constants import COUNTRY_CONTINENTS, COUNTRY_SUBREGIONS, GENRE_MAPPING
+from django.db.models import Q
+from django.urls import reverse
+from .models import (
+    Artists, Labels, Albums, ArtistLabels, AlbumCollabs, Categories, Puzzle, GameSubmission, ImageRefreshJob
+)
+from .image_jobs import cancel_jobs, enqueue_image_refresh
+from .constants import GENRE_MAPPING
+from .logic import PuzzleManager
+
+
+# Every category in GENRE_MAPPING, and the genres that reach a category only as a
+# secondary mapping (e.g. K-pop -> ['K-Pop', 'Pop'] counts towards Pop)
+GENRE_CATEGORIES = sorted({
+    category
+    for mapped in GENRE_MAPPING.values()
+    for category in (mapped if isinstance(mapped, list) else [mapped])
+})
+
+
+def _secondary_genres():
+    secondary = {}
+    for genre, mapped in GENRE_MAPPING.items():
+        if isinstance(mapped, list):
+            for category in mapped[1:]:
+                secondary.setdefault(category, []).append(genre)
+    return secondary
+
+
+SECONDARY_GENRES = _secondary_genres()
 
 
 # Custom Admin Filters
@@ -48,30 +75,16 @@ class GenreCategoryFilter(admin.SimpleListFilter):
     parameter_name = 'genre_category'
 
     def lookups(self, request, model_admin):
-        # Get unique genre categories from the GENRE_MAPPING
-        genre_categories = set()
-        for original_genre, mapped_genre in GENRE_MAPPING.items():
-            if isinstance(mapped_genre, list):
-                genre_categories.update(mapped_genre)
-            else:
-                genre_categories.add(mapped_genre)
-        
-        # Sort and return as choices
-        return [(category, category) for category in sorted(genre_categories)]
+        return [(category, category) for category in GENRE_CATEGORIES]
 
     def queryset(self, request, queryset):
         if self.value():
-            # Find all original genres that map to this category
-            matching_genres = []
-            for original_genre, mapped_genre in GENRE_MAPPING.items():
-                if isinstance(mapped_genre, list):
-                    if self.value() in mapped_genre:
-                        matching_genres.append(original_genre)
-                else:
-                    if mapped_genre == self.value():
-                        matching_genres.append(original_genre)
-            
-            return queryset.filter(spotify_primary_genre__in=matching_genres)
+            # genre_category holds the first mapped category; genres mapped to
+            # several categories also count towards the later ones
+            matches = Q(genre_category=self.value())
+            if self.value() in SECONDARY_GENRES:
+                matches |= Q(spotify_primary_genre__in=SECONDARY_GENRES[self.value()])
+            return queryset.filter(matches)
         return queryset
 
 
@@ -92,12 +105,7 @@ class ContinentFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         if self.value():
-            # Find all countries that belong to this continent
-            matching_countries = [
-                country for country, continent in COUNTRY_CONTINENTS.items()
-                if continent == self.value()
-            ]
-            return queryset.filter(origin_country__in=matching_countries)
+            return queryset.filter(continent=self.value())
         return queryset
 
 
@@ -149,12 +157,7 @@ class SubregionFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         if self.value():
-            # Find all countries that belong to this sub-region
-            matching_countries = [
-                country for country, subregion in COUNTRY_SUBREGIONS.items()
-                if subregion == self.value()
-            ]
-            return queryset.filter(origin_country__in=matching_countries)
+            return queryset.filter(subregion=self.value())
         return queryset
 
 # Register your models here.
@@ -221,14 +224,8 @@ class ArtistsAdmin(admin.ModelAdmin):
     def image_preview(self, obj):
         """Display a larger preview of the artist image in the detail view"""
         try:
-            # Try cached image first, fallback to live fetch for detail view only
-            image_url = obj.cached_image_url
-            if not image_url:
-                # Only fetch live image in detail view, not list view
-                try:
-                    image_url = obj.image  # This will trigger automatic fetching
-                except Exception:
-                    pass
+            # Stale or missing images are queued for a background refresh
+            image_url = obj.image
             
             if image_url:
                 return format_html(
@@ -241,33 +238,18 @@ class ArtistsAdmin(admin.ModelAdmin):
     image_preview.short_description = "Auto-Generated Image Preview"
 
     def refresh_images_from_spotify(self, request, queryset):
-        """Admin action to force refresh images for selected artists"""
-        updated_count = 0
-        error_count = 0
-        
-        for artist in queryset:
-            try:
-                from .utils import update_artist_image
-                if update_artist_image(artist):
-                    updated_count += 1
-            except Exception as e:
-                error_count += 1
-                
-        if updated_count > 0:
-            messages.success(
-                request,
-                f"Successfully refreshed images for {updated_count} artist(s)."
-            )
-        if error_count > 0:
-            messages.error(
-                request,
-                f"Failed to refresh images for {error_count} artist(s)."
-            )
-        if updated_count == 0 and error_count == 0:
-            messages.info(
-                request,
-                "No new images found or no updates needed."
+        """Admin action to force refresh images for selected artists in the background"""
+        job = enqueue_image_refresh(queryset, user=request.user)
+        url = reverse('admin:main_imagerefreshjob_change', args=[job.pk])
+        messages.info(
+            request,
+            format_html(
+                'Queued an image refresh for {} artist(s). <a href="{}">Follow its progress</a>.{}',
+                job.total, url,
+                '' if getattr(settings, 'IMAGE_JOB_IN_PROCESS', False)
+                else ' It starts once `manage.py run_image_jobs` picks it up.'
             )
+        )
     
     refresh_images_from_spotify.short_description = "Force refresh images from Spotify"
 
@@ -305,9 +287,14 @@ class CategoriesAdmin(admin.ModelAdmin):
     
 @admin.register(Puzzle)
 class PuzzleAdmin(admin.ModelAdmin):
-    list_display = ['puzzle_date', 'is_active', 'row_categories', 'col_categories']
+    list_display = ['puzzle_date', 'is_active', 'row_categories', 'col_categories', 'fewest_solutions']
     list_filter = ['is_active', 'puzzle_date']
     date_hierarchy = 'puzzle_date'
+    readonly_fields = ['solution_counts']
+    list_select_related = [
+        'category_row_1', 'category_row_2', 'category_row_3',
+        'category_col_1', 'category_col_2', 'category_col_3',
+    ]
     
     fieldsets = (
         ('Puzzle Date', {
@@ -319,6 +306,10 @@ class PuzzleAdmin(admin.ModelAdmin):
         ('Column Categories', {
             'fields': ('category_col_1', 'category_col_2', 'category_col_3')
         }),
+        ('Solutions', {
+            'fields': ('solution_counts',),
+            'description': 'Valid artists per cell, from the in-memory artist index.'
+        }),
         ('Creator Picks (Optional)', {
             'fields': (
                 ('creator_pick_1_1', 'creator_pick_1_2', 'creator_pick_1_3'),
@@ -335,9 +326,92 @@ class PuzzleAdmin(admin.ModelAdmin):
     def col_categories(self, obj):
         return f"{obj.category_col_1.display_name} | {obj.category_col_2.display_name} | {obj.category_col_3.display_name}"
 
+    def fewest_solutions(self, obj):
+        """Smallest number of valid artists in any cell"""
+        return min(PuzzleManager.get_solution_counts(obj).values())
+    fewest_solutions.short_description = "Min. answers"
+
+    def solution_counts(self, obj):
+        """3x3 grid of valid artist counts for the saved categories"""
+        if not obj.pk:
+            return "Save the puzzle to see solution counts"
+        counts = PuzzleManager.get_solution_counts(obj)
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td></tr>',
+            ([counts[f"{row},{col}"] for col in range(1, 4)] for row in range(1, 4))
+        )
+        return format_html('<table>{}</table>', rows)
+    solution_counts.short_description = "Valid artists per cell"
+
 @admin.register(GameSubmission)
 class GameSubmissionAdmin(admin.ModelAdmin):
     list_display = ['user_id', 'puzzle', 'cell_index', 'selected_artist', 'timestamp']
     list_filter = ['puzzle__puzzle_date', 'cell_index']
     search_fields = ['user_id', 'selected_artist__name']
-    readonly_fields = ['timestamp']
\ No newline at end of file
+    readonly_fields = ['timestamp']
+
+
+@admin.register(ImageRefreshJob)
+class ImageRefreshJobAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'requested_by', 'status_label', 'progress', 'updated', 'failed', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = [
+        'status', 'progress', 'total', 'processed', 'updated', 'failed', 'cancel_requested', 'error',
+        'requested_by', 'created_at', 'started_at', 'heartbeat_at', 'finished_at',
+    ]
+    exclude = ['artist_ids']
+    actions = ['cancel_selected_jobs']
+    # Both templates reload the page every few seconds while a job is active
+    change_list_template = 'admin/main/imagerefreshjob/change_list.html'
+    change_form_template = 'admin/main/imagerefreshjob/change_form.html'
+    auto_refresh_seconds = 3
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        # Viewable only; jobs are changed by the worker and the cancel action
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('artist_ids').select_related('requested_by')
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        if ImageRefreshJob.objects.filter(status__in=ImageRefreshJob.ACTIVE_STATUSES).exists():
+            extra_context['auto_refresh_seconds'] = self.auto_refresh_seconds
+        return super().changelist_view(request, extra_context)
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        extra_context = extra_context or {}
+        if ImageRefreshJob.objects.filter(pk=object_id, status__in=ImageRefreshJob.ACTIVE_STATUSES).exists():
+            extra_context['auto_refresh_seconds'] = self.auto_refresh_seconds
+        return super().change_view(request, object_id, form_url, extra_context)
+
+    def status_label(self, obj):
+        if obj.status == 'running' and obj.cancel_requested:
+            return "Cancelling"
+        return obj.get_status_display()
+    status_label.short_description = "Status"
+
+    def progress(self, obj):
+        """Processed artists as a bar and a count"""
+        percent = round(100 * obj.processed / obj.total) if obj.total else 100
+        return format_html(
+            '<progress max="100" value="{}" style="width: 120px;"></progress> {}/{} ({}%)',
+            percent, obj.processed, obj.total, percent
+        )
+    progress.short_description = "Progress"
+
+    def cancel_selected_jobs(self, request, queryset):
+        """Admin action to stop pending or running jobs"""
+        count = cancel_jobs(queryset)
+        if count:
+            messages.success(
+                request,
+                f"Cancelled {count} job(s). Running jobs stop after their current batch; "
+                f"jobs whose worker stopped reporting are cancelled straight away."
+            )
+        else:
+            messages.info(request, "No pending or running jobs selected.")
+    cancel_selected_jobs.short_description = "Cancel selected jobs"
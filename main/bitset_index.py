@@ -0,0 +1,161 @@
+"""
+In-memory bitset index of artist attributes
+Each category is stored as one int bitmask over artist ordinals, so "which artists
+satisfy row X and column Y" is a single AND plus a popcount
+"""
+from django.conf import settings
+from django.utils import timezone
+from .models import Artists, Categories
+from .predicates import get_category_predicate
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _bits_from_ordinals(ordinals, size):
+    bitmap = bytearray((size + 7) // 8)
+    for ordinal in ordinals:
+        bitmap[ordinal >> 3] |= 1 << (ordinal & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+class ArtistBitsetIndex:
+    """
+    Process-local index: artist ordinals plus one bitset per category.
+
+    The index is rebuilt from the database when it is older than
+    ARTIST_INDEX_TTL seconds (other processes may have changed the catalog) and is
+    updated incrementally by signals for changes made in this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.ordinals = {}      # artist id -> bit position
+            self.artist_ids = []    # bit position -> artist id (None once deleted)
+            self.bitsets = {}       # category id -> int bitmask
+            self.built_at = None
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def is_expired(self):
+        ttl = getattr(settings, 'ARTIST_INDEX_TTL', 300)
+        return not self.is_built or (timezone.now() - self.built_at).total_seconds() > ttl
+
+    def build(self):
+        """
+        Build the index from the Artists table and all active categories
+        """
+        artists = list(Artists.objects.all())
+        categories = list(Categories.objects.filter(is_active=True))
+        with self._lock:
+            self.ordinals = {artist.id: ordinal for ordinal, artist in enumerate(artists)}
+            self.artist_ids = [artist.id for artist in artists]
+            self.bitsets = {
+                category.pk: self._compute_category(category, artists)
+                for category in categories
+            }
+            self.built_at = timezone.now()
+        logger.info(f"Built artist bitset index: {len(artists)} artists, {len(categories)} categories")
+        return self
+
+    def ensure_built(self):
+        if self.is_expired():
+            self.build()
+        return self
+
+    def _compute_category(self, category, artists=None):
+        predicate = get_category_predicate(category)
+        if predicate.error:
+            return 0
+
+        if predicate.in_memory:
+            if artists is None:
+                artists = Artists.objects.all()
+            matching = (artist.id for artist in artists if predicate.matches(artist))
+        else:
+            matching = Artists.objects.filter(predicate.q).values_list('id', flat=True).distinct()
+
+        ordinals = [self.ordinals[artist_id] for artist_id in matching if artist_id in self.ordinals]
+        return _bits_from_ordinals(ordinals, len(self.artist_ids))
+
+    def category_bits(self, category):
+        """
+        Bitset for a category; inactive categories are indexed on first use
+        """
+        bits = self.bitsets.get(category.pk)
+        if bits is None:
+            with self._lock:
+                bits = self.bitsets[category.pk] = self._compute_category(category)
+        return bits
+
+    def cell_bits(self, row_category, column_category):
+        return self.category_bits(row_category) & self.category_bits(column_category)
+
+    def cell_count(self, row_category, column_category):
+        return self.cell_bits(row_category, column_category).bit_count()
+
+    def artist_ids_for_bits(self, bits):
+        artist_ids = []
+        bitmap = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+        for byte_index, byte in enumerate(bitmap):
+            while byte:
+                lowest = byte & -byte
+                artist_ids.append(self.artist_ids[(byte_index << 3) + lowest.bit_length() - 1])
+                byte ^= lowest
+        return artist_ids
+
+    def cell_artist_ids(self, row_category, column_category):
+        return self.artist_ids_for_bits(self.cell_bits(row_category, column_category))
+
+    def update_artist(self, artist):
+        """
+        Recompute one artist's bit in every indexed category
+        """
+        with self._lock:
+            ordinal = self.ordinals.get(artist.id)
+            if ordinal is None:
+                ordinal = self.ordinals[artist.id] = len(self.artist_ids)
+                self.artist_ids.append(artist.id)
+            bit = 1 << ordinal
+
+            for category in Categories.objects.filter(pk__in=list(self.bitsets)):
+                if get_category_predicate(category).matches(artist):
+                    self.bitsets[category.pk] |= bit
+                else:
+                    self.bitsets[category.pk] &= ~bit
+
+    def remove_artist(self, artist_id):
+        with self._lock:
+            ordinal = self.ordinals.pop(artist_id, None)
+            if ordinal is None:
+                return
+            self.artist_ids[ordinal] = None
+            mask = ~(1 << ordinal)
+            for category_id in self.bitsets:
+                self.bitsets[category_id] &= mask
+
+    def update_category(self, category):
+        with self._lock:
+            if category.is_active or category.pk in self.bitsets:
+                self.bitsets[category.pk] = self._compute_category(category)
+
+    def remove_category(self, category_id):
+        with self._lock:
+            self.bitsets.pop(category_id, None)
+
+
+artist_index = ArtistBitsetIndex()
+
+
+def get_artist_index():
+    """
+    Return the process-wide index, (re)building it if missing or expired
+    """
+    return artist_index.ensure_built()
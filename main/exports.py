@@ -0,0 +1,127 @@
+"""
+Streaming export of game submissions
+Rows are read with keyset pagination on (timestamp, id), so each page is an index
+range scan and memory stays flat however many rows are exported. Output is NDJSON
+or CSV, optionally gzipped on the fly.
+"""
+from datetime import datetime, time, timezone as dt_timezone
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import GameSubmission
+import csv
+import io
+import json
+import uuid
+import zlib
+
+EXPORT_FIELDS = ['id', 'user_id', 'puzzle_id', 'cell_index', 'selected_artist_id', 'is_correct', 'timestamp']
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+# Bytes of output collected before each write/compress call
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def parse_bound(value, end_of_day=False):
+    """
+    Aware datetime from an ISO date or datetime; bare dates cover the whole day
+    """
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"Invalid date or datetime: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
+def parse_puzzle_id(value):
+    """
+    UUID from a puzzle ID string, raising ValueError for anything else
+    """
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise ValueError(f"Invalid puzzle ID: {value}")
+
+
+def iter_submissions(puzzle_id=None, since=None, until=None, batch_size=2000):
+    """
+    Iterator over submission rows as dicts in (timestamp, id) order, one keyset
+    page at a time. The filters are checked here, before any row is streamed, so
+    a bad puzzle ID raises ValueError instead of failing mid-response.
+    """
+    queryset = GameSubmission.objects.order_by('timestamp', 'id')
+    if puzzle_id:
+        queryset = queryset.filter(puzzle_id=parse_puzzle_id(puzzle_id))
+    if since:
+        queryset = queryset.filter(timestamp__gte=since)
+    if until:
+        queryset = queryset.filter(timestamp__lte=until)
+    return _keyset_rows(queryset.values(*EXPORT_FIELDS), batch_size)
+
+
+def _keyset_rows(queryset, batch_size):
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(
+                Q(timestamp__gt=last['timestamp']) | Q(timestamp=last['timestamp'], id__gt=last['id'])
+            )
+        count = 0
+        for row in page[:batch_size].iterator(chunk_size=batch_size):
+            count += 1
+            last = row
+            yield row
+        if count < batch_size:
+            return
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + '\n'
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_chunks(rows, output='ndjson', compress=False):
+    """
+    Encode rows as NDJSON or CSV and yield byte chunks of about
+    STREAM_BUFFER_SIZE, gzipped if `compress` is set
+    """
+    lines = _csv_lines(rows) if output == 'csv' else _ndjson_lines(rows)
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= STREAM_BUFFER_SIZE:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,203 @@
+"""
+Background image refresh jobs
+The admin action records an ImageRefreshJob and returns. The run_image_jobs
+command, as a long-running worker or from cron with --once, claims the job and
+refreshes its artists in batches through the multi-artist Spotify endpoint,
+saving progress after each batch so the admin can follow it or cancel it.
+
+A job whose worker dies (e.g. a deploy or a killed process) stops sending
+heartbeats; after IMAGE_JOB_STALE_SECONDS run_image_jobs reclaims it and resumes
+from its last saved batch. Long-lived servers can set IMAGE_JOB_IN_PROCESS to
+also run jobs on a thread of the web process. Serverless deployments must not:
+the thread is frozen once the response is sent.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Artists, ImageRefreshJob
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_worker = None
+_worker_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def enqueue_image_refresh(queryset, user=None):
+    """
+    Create a job for the artists in `queryset` and, if IMAGE_JOB_IN_PROCESS is
+    set, wake the in-process worker once the job is committed
+    """
+    artist_ids = [str(pk) for pk in queryset.order_by('roster_number', 'pk').values_list('pk', flat=True)]
+    job = ImageRefreshJob.objects.create(
+        artist_ids=artist_ids,
+        total=len(artist_ids),
+        requested_by=user if user is not None and user.is_authenticated else None,
+    )
+    if getattr(settings, 'IMAGE_JOB_IN_PROCESS', False):
+        transaction.on_commit(start_worker)
+    return job
+
+
+def cancel_jobs(queryset):
+    """
+    Cancel pending jobs, and running ones whose worker has stopped reporting,
+    outright; ask live running jobs to stop after their current batch. Returns
+    the number of jobs affected.
+    """
+    now = timezone.now()
+    stale = Q(status='running', heartbeat_at__lt=now - _stale_after())
+    cancelled = queryset.filter(Q(status='pending') | stale).update(
+        status='cancelled', cancel_requested=True, finished_at=now
+    )
+    requested = queryset.filter(status='running', cancel_requested=False).update(cancel_requested=True)
+    return cancelled + requested
+
+
+def _stale_after():
+    return timedelta(seconds=getattr(settings, 'IMAGE_JOB_STALE_SECONDS', 300))
+
+
+def start_worker():
+    """
+    Make sure this process has a worker thread that will look for new jobs
+    """
+    global _worker
+    with _worker_lock:
+        _wake.set()
+        if _worker is None:
+            _worker = threading.Thread(target=_run_worker, name='image-jobs', daemon=True)
+            _worker.start()
+
+
+def _run_worker():
+    global _worker
+    try:
+        while True:
+            _wake.clear()
+            process_pending_jobs()
+            # Jobs enqueued while we were busy set _wake; otherwise stop
+            with _worker_lock:
+                if not _wake.is_set():
+                    _worker = None
+                    return
+    except Exception as e:
+        logger.error(f"Image refresh worker stopped: {e}")
+        with _worker_lock:
+            _worker = None
+    finally:
+        close_old_connections()
+
+
+def process_pending_jobs():
+    """
+    Run claimable jobs until there are none left; returns how many were run
+    """
+    count = 0
+    while True:
+        job = claim_next_job()
+        if job is None:
+            return count
+        try:
+            run_job(job)
+        except Exception as e:
+            logger.error(f"Image refresh job {job.pk} failed: {e}")
+            _finish(job, 'failed', error=str(e))
+        count += 1
+
+
+def claim_next_job():
+    """
+    Claim the oldest pending job, or a running one whose worker stopped reporting
+    (e.g. the process was recycled), which then resumes where it left off. The
+    returned job's `resumed` flag says which of the two it was.
+    """
+    stale_after = _stale_after()
+    while True:
+        now = timezone.now()
+        claimable = ImageRefreshJob.objects.filter(
+            Q(status='pending') | Q(status='running', heartbeat_at__lt=now - stale_after)
+        )
+        job = claimable.order_by('created_at').first()
+        if job is None:
+            return None
+        # Conditional update so two workers can't claim the same job
+        claimed = claimable.filter(pk=job.pk, heartbeat_at=job.heartbeat_at).update(
+            status='running', started_at=job.started_at or now, heartbeat_at=now
+        )
+        if claimed:
+            resumed = job.status == 'running'
+            job.refresh_from_db()
+            job.resumed = resumed
+            return job
+
+
+def run_job(job):
+    """
+    Refresh a claimed job's remaining artists, one Spotify request per batch
+    """
+    from .logic import PuzzleManager
+    from .utils import MAX_ARTISTS_PER_REQUEST, RateLimiter, fetch_artist_images_batch, get_spotify_client
+
+    sp = get_spotify_client(retries=False)
+    if sp is None:
+        _finish(job, 'failed', error="Spotify client unavailable")
+        return
+
+    rate_limiter = RateLimiter(getattr(settings, 'IMAGE_REFRESH_RATE', 2))
+    jobs = ImageRefreshJob.objects.filter(pk=job.pk)
+
+    for start in range(job.processed, len(job.artist_ids), MAX_ARTISTS_PER_REQUEST):
+        if jobs.filter(cancel_requested=True).exists():
+            _finish(job, 'cancelled')
+            return
+
+        batch_ids = job.artist_ids[start:start + MAX_ARTISTS_PER_REQUEST]
+        artists = [
+            artist for artist in Artists.objects.filter(pk__in=batch_ids).only('id', 'spotify_id', 'cached_image_url')
+            if artist.spotify_id
+        ]
+        updated = failed = 0
+        if artists:
+            try:
+                images = fetch_artist_images_batch(
+                    list({artist.spotify_id for artist in artists}), sp, rate_limiter
+                )
+            except Exception as e:
+                logger.error(f"Image refresh job {job.pk}: batch of {len(artists)} artist(s) failed: {e}")
+                failed = len(artists)
+            else:
+                now = timezone.now()
+                changed = []
+                for artist in artists:
+                    new_image_url = images.get(artist.spotify_id)
+                    if new_image_url and new_image_url != artist.cached_image_url:
+                        artist.cached_image_url = new_image_url
+                        artist.image_last_updated = now
+                        changed.append(artist)
+                Artists.objects.bulk_update(changed, ['cached_image_url', 'image_last_updated'])
+                for artist in changed:
+                    PuzzleManager.invalidate_artist_cache(artist.pk)
+                updated = len(changed)
+
+        jobs.update(
+            processed=F('processed') + len(batch_ids),
+            updated=F('updated') + updated,
+            failed=F('failed') + failed,
+            heartbeat_at=timezone.now(),
+        )
+        logger.info(f"Image refresh job {job.pk}: {start + len(batch_ids)}/{job.total} processed")
+
+    _finish(job, 'completed')
+
+
+def _finish(job, status, error=''):
+    # A job cancelled as stale while this worker was still busy stays cancelled
+    ImageRefreshJob.objects.filter(pk=job.pk, status='running').update(
+        status=status, error=error, finished_at=timezone.now()
+    )
+    job.refresh_from_db()
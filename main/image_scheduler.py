@@ -0,0 +1,114 @@
+"""
+Background refresh of stale artist images
+Request paths serve cached_image_url immediately and queue stale artists here. With
+IMAGE_REFRESH_IN_PROCESS set, a daemon thread refreshes them in batches through the
+multi-artist Spotify endpoint; otherwise the queue is off and stale images are
+refreshed by `manage.py update_artist_images --stale` on a schedule.
+"""
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ImageRefreshScheduler:
+    """
+    Deduplicating queue of artists whose cached image needs refreshing, drained by
+    a single lazily started worker thread
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {
+            'stale_served': 0,
+            'queued': 0,
+            'refreshed': 0,
+            'failed': 0,
+        }
+
+    def record_stale_served(self):
+        with self._lock:
+            self.stats['stale_served'] += 1
+
+    def enqueue(self, artist_id, spotify_id):
+        """
+        Queue an artist for refresh; returns False if it is already queued or
+        the in-process refresher is disabled
+        """
+        if not getattr(settings, 'IMAGE_REFRESH_IN_PROCESS', False):
+            return False
+        with self._lock:
+            if artist_id in self._pending:
+                return False
+            self._pending.add(artist_id)
+            self.stats['queued'] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='image-refresh', daemon=True)
+                self._thread.start()
+        self._queue.put((artist_id, spotify_id))
+        return True
+
+    def _next_batch(self):
+        from .utils import MAX_ARTISTS_PER_REQUEST
+
+        batch = [self._queue.get()]
+        wait = getattr(settings, 'IMAGE_REFRESH_BATCH_WAIT', 0.5)
+        while len(batch) < MAX_ARTISTS_PER_REQUEST:
+            try:
+                batch.append(self._queue.get(timeout=wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        from .utils import RateLimiter, fetch_artist_images_batch, get_spotify_client
+
+        rate_limiter = RateLimiter(getattr(settings, 'IMAGE_REFRESH_RATE', 2))
+        sp = None
+        while True:
+            batch = self._next_batch()
+            try:
+                if sp is None:
+                    sp = get_spotify_client(retries=False)
+                if sp is None:
+                    raise RuntimeError("Spotify client unavailable")
+                self._refresh(batch, sp, rate_limiter, fetch_artist_images_batch)
+            except Exception as e:
+                with self._lock:
+                    self.stats['failed'] += len(batch)
+                logger.error(f"Background image refresh failed for {len(batch)} artist(s): {e}")
+            finally:
+                with self._lock:
+                    self._pending.difference_update(artist_id for artist_id, spotify_id in batch)
+                close_old_connections()
+
+    def _refresh(self, batch, sp, rate_limiter, fetch_artist_images_batch):
+        from .models import Artists
+
+        spotify_ids = list({spotify_id for artist_id, spotify_id in batch})
+        images = fetch_artist_images_batch(spotify_ids, sp, rate_limiter)
+
+        now = timezone.now()
+        artists = [
+            Artists(pk=artist_id, cached_image_url=images[spotify_id], image_last_updated=now)
+            for artist_id, spotify_id in batch
+            if images.get(spotify_id)
+        ]
+        Artists.objects.bulk_update(artists, ['cached_image_url', 'image_last_updated'])
+        # Artists without a Spotify image keep their URL but aren't re-queued until stale again
+        Artists.objects.filter(
+            pk__in=[artist_id for artist_id, spotify_id in batch if not images.get(spotify_id)]
+        ).update(image_last_updated=now)
+        with self._lock:
+            self.stats['refreshed'] += len(artists)
+        logger.info(f"Refreshed {len(artists)} artist image(s) in the background")
+
+
+image_scheduler = ImageRefreshScheduler()
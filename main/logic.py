@@ -1,6 +1,15 @@
-from .models import Artists, Puzzle, GameSubmission
+from .models import Artists, Categories, Puzzle, PuzzleCellAnswer, GameSubmission, CellPickCount, CellStats
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
+from datetime import datetime, time, timedelta
+import hashlib
 import json
+from .predicates import get_category_predicate
+from .bitset_index import get_artist_index
 
 class GameValidator:
     @staticmethod
@@ -20,65 +29,65 @@ class GameValidator:
     
     @staticmethod
     def _validate_artist_category(artist, category):
-        if category.validation_logic:
-            try:
-                logic = json.loads(category.validation_logic)
-                field = logic["field"]
-                lookup = logic["lookup"]
-                value = logic["value"]
-                filter_expr = {f"{field}__{lookup}": value}
-                if Artists.objects.filter(pk=artist.pk, **filter_expr).exists():
-                    return True, "Artist matches validation logic"
-                else:
-                    return False, f"Artist does not match logic: {filter_expr}"
-            except Exception as e:
-                return False, f"Invalid validation_logic: {e}"
-
-        field = category.validation_field
-        value = category.validation_value
-
-        # Get the value from the artist dynamically
-        artist_value = getattr(artist, field, None)
-        if artist_value is None:
-            return False, f"Artist does not have field {field}"
-
-        # For boolean fields
-        if isinstance(artist_value, bool):
-            expected = value.lower() == "true"
-            return artist_value == expected, f"Expected {expected}, got {artist_value}"
-
-        # For other types (string, int, etc.)
-        return str(artist_value) == str(value), f"Expected {value}, got {artist_value}"
+        """
+        Check one category using its compiled predicate (no JSON parsing or queries
+        for predicates that can be evaluated in memory).
+        """
+        return get_category_predicate(category).evaluate(artist)
     
     @staticmethod
     def get_valid_artists_for_cell(row_category, column_category):
         """
         Get all artists that are valid for both row and column categories.
+        Both predicates are pushed into a single query; only checks that have no
+        Q equivalent are evaluated in Python over the pre-filtered rows.
         """
-        artists = Artists.objects.all()
-        valid_artists = []
+        queryset = Artists.objects.all()
+        in_memory = []
+        distinct = False
+
+        for category in (row_category, column_category):
+            predicate = get_category_predicate(category)
+            if predicate.error:
+                return Artists.objects.none()
+            if predicate.pushdown:
+                queryset = queryset.filter(predicate.q)
+                distinct = distinct or predicate.joins
+            else:
+                in_memory.append(predicate)
+
+        if distinct:
+            queryset = queryset.distinct()
 
-        for artist in artists:
-            is_valid, reason = GameValidator.validate_artist_for_categories(artist, row_category, column_category)
-            if is_valid:
-                valid_artists.append(artist.id)
+        if not in_memory:
+            return queryset
 
+        valid_artists = [
+            artist.id for artist in queryset
+            if all(predicate.matches(artist) for predicate in in_memory)
+        ]
         return Artists.objects.filter(id__in=valid_artists)
 
     @staticmethod
     def calculate_uniq_score(user_submissions, puzzle):
         """
         Calculate the unique score for a user based on their submissions.
+        Pick counts for all cells come from one read of the counter table.
         """
+        user_submissions = list(user_submissions)
+        pick_counts = {
+            (counter.cell_index, counter.selected_artist_id): counter.count
+            for counter in CellPickCount.objects.filter(
+                puzzle=puzzle,
+                selected_artist_id__in={submission.selected_artist_id for submission in user_submissions}
+            )
+        }
+
         total_score = 0
         total_cells = 0
         
         for submission in user_submissions:
-            same_picks = GameSubmission.objects.filter(
-                puzzle=puzzle,
-                cell_index=submission.cell_index,
-                selected_artist=submission.selected_artist
-            ).count()
+            same_picks = pick_counts.get((submission.cell_index, submission.selected_artist_id), 0)
 
             cell_score = max(1, 100 - (same_picks * 5))
             total_score += cell_score
@@ -86,7 +95,269 @@ class GameValidator:
 
         return round(total_score / total_cells, 2) if total_cells > 0 else 0
     
+
+CELL_INDEXES = [f"{row},{col}" for row in range(1, 4) for col in range(1, 4)]
+PUZZLE_CATEGORY_FIELDS = [
+    'category_row_1', 'category_row_2', 'category_row_3',
+    'category_col_1', 'category_col_2', 'category_col_3',
+]
+
+
+def _percentage(part, total):
+    return round(part * 100 / total, 2) if total else 0.0
+
+
+def cache_timeout(seconds):
+    """
+    `seconds`, capped at LOCAL_CACHE_MAX_TIMEOUT when the default cache lives in
+    process memory: other workers never see our invalidations, so their copies
+    must expire soon on their own
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend == 'django.core.cache.backends.locmem.LocMemCache':
+        return min(seconds, getattr(settings, 'LOCAL_CACHE_MAX_TIMEOUT', 30))
+    return seconds
+
+
 class PuzzleManager:
+    @staticmethod
+    def get_cell_categories(puzzle, cell_index):
+        """
+        Returns the (row, column) categories for a '1,1'-style cell index
+        """
+        row, col = map(int, cell_index.split(','))
+        row_categories = [puzzle.category_row_1, puzzle.category_row_2, puzzle.category_row_3]
+        column_categories = [puzzle.category_col_1, puzzle.category_col_2, puzzle.category_col_3]
+        return row_categories[row - 1], column_categories[col - 1]
+
+    @staticmethod
+    def build_answer_sets(puzzle, index=None):
+        """
+        Materialize the valid artist IDs for all 9 cells of a puzzle. Callers that
+        hold a freshly built ArtistBitsetIndex can pass it to skip the cell queries.
+        """
+        answers = []
+        for cell_index in CELL_INDEXES:
+            row_category, column_category = PuzzleManager.get_cell_categories(puzzle, cell_index)
+            if index is not None:
+                artist_ids = index.cell_artist_ids(row_category, column_category)
+            else:
+                artist_ids = GameValidator.get_valid_artists_for_cell(
+                    row_category, column_category
+                ).values_list('id', flat=True)
+            answers.extend(
+                PuzzleCellAnswer(puzzle=puzzle, cell_index=cell_index, artist_id=artist_id)
+                for artist_id in artist_ids
+            )
+
+        built_at = timezone.now()
+        with transaction.atomic():
+            PuzzleCellAnswer.objects.filter(puzzle=puzzle).delete()
+            PuzzleCellAnswer.objects.bulk_create(answers, batch_size=1000)
+            Puzzle.objects.filter(pk=puzzle.pk).update(answers_built_at=built_at)
+        puzzle.answers_built_at = built_at
+        PuzzleManager.invalidate_puzzle_cache([puzzle.pk])
+        return len(answers)
+
+    @staticmethod
+    def ensure_answer_sets(puzzle):
+        """
+        Build the answer sets if they are missing or were marked stale
+        """
+        if puzzle.answers_built_at is None:
+            PuzzleManager.build_answer_sets(puzzle)
+
+    @staticmethod
+    def is_valid_answer(puzzle, cell_index, artist_id):
+        """
+        Indexed membership lookup against the materialized answer set
+        """
+        PuzzleManager.ensure_answer_sets(puzzle)
+        return PuzzleCellAnswer.objects.filter(
+            puzzle=puzzle, cell_index=cell_index, artist_id=artist_id
+        ).exists()
+
+    @staticmethod
+    def check_answer(puzzle, cell_index, artist, answers=None):
+        """
+        Returns (is_valid, reason). The materialized answer set decides; the compiled
+        predicates only explain a miss.
+        """
+        if answers is None:
+            answers = PuzzleManager.get_cached_answer_sets(puzzle)
+        if artist.id in answers[cell_index]:
+            return True, "Artist is valid for both row and column categories."
+        row_category, column_category = PuzzleManager.get_cell_categories(puzzle, cell_index)
+        matches, reason = GameValidator.validate_artist_for_categories(artist, row_category, column_category)
+        if matches:
+            reason = "Artist is not in the answer set for this cell."
+        return False, reason
+
+    @staticmethod
+    def get_valid_artists(puzzle, cell_index):
+        """
+        All artists in the materialized answer set for a cell
+        """
+        PuzzleManager.ensure_answer_sets(puzzle)
+        return Artists.objects.filter(
+            puzzle_answers__puzzle=puzzle, puzzle_answers__cell_index=cell_index
+        )
+
+    @staticmethod
+    def get_solution_counts(puzzle):
+        """
+        Number of valid artists per cell, answered from the in-memory bitset index
+        """
+        index = get_artist_index()
+        return {
+            cell_index: index.cell_count(*PuzzleManager.get_cell_categories(puzzle, cell_index))
+            for cell_index in CELL_INDEXES
+        }
+
+    @staticmethod
+    def get_pick_rates(puzzle):
+        """
+        Rarity of every pick per cell. Totals come from CellStats and counts from
+        the pick counters, the same sources as get_puzzle_stats, so the two agree.
+        """
+        totals = dict(CellStats.objects.filter(puzzle=puzzle).values_list('cell_index', 'total_guesses'))
+        counters = CellPickCount.objects.filter(puzzle=puzzle, count__gt=0).order_by('cell_index', '-count')
+        cells = {cell_index: [] for cell_index in CELL_INDEXES}
+        for counter in counters.values('cell_index', 'selected_artist_id', 'count'):
+            cells.setdefault(counter['cell_index'], []).append(counter)
+
+        rates = {}
+        for cell_index, picks in cells.items():
+            total = totals.get(cell_index, 0)
+            rates[cell_index] = {
+                'total_picks': total,
+                'picks': [
+                    {
+                        'artist_id': pick['selected_artist_id'],
+                        'count': pick['count'],
+                        'percentage': _percentage(pick['count'], total),
+                    }
+                    for pick in picks
+                ],
+            }
+        return rates
+
+    @staticmethod
+    def get_puzzle_stats(puzzle, top=5):
+        """
+        Per-cell guess totals, accuracy, distinct answers and the `top` most picked
+        artists, read from the CellStats and CellPickCount aggregates
+        """
+        cells = {
+            cell_index: {
+                'total_guesses': 0, 'correct_guesses': 0, 'percent_correct': 0.0,
+                'distinct_answers': 0, 'top_picks': [],
+            }
+            for cell_index in CELL_INDEXES
+        }
+        for stats in CellStats.objects.filter(puzzle=puzzle):
+            cells[stats.cell_index].update({
+                'total_guesses': stats.total_guesses,
+                'correct_guesses': stats.correct_guesses,
+                'percent_correct': _percentage(stats.correct_guesses, stats.total_guesses),
+                'distinct_answers': stats.distinct_answers,
+            })
+
+        # Top N per cell in one query
+        top_picks = CellPickCount.objects.filter(puzzle=puzzle, count__gt=0).annotate(
+            rank=Window(
+                RowNumber(),
+                partition_by=[F('cell_index')],
+                order_by=[F('count').desc(), F('selected_artist__name').asc()],
+            )
+        ).filter(rank__lte=top).order_by('cell_index', 'rank')
+        for pick in top_picks.values('cell_index', 'selected_artist_id', 'selected_artist__name', 'count'):
+            cell = cells[pick['cell_index']]
+            cell['top_picks'].append({
+                'artist_id': pick['selected_artist_id'],
+                'name': pick['selected_artist__name'],
+                'count': pick['count'],
+                'share': _percentage(pick['count'], cell['total_guesses']),
+            })
+        return cells
+
+    @staticmethod
+    def live_puzzles():
+        """
+        Active puzzles that players can still submit to (yesterday onwards to cover
+        clients that are behind UTC)
+        """
+        yesterday = timezone.now().date() - timedelta(days=1)
+        return Puzzle.objects.filter(is_active=True, puzzle_date__gte=yesterday)
+
+    @staticmethod
+    def refresh_answer_sets_for_category(category):
+        """
+        Rebuild live puzzles that use the category and mark the rest stale
+        """
+        uses_category = (
+            Q(category_row_1=category) | Q(category_row_2=category) | Q(category_row_3=category) |
+            Q(category_col_1=category) | Q(category_col_2=category) | Q(category_col_3=category)
+        )
+        puzzles = Puzzle.objects.filter(uses_category)
+        PuzzleManager.invalidate_puzzle_cache(list(puzzles.values_list('pk', flat=True)))
+        puzzles.update(answers_built_at=None)
+        for puzzle in PuzzleManager.live_puzzles().filter(uses_category):
+            PuzzleManager.build_answer_sets(puzzle)
+
+    @staticmethod
+    def refresh_all_answer_sets():
+        """
+        Mark every puzzle stale and rebuild the live ones, e.g. after a bulk import
+        """
+        PuzzleManager.invalidate_puzzle_cache(list(Puzzle.objects.values_list('pk', flat=True)))
+        Puzzle.objects.update(answers_built_at=None)
+        for puzzle in PuzzleManager.live_puzzles().select_related(*PUZZLE_CATEGORY_FIELDS):
+            PuzzleManager.build_answer_sets(puzzle)
+
+    @staticmethod
+    def refresh_answer_sets_for_artist(artist, changed_fields=None):
+        """
+        Re-check one artist in the cells whose categories read `changed_fields`
+        (all cells when None, e.g. a new artist). Live puzzles are patched in
+        place; other built puzzles that use an affected category are marked stale
+        so they rebuild on next access.
+        """
+        affected = {
+            category.pk for category in Categories.objects.all()
+            if get_category_predicate(category).depends_on(changed_fields)
+        }
+        if not affected:
+            return
+        uses_affected = Q()
+        for field in PUZZLE_CATEGORY_FIELDS:
+            uses_affected |= Q(**{f"{field}__in": affected})
+
+        live_puzzles = list(PuzzleManager.live_puzzles().filter(
+            uses_affected, answers_built_at__isnull=False
+        ).select_related(*PUZZLE_CATEGORY_FIELDS))
+        stale_cells = Q(pk__in=[])
+        answers = []
+        for puzzle in live_puzzles:
+            for cell_index in CELL_INDEXES:
+                row_category, column_category = PuzzleManager.get_cell_categories(puzzle, cell_index)
+                if row_category.pk not in affected and column_category.pk not in affected:
+                    continue
+                stale_cells |= Q(puzzle=puzzle, cell_index=cell_index)
+                is_valid, reason = GameValidator.validate_artist_for_categories(artist, row_category, column_category)
+                if is_valid:
+                    answers.append(PuzzleCellAnswer(puzzle=puzzle, cell_index=cell_index, artist=artist))
+
+        stale_puzzles = Puzzle.objects.filter(uses_affected, answers_built_at__isnull=False).exclude(
+            pk__in=[puzzle.pk for puzzle in live_puzzles]
+        )
+        stale_ids = list(stale_puzzles.values_list('pk', flat=True))
+        with transaction.atomic():
+            Puzzle.objects.filter(pk__in=stale_ids).update(answers_built_at=None)
+            PuzzleCellAnswer.objects.filter(stale_cells, artist=artist).delete()
+            PuzzleCellAnswer.objects.bulk_create(answers)
+        PuzzleManager.invalidate_puzzle_cache([puzzle.pk for puzzle in live_puzzles] + stale_ids)
+
     @staticmethod
     def get_today_puzzle():
         """
@@ -95,10 +366,195 @@ class PuzzleManager:
         now_utc = timezone.now()
         today_utc = now_utc.date()
         try:
-            return Puzzle.objects.get(created_at__date=today_utc)
+            return Puzzle.objects.select_related(*PUZZLE_CATEGORY_FIELDS).get(puzzle_date=today_utc)
         except Puzzle.DoesNotExist:
             return None
-        
+
+    @staticmethod
+    def seconds_until_utc_midnight():
+        now_utc = timezone.now()
+        tomorrow = datetime.combine(now_utc.date() + timedelta(days=1), time.min, tzinfo=now_utc.tzinfo)
+        return max(1, int((tomorrow - now_utc).total_seconds()))
+
+    @staticmethod
+    def today_cache_key(puzzle_date=None):
+        return f"today-puzzle:{puzzle_date or timezone.now().date()}"
+
+    @staticmethod
+    def get_today_puzzle_payload():
+        """
+        Serialized today puzzle plus its ETag and Last-Modified timestamp, cached
+        for the rest of the UTC day. Returns None when there is no puzzle today.
+        """
+        from .serializers import PuzzleSerializer
+
+        key = PuzzleManager.today_cache_key()
+        payload = cache.get(key)
+        if payload is not None:
+            return payload or None
+
+        puzzle = PuzzleManager.get_today_puzzle()
+        if puzzle is None:
+            # Cache the miss briefly; saving the puzzle clears it anyway
+            cache.set(key, {}, cache_timeout(60))
+            return None
+
+        data = PuzzleSerializer(puzzle).data
+        body = json.dumps(data, sort_keys=True, default=str).encode()
+        last_modified = max(
+            [puzzle.updated_at] +
+            [getattr(puzzle, field).updated_at for field in PUZZLE_CATEGORY_FIELDS]
+        )
+        payload = {
+            'data': data,
+            'etag': hashlib.md5(body).hexdigest(),
+            'last_modified': int(last_modified.timestamp()),
+        }
+        cache.set(key, payload, cache_timeout(PuzzleManager.seconds_until_utc_midnight()))
+        return payload
+
+    @staticmethod
+    def invalidate_today_puzzle(puzzle_date=None):
+        keys = {PuzzleManager.today_cache_key()}
+        if puzzle_date:
+            keys.add(PuzzleManager.today_cache_key(puzzle_date))
+        cache.delete_many(list(keys))
+
+    @staticmethod
+    def puzzle_cache_keys(puzzle_id):
+        return f"puzzle:{puzzle_id}", f"puzzle-answers:{puzzle_id}"
+
+    @staticmethod
+    def get_cached_puzzle(puzzle_id):
+        """
+        Puzzle with its six categories, cached for the guess endpoints.
+        Returns None if there is no such puzzle.
+        """
+        key, _ = PuzzleManager.puzzle_cache_keys(puzzle_id)
+        puzzle = cache.get(key)
+        if puzzle is None:
+            puzzle = Puzzle.objects.select_related(*PUZZLE_CATEGORY_FIELDS).filter(pk=puzzle_id).first()
+            cache.set(key, puzzle or False, cache_timeout(getattr(settings, 'GUESS_CACHE_TIMEOUT', 300)))
+        return puzzle or None
+
+    @staticmethod
+    def get_cached_answer_sets(puzzle):
+        """
+        Valid artist IDs per cell, read from the materialized answer sets once and
+        then served from cache
+        """
+        _, key = PuzzleManager.puzzle_cache_keys(puzzle.pk)
+        answers = cache.get(key)
+        if answers is None:
+            PuzzleManager.ensure_answer_sets(puzzle)
+            answers = {cell_index: set() for cell_index in CELL_INDEXES}
+            for cell_index, artist_id in PuzzleCellAnswer.objects.filter(
+                puzzle=puzzle
+            ).values_list('cell_index', 'artist_id'):
+                answers[cell_index].add(artist_id)
+            cache.set(key, answers, cache_timeout(getattr(settings, 'GUESS_CACHE_TIMEOUT', 300)))
+        return answers
+
+    @staticmethod
+    def invalidate_puzzle_cache(puzzle_ids):
+        cache.delete_many([key for puzzle_id in puzzle_ids for key in PuzzleManager.puzzle_cache_keys(puzzle_id)])
+
+    @staticmethod
+    def get_cached_artist(artist_id):
+        """
+        Artist by ID from cache (None if it doesn't exist); saves and deletes evict it
+        """
+        return PuzzleManager.get_cached_artists([artist_id]).get(artist_id)
+
+    @staticmethod
+    def get_cached_artists(artist_ids):
+        """
+        {id: artist} for the IDs that exist, with one cache round trip and at most
+        one query for the misses
+        """
+        keys = {f"artist:{artist_id}": artist_id for artist_id in artist_ids}
+        cached = cache.get_many(list(keys))
+        artists = {keys[key]: artist for key, artist in cached.items() if artist}
+
+        missing = [artist_id for key, artist_id in keys.items() if key not in cached]
+        if missing:
+            found = Artists.objects.in_bulk(missing)
+            cache.set_many(
+                {f"artist:{artist_id}": found.get(artist_id, False) for artist_id in missing},
+                cache_timeout(getattr(settings, 'GUESS_CACHE_TIMEOUT', 300))
+            )
+            artists.update(found)
+        return artists
+
+    @staticmethod
+    def invalidate_artist_cache(artist_id):
+        cache.delete(f"artist:{artist_id}")
+
+    @staticmethod
+    def submit_guesses(user_id, puzzle, guesses):
+        """
+        Validate up to 9 (cell_index, artist_id) guesses in one pass and store them
+        in one transaction. Returns one result dict per guess, in order.
+        """
+        artists = PuzzleManager.get_cached_artists([artist_id for cell_index, artist_id in guesses])
+        answers = PuzzleManager.get_cached_answer_sets(puzzle)
+
+        results = []
+        submissions = []
+        with transaction.atomic():
+            for cell_index, artist_id in guesses:
+                artist = artists.get(artist_id)
+                if artist is None:
+                    results.append({'cell_index': cell_index, 'is_valid': False, 'reason': 'Artist not found.'})
+                    continue
+
+                is_valid, reason = PuzzleManager.check_answer(puzzle, cell_index, artist, answers)
+
+                submission = GameSubmission(
+                    user_id=user_id, puzzle=puzzle, cell_index=cell_index, selected_artist=artist, is_correct=is_valid
+                )
+                # unique_together rejects repeats; no racy pre-check. The savepoint
+                # keeps a repeat from undoing the other guesses.
+                try:
+                    with transaction.atomic():
+                        GameSubmission.objects.bulk_create([submission])
+                except IntegrityError:
+                    if not GameSubmission.objects.filter(
+                        user_id=user_id, puzzle=puzzle, selected_artist=artist
+                    ).exists():
+                        raise
+                    results.append({
+                        'cell_index': cell_index,
+                        'is_valid': False,
+                        'reason': 'You have already submitted this artist for this puzzle.',
+                    })
+                    continue
+
+                submissions.append(submission)
+                results.append({
+                    'cell_index': cell_index,
+                    'is_valid': is_valid,
+                    'reason': reason,
+                    'artist': artist,
+                    'submission_id': submission.id,
+                })
+
+            # bulk_create skips GameSubmission.save, so bump the counters here
+            new_answers = CellPickCount.record_picks(
+                puzzle.pk, [(submission.cell_index, submission.selected_artist_id) for submission in submissions]
+            )
+            cells = {}
+            for submission in submissions:
+                total, correct, distinct = cells.get(submission.cell_index, (0, 0, 0))
+                cells[submission.cell_index] = (
+                    total + 1,
+                    correct + submission.is_correct,
+                    distinct + ((submission.cell_index, submission.selected_artist_id) in new_answers),
+                )
+            for cell_index, (total, correct, distinct) in cells.items():
+                CellStats.record(puzzle.pk, cell_index, guesses=total, correct=correct, distinct=distinct)
+        return results
+
     @staticmethod
     def get_puzzle_grid_data(puzzle):
         """
@@ -0,0 +1,279 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from main.models import Artists, Categories, Puzzle, PuzzleCellAnswer, RosterCounter
+from main.serializers import ArtistSerializer
+import io
+import json
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+import uuid
+
+ENDPOINTS = ['today-puzzle', 'validate-guess', 'valid-artists', 'artist-list', 'artist-search', 'search-suggestions']
+
+COUNTRIES = ['US', 'GB', 'KR', 'JP', 'TH', 'CA', 'FR', 'DE', 'BR', 'MX', 'SE', 'AU', 'NG', 'PR', 'CO']
+GENRES = ['pop', 'rap', 'rock', 'k-pop', 'r&b', 'latin pop', 'edm', 'country', 'indie', 'j-pop']
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'zen', 'ta', 'vi', 'no', 'sha', 'dre', 'li', 'sa', 'mon', 'bel', 'ry']
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the main API endpoints against a seeded test database and write '
+        'p50/p95/p99 latency, query counts and allocated memory as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--artists',
+            type=int,
+            default=20000,
+            help='Artists to seed (default: 20000)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Timed requests per endpoint (default: 200)'
+        )
+        parser.add_argument(
+            '--memory-requests',
+            type=int,
+            default=20,
+            help='Requests per endpoint traced with tracemalloc (default: 20)'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=10,
+            help='Untimed requests per endpoint before measuring (default: 10)'
+        )
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            choices=ENDPOINTS,
+            help='Only benchmark this endpoint (repeatable; default: all)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Random seed for the dataset and request mix (default: 1)'
+        )
+        parser.add_argument(
+            '--output',
+            default='benchmark-results.json',
+            help='Where to write the JSON results (default: benchmark-results.json)'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep and reuse the seeded test database between runs'
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+
+        # Never touch the real database: run against Django's test database
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            cache.clear()
+            dataset = self._seed(options['artists'])
+            self.client = Client()
+            results = {}
+            for name in options['endpoint'] or ENDPOINTS:
+                self.stdout.write(f"Benchmarking {name}...")
+                results[name] = self._benchmark(name, options)
+                latency = results[name]['latency_ms']
+                self.stdout.write(
+                    f"✓ {name}: p50 {latency['p50']:.2f}ms, p95 {latency['p95']:.2f}ms, "
+                    f"p99 {latency['p99']:.2f}ms, {results[name]['queries']['mean']:.1f} queries"
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'commit': self._git_commit(),
+            'database': connection.vendor,
+            'dataset': dataset,
+            'options': {key: options[key] for key in ('requests', 'memory_requests', 'warmup', 'seed')},
+            'endpoints': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"\nWrote {options['output']}"))
+
+    # Dataset
+
+    def _seed(self, artist_count):
+        existing = Artists.objects.count()
+        if existing < artist_count:
+            self.stdout.write(f"Seeding {artist_count - existing} artists...")
+            artists = []
+            for number in range(existing + 1, artist_count + 1):
+                name = ' '.join(
+                    ''.join(self.random.choices(SYLLABLES, k=self.random.randint(1, 3))).title()
+                    for _ in range(self.random.randint(1, 2))
+                )
+                artists.append(Artists(
+                    name=name,
+                    slug=f"artist-{number}",
+                    roster_number=number,
+                    artist_type=self.random.choice(['Solo', 'Group']),
+                    origin_country=self.random.choice(COUNTRIES),
+                    debut_year=self.random.randint(1960, 2024),
+                    spotify_id='',
+                    spotify_primary_genre=self.random.choice(GENRES),
+                    has_grammy_win=self.random.random() < 0.2,
+                    has_hot100_entry=self.random.random() < 0.5,
+                    uses_stage_name=self.random.random() < 0.5,
+                    is_deceased=self.random.random() < 0.1,
+                    is_disbanded=self.random.random() < 0.2,
+                ))
+                artists[-1].derive_taxonomy()
+            Artists.objects.bulk_create(artists, batch_size=2000)
+            RosterCounter.objects.update_or_create(pk=1, defaults={'last_value': artist_count})
+
+        if not Categories.objects.exists():
+            categories = [
+                Categories(code=f"country-{code}", display_name=code, category_type='geographic',
+                           validation_field='origin_country', validation_value=code)
+                for code in COUNTRIES
+            ] + [
+                Categories(code=f"genre-{genre}", display_name=genre, category_type='genre',
+                           validation_field='spotify_primary_genre', validation_value=genre)
+                for genre in GENRES
+            ] + [
+                Categories(code=f"decade-{decade}", display_name=f"{decade}s", category_type='temporal',
+                           validation_field='debut_year',
+                           validation_logic=json.dumps({'field': 'debut_year', 'lookup': 'range',
+                                                        'value': [decade, decade + 9]}))
+                for decade in range(1960, 2030, 10)
+            ] + [
+                Categories(code=field, display_name=field, category_type='achievement',
+                           validation_field=field, validation_value='true')
+                for field in ['has_grammy_win', 'has_hot100_entry', 'uses_stage_name', 'is_disbanded']
+            ]
+            Categories.objects.bulk_create(categories)
+
+        today = timezone.now().date()
+        if not Puzzle.objects.filter(puzzle_date=today).exists():
+            call_command(
+                'generate_puzzles', start=today, days=1, workers=1, seed=self.random.getrandbits(32),
+                min_answers=5, stdout=io.StringIO()
+            )
+        self.puzzle = Puzzle.objects.filter(puzzle_date=today).first()
+        if self.puzzle is None:
+            raise CommandError("Could not generate a puzzle for the seeded dataset.")
+
+        self.answers = list(PuzzleCellAnswer.objects.filter(puzzle=self.puzzle).values_list('cell_index', 'artist_id'))
+        self.names = list(Artists.objects.values_list('name', flat=True)[:1000])
+        self.artist_pages = max(1, -(-Artists.objects.count() // settings.REST_FRAMEWORK['PAGE_SIZE']))
+        return {
+            'artists': Artists.objects.count(),
+            'categories': Categories.objects.count(),
+            'puzzle_answers': len(self.answers),
+        }
+
+    # Requests
+
+    def _request(self, name):
+        puzzle_id = self.puzzle.id
+        if name == 'today-puzzle':
+            return self.client.get('/api/today-puzzle/')
+        if name == 'validate-guess':
+            cell_index, artist_id = self.random.choice(self.answers)
+            if self.random.random() < 0.3:
+                # Some misses, which take the explanation path
+                artist_id = self.random.choice(self.answers)[1]
+            return self.client.post('/api/validate-guess/', {
+                'user_id': str(uuid.uuid4()),
+                'puzzle_id': str(puzzle_id),
+                'cell_index': cell_index,
+                'selected_artist_id': str(artist_id),
+            }, content_type='application/json')
+        if name == 'valid-artists':
+            row, column = self.random.choice(self.answers)[0].split(',')
+            return self.client.get(f'/api/puzzles/{puzzle_id}/valid_artists/', {'row': row, 'column': column})
+        if name == 'artist-list':
+            return self.client.get('/api/artists/', {'page': self.random.randint(1, self.artist_pages)})
+        query = self.random.choice(self.names)[:self.random.randint(2, 5)]
+        if name == 'artist-search':
+            return self.client.get('/api/artists/', {'search': query})
+        return self.client.get('/api/artists/search_suggestions/', {'q': query})
+
+    def _check_artist_list(self):
+        """
+        The list endpoint builds its JSON from .values() rows; make sure it still
+        matches ArtistSerializer before timing it
+        """
+        response = self.client.get('/api/artists/')
+        artists = Artists.objects.order_by('name', 'pk')[:len(response.json()['results'])]
+        if response.json()['results'] != json.loads(json.dumps(ArtistSerializer(artists, many=True).data)):
+            raise CommandError("/api/artists/ no longer matches ArtistSerializer output.")
+
+    def _benchmark(self, name, options):
+        if name == 'artist-list':
+            self._check_artist_list()
+        for _ in range(options['warmup']):
+            self._request(name)
+
+        latencies = []
+        query_counts = []
+        statuses = {}
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = self._request(name)
+                latencies.append((time.perf_counter() - started) * 1000)
+            query_counts.append(len(queries))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        peaks = []
+        tracemalloc.start()
+        try:
+            for _ in range(options['memory_requests']):
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                self._request(name)
+                peaks.append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'requests': len(latencies),
+            'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+            'latency_ms': self._summary(latencies),
+            'queries': {'mean': statistics.fmean(query_counts), 'max': max(query_counts)},
+            'allocated_kb': {'mean': statistics.fmean(peaks), 'max': max(peaks)} if peaks else None,
+        }
+
+    @staticmethod
+    def _summary(samples):
+        cuts = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+        return {
+            'p50': cuts[49],
+            'p95': cuts[94],
+            'p99': cuts[98],
+            'mean': statistics.fmean(samples),
+            'max': max(samples),
+        }
+
+    @staticmethod
+    def _git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.exports import EXPORT_FORMATS, export_chunks, iter_submissions, parse_bound
+import sys
+
+
+class Command(BaseCommand):
+    help = 'Stream game submissions to NDJSON or CSV with flat memory use'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-format',
+            choices=EXPORT_FORMATS,
+            default='ndjson',
+            help='Output format (default: ndjson)'
+        )
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='File to write, or - for stdout (default: -)'
+        )
+        parser.add_argument(
+            '--puzzle',
+            help='Only export submissions for this puzzle ID'
+        )
+        parser.add_argument(
+            '--since',
+            help='Only export submissions from this date or datetime (ISO 8601)'
+        )
+        parser.add_argument(
+            '--until',
+            help='Only export submissions up to this date or datetime (ISO 8601)'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Gzip the output'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per keyset page (default: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_bound(options['since']) if options['since'] else None
+            until = parse_bound(options['until'], end_of_day=True) if options['until'] else None
+            rows = iter_submissions(
+                puzzle_id=options['puzzle'], since=since, until=until, batch_size=options['batch_size']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = export_chunks(rows, output=options['output_format'], compress=options['gzip'])
+
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
@@ -0,0 +1,178 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from main.bitset_index import get_artist_index
+from main.logic import PUZZLE_CATEGORY_FIELDS as CATEGORY_FIELDS, PuzzleManager
+from main.models import Categories, Puzzle
+from main.puzzle_search import init_worker, search_grids
+import os
+import random
+
+
+class Command(BaseCommand):
+    help = 'Generate solvable daily puzzles for a date range from the active categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=date.fromisoformat,
+            help='First puzzle date, YYYY-MM-DD (default: tomorrow, UTC)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=1,
+            help='Number of consecutive days to generate (default: 1)'
+        )
+        parser.add_argument(
+            '--min-answers',
+            type=int,
+            default=3,
+            help='Minimum valid artists required in every cell (default: 3)'
+        )
+        parser.add_argument(
+            '--min-avg-answers',
+            type=float,
+            default=0,
+            help='Hardest allowed puzzle: lowest average valid artists per cell (default: 0)'
+        )
+        parser.add_argument(
+            '--max-avg-answers',
+            type=float,
+            default=None,
+            help='Easiest allowed puzzle: highest average valid artists per cell (default: no limit)'
+        )
+        parser.add_argument(
+            '--repeat-window',
+            type=int,
+            default=7,
+            help='Days within which a category may not be reused (default: 7)'
+        )
+        parser.add_argument(
+            '--attempts',
+            type=int,
+            default=20000,
+            help='Random grids tried per date (default: 20000)'
+        )
+        parser.add_argument(
+            '--candidates',
+            type=int,
+            default=50,
+            help='Valid grids kept per date to choose from (default: 50)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes for the search (default: CPU count)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed for reproducible output'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the puzzles without saving them'
+        )
+
+    def handle(self, *args, **options):
+        start = options['start'] or timezone.now().date() + timedelta(days=1)
+        dates = [start + timedelta(days=offset) for offset in range(options['days'])]
+        window = options['repeat_window']
+
+        categories = list(Categories.objects.filter(is_active=True).order_by('code'))
+        if len(categories) < 6:
+            raise CommandError("At least 6 active categories are needed to build a puzzle.")
+
+        # Pairwise intersection counts from the bitset index: every grid is then
+        # scored with 9 lookups instead of ORM queries
+        index = get_artist_index()
+        bitsets = [index.category_bits(category) for category in categories]
+        pair_counts = [[(row & column).bit_count() for column in bitsets] for row in bitsets]
+        self.stdout.write(f"Indexed {len(categories)} categories over {len(index.ordinals)} artists")
+
+        existing = self._existing_categories(start, dates[-1], window)
+
+        pending = [puzzle_date for puzzle_date in dates if puzzle_date not in existing]
+        skipped = len(dates) - len(pending)
+        if skipped:
+            self.stdout.write(f"Skipping {skipped} date(s) that already have a puzzle")
+        if not pending:
+            return
+
+        search_options = {
+            'min_answers': options['min_answers'],
+            'min_avg_answers': options['min_avg_answers'],
+            'max_avg_answers': options['max_avg_answers'],
+            'attempts': options['attempts'],
+            'candidates': options['candidates'],
+        }
+        seeds = random.Random(options['seed'])
+        tasks = [(seeds.getrandbits(64), search_options) for _ in pending]
+
+        if options['workers'] > 1:
+            with ProcessPoolExecutor(
+                max_workers=options['workers'], initializer=init_worker, initargs=(pair_counts,)
+            ) as executor:
+                chunksize = max(1, len(tasks) // (options['workers'] * 4))
+                results = list(executor.map(search_grids, tasks, chunksize=chunksize))
+        else:
+            init_worker(pair_counts)
+            results = [search_grids(task) for task in tasks]
+
+        # Choose sequentially so the repeat window sees earlier choices
+        used = dict(existing)
+        puzzles = []
+        for puzzle_date, candidates in zip(pending, results):
+            recent = set()
+            for offset in range(-window, window + 1):
+                recent |= used.get(puzzle_date + timedelta(days=offset), set())
+
+            choice = next(
+                (candidate for candidate in candidates
+                 if not {categories[i].pk for i in candidate[0] + candidate[1]} & recent),
+                None
+            )
+            if choice is None:
+                self.stdout.write(self.style.WARNING(
+                    f"✗ {puzzle_date}: no grid satisfies the constraints"
+                ))
+                continue
+
+            rows, columns, counts = choice
+            grid = [categories[i] for i in rows + columns]
+            used[puzzle_date] = {category.pk for category in grid}
+            puzzles.append(Puzzle(puzzle_date=puzzle_date, **dict(zip(CATEGORY_FIELDS, grid))))
+            self.stdout.write(
+                f"✓ {puzzle_date}: rows [{', '.join(c.code for c in grid[:3])}] "
+                f"columns [{', '.join(c.code for c in grid[3:])}] "
+                f"answers per cell min {min(counts)}, avg {sum(counts) / len(counts):.1f}"
+            )
+
+        if options['dry_run']:
+            self.stdout.write(f"\nDry run: {len(puzzles)} puzzle(s) not saved.")
+            return
+
+        with transaction.atomic():
+            Puzzle.objects.bulk_create(puzzles)
+            # bulk_create skips the post_save signal, so materialize the answer
+            # sets here straight from the index we already hold
+            for puzzle in puzzles:
+                PuzzleManager.build_answer_sets(puzzle, index=index)
+
+        self.stdout.write(self.style.SUCCESS(f"\nCreated {len(puzzles)} puzzle(s)."))
+
+    def _existing_categories(self, first_date, last_date, window):
+        """
+        Category ids already used by saved puzzles around the requested range
+        """
+        puzzles = Puzzle.objects.filter(
+            puzzle_date__gte=first_date - timedelta(days=window),
+            puzzle_date__lte=last_date + timedelta(days=window),
+        ).values_list('puzzle_date', *[f"{field}_id" for field in CATEGORY_FIELDS])
+        return {puzzle[0]: set(puzzle[1:]) for puzzle in puzzles}
@@ -0,0 +1,322 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
+from main.logic import PuzzleManager
+from main.models import Artists, Labels, ArtistLabels, Albums, AlbumCollabs, RosterCounter
+from main.slugs import SLUG_RETRIES, allocate_artist_slugs, is_slug_conflict
+import csv
+import gzip
+import io
+import itertools
+import json
+import sys
+import time
+
+TRUE_VALUES = {'true', 't', '1', 'yes', 'y'}
+FALSE_VALUES = {'false', 'f', '0', 'no', 'n'}
+
+# Columns read from the input for each kind (references are resolved separately)
+KIND_FIELDS = {
+    'artists': (Artists, [
+        'name', 'artist_type', 'origin_country', 'debut_year', 'spotify_id', 'spotify_primary_genre',
+        'uses_stage_name', 'has_grammy_win', 'has_hot100_entry', 'is_deceased', 'is_disbanded',
+    ]),
+    'labels': (Labels, ['name', 'parent_company', 'founded_year', 'country', 'is_major']),
+    'albums': (Albums, [
+        'title', 'release_date', 'peak_chart_pos', 'has_number_one', 'is_collab', 'spotify_id', 'image',
+    ]),
+    'artist-labels': (ArtistLabels, ['is_primary']),
+    'album-collabs': (AlbumCollabs, []),
+}
+
+
+class RowError(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import artists, labels, albums, artist-labels or album-collabs from CSV or NDJSON. '
+        'Rows are streamed, validated and written in chunks with bulk_create; '
+        'artist images are left for update_artist_images.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(KIND_FIELDS), help='What the file contains')
+        parser.add_argument('path', help='Input file (.csv, .ndjson/.jsonl, optionally .gz) or - for stdin')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson'],
+            help='Input format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Rows validated and written per transaction (default: 5000)'
+        )
+        parser.add_argument(
+            '--max-errors',
+            type=int,
+            default=100,
+            help='Abort after this many invalid rows (default: 100)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the input without writing anything'
+        )
+
+    def handle(self, *args, **options):
+        self.kind = options['kind']
+        self.model, self.columns = KIND_FIELDS[self.kind]
+        self.dry_run = options['dry_run']
+        self.max_errors = options['max_errors']
+        self.error_count = 0
+        self.skipped_count = 0
+        self.created_count = 0
+
+        started = time.monotonic()
+        rows = self._read_rows(options['path'], options['format'])
+        while True:
+            chunk = list(itertools.islice(rows, options['chunk_size']))
+            if not chunk:
+                break
+            self._import_chunk(chunk)
+            self.stdout.write(f"Imported {self.created_count} {self.kind} so far...")
+
+        if self.created_count and not self.dry_run:
+            # bulk_create skips the post_save signals, so rebuild answer sets once at the end
+            PuzzleManager.refresh_all_answer_sets()
+
+        elapsed = time.monotonic() - started
+        summary = (
+            f"\n{'Validated' if self.dry_run else 'Imported'} {self.created_count} {self.kind} "
+            f"in {elapsed:.1f}s, skipped {self.skipped_count} existing, {self.error_count} invalid."
+        )
+        self.stdout.write(self.style.SUCCESS(summary))
+        if self.kind == 'artists' and self.created_count and not self.dry_run:
+            self.stdout.write("Run `manage.py update_artist_images --missing-only` to fetch their images.")
+
+    # Input
+
+    def _read_rows(self, path, input_format):
+        """
+        Yield (line_number, dict) pairs without loading the whole file
+        """
+        name = path[:-3] if path.endswith('.gz') else path
+        input_format = input_format or ('csv' if name.endswith('.csv') else 'ndjson')
+
+        if path == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        elif path.endswith('.gz'):
+            stream = gzip.open(path, 'rt', encoding='utf-8', newline='')
+        else:
+            try:
+                stream = open(path, encoding='utf-8', newline='')
+            except OSError as e:
+                raise CommandError(f"Cannot open {path}: {e}")
+
+        with stream:
+            if input_format == 'csv':
+                for line_number, row in enumerate(csv.DictReader(stream), start=2):
+                    yield line_number, row
+            else:
+                for line_number, line in enumerate(stream, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        yield line_number, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        self._report(line_number, f"invalid JSON: {e}")
+
+    def _report(self, line_number, message):
+        self.error_count += 1
+        self.stdout.write(self.style.ERROR(f"✗ line {line_number}: {message}"))
+        if self.error_count >= self.max_errors:
+            raise CommandError(f"Aborting after {self.error_count} invalid rows.")
+
+    # Validation
+
+    def _clean(self, row):
+        """
+        Run each column through its model field's validation
+        """
+        values = {}
+        errors = []
+        for name in self.columns:
+            field = self.model._meta.get_field(name)
+            value = row.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+                if isinstance(field, models.BooleanField) and value.lower() in TRUE_VALUES | FALSE_VALUES:
+                    value = value.lower() in TRUE_VALUES
+            if value in (None, ''):
+                if field.has_default():
+                    continue
+                value = None if field.null else value
+            try:
+                values[name] = field.clean(value, None)
+            except ValidationError as e:
+                errors.append(f"{name}: {'; '.join(e.messages)}")
+        if errors:
+            raise RowError(', '.join(errors))
+        return values
+
+    def _validate(self, chunk):
+        cleaned = []
+        for line_number, row in chunk:
+            try:
+                cleaned.append((line_number, row, self._clean(row)))
+            except RowError as e:
+                self._report(line_number, str(e))
+        return cleaned
+
+    # Reference resolution (one query per chunk and kind)
+
+    @staticmethod
+    def _ref(row, key):
+        return str(row.get(key) or '').strip()
+
+    def _artist_refs(self, refs):
+        refs = {ref for ref in refs if ref}
+        found = {}
+        for artist_id, spotify_id, slug in Artists.objects.filter(
+            Q(spotify_id__in=refs) | Q(slug__in=refs)
+        ).values_list('id', 'spotify_id', 'slug'):
+            found[spotify_id] = artist_id
+            found[slug] = artist_id
+        return found
+
+    def _resolve(self, cleaned, key, lookup, target, attname=None):
+        resolved = []
+        for line_number, row, values in cleaned:
+            ref = self._ref(row, key)
+            if ref not in lookup:
+                self._report(line_number, f"{key}: no {target} matches '{ref}'")
+                continue
+            values[attname or f"{key}_id"] = lookup[ref]
+            resolved.append((line_number, row, values))
+        return resolved
+
+    # Writers
+
+    def _import_chunk(self, chunk):
+        cleaned = self._validate(chunk)
+        build = getattr(self, f"_build_{self.kind.replace('-', '_')}")
+        if self.dry_run:
+            self.created_count += len(build(cleaned))
+            return
+        # Link rows are pre-filtered on their natural key; ignore_conflicts only
+        # covers a concurrent import inserting the same pair first
+        ignore_conflicts = self.kind in ('artist-labels', 'album-collabs')
+        objects = []
+        for attempt in range(SLUG_RETRIES + 1):
+            skipped = self.skipped_count
+            try:
+                with transaction.atomic():
+                    # Built inside the transaction so the existing-row checks and
+                    # the reserved roster numbers roll back with the insert
+                    objects = build(cleaned)
+                    self.model.objects.bulk_create(objects, batch_size=1000, ignore_conflicts=ignore_conflicts)
+                break
+            except IntegrityError:
+                self.skipped_count = skipped
+                # Another writer took one of the slugs since they were allocated
+                if self.kind != 'artists' or attempt == SLUG_RETRIES or not is_slug_conflict(objects):
+                    raise
+        self.created_count += len(objects)
+
+    def _build_artists(self, cleaned):
+        existing = set(Artists.objects.filter(
+            spotify_id__in=[values['spotify_id'] for _, _, values in cleaned]
+        ).values_list('spotify_id', flat=True))
+
+        artists = []
+        for line_number, row, values in cleaned:
+            if values['spotify_id'] in existing:
+                self.skipped_count += 1
+                continue
+            existing.add(values['spotify_id'])
+            artist = Artists(**values)
+            # bulk_create skips save(), so derive the grouping columns here
+            artist.derive_taxonomy()
+            artists.append(artist)
+
+        allocate_artist_slugs(artists)
+        if artists and not self.dry_run:
+            # One counter update reserves a block for the whole chunk
+            first = RosterCounter.reserve(len(artists))
+            for roster_number, artist in enumerate(artists, start=first):
+                artist.roster_number = roster_number
+        return artists
+
+    def _build_labels(self, cleaned):
+        existing = set(Labels.objects.filter(
+            name__in=[values['name'] for _, _, values in cleaned]
+        ).values_list('name', flat=True))
+
+        labels = []
+        for line_number, row, values in cleaned:
+            if values['name'] in existing:
+                self.skipped_count += 1
+                continue
+            existing.add(values['name'])
+            labels.append(Labels(**values))
+        return labels
+
+    def _build_albums(self, cleaned):
+        existing = set(Albums.objects.filter(
+            spotify_id__in=[values['spotify_id'] for _, _, values in cleaned if values.get('spotify_id')]
+        ).values_list('spotify_id', flat=True))
+        artists = self._artist_refs(self._ref(row, 'primary_artist') for _, row, _ in cleaned)
+
+        albums = []
+        for line_number, row, values in self._resolve(cleaned, 'primary_artist', artists, 'artist'):
+            if values.get('spotify_id') in existing:
+                self.skipped_count += 1
+                continue
+            if values.get('spotify_id'):
+                existing.add(values['spotify_id'])
+            albums.append(Albums(**values))
+        return albums
+
+    def _build_artist_labels(self, cleaned):
+        artists = self._artist_refs(self._ref(row, 'artist') for _, row, _ in cleaned)
+        labels = dict(Labels.objects.filter(
+            name__in={self._ref(row, 'label') for _, row, _ in cleaned}
+        ).values_list('name', 'id'))
+        resolved = self._resolve(self._resolve(cleaned, 'artist', artists, 'artist'), 'label', labels, 'label')
+        return self._new_links(ArtistLabels, resolved, 'artist_id', 'label_id')
+
+    def _build_album_collabs(self, cleaned):
+        artists = self._artist_refs(self._ref(row, 'artist') for _, row, _ in cleaned)
+        albums = dict(Albums.objects.filter(
+            spotify_id__in={self._ref(row, 'album') for _, row, _ in cleaned}
+        ).values_list('spotify_id', 'id'))
+        resolved = self._resolve(
+            self._resolve(cleaned, 'album', albums, 'album'),
+            'artist', artists, 'artist', attname='collab_artist_id_id'
+        )
+        return self._new_links(AlbumCollabs, resolved, 'album_id', 'collab_artist_id_id')
+
+    def _new_links(self, model, resolved, left, right):
+        """
+        Build the rows whose (left, right) pair isn't stored yet, counting the
+        rest as skipped
+        """
+        existing = set(model.objects.filter(
+            **{f"{left}__in": {values[left] for _, _, values in resolved}},
+            **{f"{right}__in": {values[right] for _, _, values in resolved}},
+        ).values_list(left, right))
+
+        links = []
+        for line_number, row, values in resolved:
+            key = (values[left], values[right])
+            if key in existing:
+                self.skipped_count += 1
+                continue
+            existing.add(key)
+            links.append(model(**values))
+        return links
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from main.image_jobs import claim_next_job, run_job
+from main.models import ImageRefreshJob
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Work through image refresh jobs queued from the admin, resuming any whose '
+        'worker stopped reporting progress'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no jobs are waiting instead of polling for new ones'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5,
+            help='Seconds between checks for new jobs (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        run_count = 0
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            if job.resumed:
+                self.stdout.write(
+                    f"Resuming job {job.pk} after its worker stopped reporting: "
+                    f"{job.processed}/{job.total} artists already processed..."
+                )
+            else:
+                self.stdout.write(f"Running job {job.pk}: {job.total} artists...")
+            try:
+                run_job(job)
+            except Exception as e:
+                ImageRefreshJob.objects.filter(pk=job.pk).update(
+                    status='failed', error=str(e), finished_at=timezone.now()
+                )
+                self.stdout.write(self.style.ERROR(f"✗ Job {job.pk} failed: {e}"))
+                continue
+            run_count += 1
+
+            if job.status == 'completed':
+                style, mark = self.style.SUCCESS, '✓'
+            else:
+                style, mark = self.style.WARNING, '✗'
+            self.stdout.write(style(
+                f"{mark} Job {job.pk} {job.get_status_display().lower()}: processed {job.processed}, "
+                f"updated {job.updated}, {job.failed} errors" + (f" ({job.error})" if job.error else "")
+            ))
+
+        self.stdout.write(self.style.SUCCESS(f"\nCompleted! Ran {run_count} job(s)."))
@@ -1,8 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from main.models import Artists
-from main.utils import update_artist_image
-import time
+from main.utils import (
+    MAX_ARTISTS_PER_REQUEST, RateLimiter, fetch_artist_images_batch, get_spotify_client
+)
 
 class Command(BaseCommand):
     help = 'Update artist images from Spotify for all artists'
@@ -11,14 +16,32 @@ class Command(BaseCommand):
         parser.add_argument(
             '--batch-size',
             type=int,
-            default=50,
-            help='Number of artists to process in each batch (default: 50)'
+            default=MAX_ARTISTS_PER_REQUEST,
+            help=f'Artists per Spotify request (default and max: {MAX_ARTISTS_PER_REQUEST})'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Concurrent Spotify requests (default: 4)'
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=5,
+            help='Maximum Spotify requests per second across all workers (default: 5)'
         )
         parser.add_argument(
             '--delay',
             type=float,
-            default=0.1,
-            help='Delay between API calls in seconds (default: 0.1)'
+            default=None,
+            help='Deprecated: seconds between Spotify requests, converted to --rate (0 disables rate limiting)'
+        )
+        parser.add_argument(
+            '--write-size',
+            type=int,
+            default=500,
+            help='Artists written per bulk_update (default: 500)'
         )
         parser.add_argument(
             '--force',
@@ -30,17 +53,28 @@ class Command(BaseCommand):
             action='store_true',
             help='Only update artists that currently have no image'
         )
+        parser.add_argument(
+            '--stale',
+            action='store_true',
+            help='Update artists whose image is missing or older than IMAGE_MAX_AGE_HOURS (run on a schedule)'
+        )
 
     def handle(self, *args, **options):
-        batch_size = options['batch_size']
-        delay = options['delay']
+        batch_size = max(1, min(options['batch_size'], MAX_ARTISTS_PER_REQUEST))
         force_update = options['force']
         missing_only = options['missing_only']
+        self.stale = options['stale']
 
         # Build queryset based on options
         queryset = Artists.objects.exclude(spotify_id__isnull=True).exclude(spotify_id='')
-        
-        if missing_only:
+
+        if self.stale:
+            max_age = timedelta(hours=getattr(settings, 'IMAGE_MAX_AGE_HOURS', 24))
+            queryset = queryset.filter(
+                Q(image_last_updated__isnull=True) | Q(image_last_updated__lt=timezone.now() - max_age)
+            )
+            self.stdout.write(f"Processing artists with missing or stale images...")
+        elif missing_only:
             queryset = queryset.filter(cached_image_url__isnull=True)
             self.stdout.write(f"Processing artists with missing cached images only...")
         elif not force_update:
@@ -49,45 +83,76 @@ class Command(BaseCommand):
         else:
             self.stdout.write(f"Processing all artists with Spotify IDs...")
 
-        total_artists = queryset.count()
+        # spotify_id -> [(pk, cached_image_url)]; several rows may share an ID
+        artists_by_spotify_id = {}
+        for pk, spotify_id, cached_image_url in queryset.values_list(
+            'pk', 'spotify_id', 'cached_image_url'
+        ).iterator(chunk_size=2000):
+            artists_by_spotify_id.setdefault(spotify_id, []).append((pk, cached_image_url))
+
+        total_artists = sum(len(rows) for rows in artists_by_spotify_id.values())
         self.stdout.write(f"Found {total_artists} artists to process")
 
         if total_artists == 0:
             self.stdout.write("No artists to process.")
             return
 
+        spotify_ids = list(artists_by_spotify_id)
+        batches = [spotify_ids[i:i + batch_size] for i in range(0, len(spotify_ids), batch_size)]
+
+        # Without spotipy's own retries, 429 Retry-After goes through the shared
+        # rate limiter instead of sleeping inside each worker
+        sp = get_spotify_client(retries=False)
+        if not sp:
+            self.stdout.write(self.style.ERROR("Spotify client unavailable; check credentials."))
+            return
+        rate = options['rate']
+        if options['delay'] is not None:
+            rate = 1 / options['delay'] if options['delay'] > 0 else None
+            self.stdout.write(self.style.WARNING(
+                "--delay is deprecated; use --rate "
+                + (f"{rate:g}" if rate else "instead (running without a rate limit)")
+            ))
+        rate_limiter = RateLimiter(rate) if rate else None
+
         updated_count = 0
         error_count = 0
         processed_count = 0
+        pending = []
 
-        # Process in batches
-        for i in range(0, total_artists, batch_size):
-            batch = queryset[i:i + batch_size]
-            
-            self.stdout.write(f"Processing batch {i//batch_size + 1}/{(total_artists-1)//batch_size + 1}")
-            
-            for artist in batch:
-                processed_count += 1
-                
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {
+                executor.submit(fetch_artist_images_batch, batch, sp, rate_limiter): batch
+                for batch in batches
+            }
+            for number, future in enumerate(as_completed(futures), start=1):
+                batch = futures[future]
+                batch_artists = sum(len(artists_by_spotify_id[spotify_id]) for spotify_id in batch)
+                processed_count += batch_artists
                 try:
-                    # Show progress
-                    if processed_count % 10 == 0:
-                        self.stdout.write(f"Processed {processed_count}/{total_artists} artists...")
-                    
-                    # Update the image
-                    if update_artist_image(artist):
-                        updated_count += 1
-                        self.stdout.write(f"✓ Updated image for: {artist.name}")
-                    
-                    # Add delay to respect API rate limits
-                    if delay > 0:
-                        time.sleep(delay)
-                        
+                    images = future.result()
                 except Exception as e:
-                    error_count += 1
-                    self.stdout.write(
-                        self.style.ERROR(f"✗ Error updating {artist.name}: {e}")
-                    )
+                    error_count += batch_artists
+                    self.stdout.write(self.style.ERROR(f"✗ Error fetching batch {number}/{len(batches)}: {e}"))
+                    continue
+
+                now = timezone.now()
+                for spotify_id, image_url in images.items():
+                    for pk, cached_image_url in artists_by_spotify_id[spotify_id]:
+                        if image_url and image_url != cached_image_url:
+                            pending.append(Artists(pk=pk, cached_image_url=image_url, image_last_updated=now))
+                            updated_count += 1
+                        elif self.stale:
+                            # Checked and unchanged: not stale again until IMAGE_MAX_AGE_HOURS from now
+                            pending.append(Artists(pk=pk, cached_image_url=cached_image_url, image_last_updated=now))
+
+                if len(pending) >= options['write_size']:
+                    self._write(pending)
+                    pending = []
+
+                self.stdout.write(f"Processed {processed_count}/{total_artists} artists...")
+
+        self._write(pending)
 
         # Summary
         self.stdout.write(
@@ -95,4 +160,9 @@ class Command(BaseCommand):
                 f"\nCompleted! Processed {processed_count} artists, "
                 f"updated {updated_count} images, {error_count} errors."
             )
-        )
\ No newline at end of file
+        )
+
+    def _write(self, artists):
+        if artists:
+            Artists.objects.bulk_update(artists, ['cached_image_url', 'image_last_updated'], batch_size=500)
+        return len(artists)
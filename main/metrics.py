@@ -0,0 +1,180 @@
+"""
+Request metrics for Musidoku
+RequestMetricsMiddleware opens a RequestMetrics for each API request; the database
+wrapper, the Spotify session hook and TimedSerializerMixin add to it. Finished
+requests are folded into per-view histograms served in Prometheus text format.
+Histograms are per process.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+
+_current = ContextVar('request_metrics', default=None)
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class RequestMetrics:
+    """
+    Timings collected while one request is handled
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.spotify_calls = 0
+        self.spotify_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.db_queries} queries"',
+            f'spotify;dur={self.spotify_time * 1000:.2f};desc="{self.spotify_calls} calls"',
+            f'serialize;dur={self.serializer_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record_query(duration):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.db_queries += 1
+        metrics.db_time += duration
+
+
+def record_spotify_call(duration):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.spotify_calls += 1
+        metrics.spotify_time += duration
+
+
+@contextmanager
+def time_serialization():
+    """
+    Adds the time spent in the block to the current request's serializer time.
+    Only the outermost block counts, so nested serializers aren't double counted.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics.serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_depth -= 1
+        if metrics.serializer_depth == 0:
+            metrics.serializer_time += time.perf_counter() - started
+
+
+class TimedSerializerMixin:
+    """
+    Adds the time spent in to_representation to the current request
+    """
+
+    def to_representation(self, instance):
+        with time_serialization():
+            return super().to_representation(instance)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# (metric name, help text, buckets, value taken from a finished request)
+HISTOGRAMS = [
+    ('musidoku_request_duration_seconds', 'Wall time per request', SECONDS_BUCKETS,
+     lambda metrics, total: total),
+    ('musidoku_db_queries', 'Database queries per request', COUNT_BUCKETS,
+     lambda metrics, total: metrics.db_queries),
+    ('musidoku_db_duration_seconds', 'Database time per request', SECONDS_BUCKETS,
+     lambda metrics, total: metrics.db_time),
+    ('musidoku_spotify_calls', 'Spotify API calls per request', COUNT_BUCKETS,
+     lambda metrics, total: metrics.spotify_calls),
+    ('musidoku_spotify_duration_seconds', 'Spotify API time per request', SECONDS_BUCKETS,
+     lambda metrics, total: metrics.spotify_time),
+    ('musidoku_serializer_duration_seconds', 'Serializer time per request', SECONDS_BUCKETS,
+     lambda metrics, total: metrics.serializer_time),
+]
+
+
+class MetricsRegistry:
+    """
+    Per-view histograms of finished requests
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}  # view name -> {metric name: Histogram}
+
+    def observe(self, view, metrics, total):
+        with self._lock:
+            histograms = self._views.get(view)
+            if histograms is None:
+                histograms = self._views[view] = {
+                    name: Histogram(buckets) for name, _, buckets, _ in HISTOGRAMS
+                }
+            for name, _, _, value in HISTOGRAMS:
+                histograms[name].observe(value(metrics, total))
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """
+        Prometheus text exposition format (0.0.4)
+        """
+        from .image_scheduler import image_scheduler
+
+        lines = []
+        with self._lock:
+            for name, help_text, buckets, _ in HISTOGRAMS:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for view, histograms in sorted(self._views.items()):
+                    histogram = histograms[name]
+                    label = view.replace('\\', '\\\\').replace('"', '\\"')
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{view="{label}"}} {round(histogram.sum, 6)}')
+                    lines.append(f'{name}_count{{view="{label}"}} {histogram.count}')
+
+        lines.append("# HELP musidoku_image_refresh_total Background artist image refresh events")
+        lines.append("# TYPE musidoku_image_refresh_total counter")
+        for event, value in sorted(image_scheduler.stats.items()):
+            lines.append(f'musidoku_image_refresh_total{{event="{event}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,129 @@
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_string
+from . import metrics
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ACCEPT_ENCODING_RE = _lazy_re_compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+COMPRESSIBLE_TYPES = ('application/json',)
+
+
+class RequestMetricsMiddleware:
+    """
+    Count queries and time the database, Spotify and serializers for every API
+    request; report them in a Server-Timing header and the /api/metrics histograms
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = getattr(settings, 'REQUEST_METRICS_PATH_PREFIX', '/api/')
+
+    def __call__(self, request):
+        if not request.path.startswith(self.prefix):
+            return self.get_response(request)
+
+        request_metrics, token = metrics.start_request()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self._time_query))
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+
+        total = request_metrics.elapsed()
+        response['Server-Timing'] = request_metrics.server_timing(total)
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.registry.observe(view, request_metrics, total)
+        return response
+
+    @staticmethod
+    def _time_query(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.record_query(time.perf_counter() - started)
+
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip for buffered JSON API responses, whichever the client prefers.
+    Streaming responses, already encoded responses and bodies smaller than
+    COMPRESSION_MIN_SIZE are sent as they are.
+
+    Pages outside COMPRESSION_PATH_PREFIX (the admin and other HTML carrying CSRF
+    tokens) are never compressed here, which keeps secrets out of reach of
+    BREACH-style length probing. Gzip output is also padded with up to
+    max_random_bytes random bytes, as Django's GZipMiddleware does.
+    """
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = getattr(settings, 'COMPRESSION_PATH_PREFIX', '/api/')
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path.startswith(self.prefix):
+            return response
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        # The body may be compressed for some clients, so caches must key on it
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < self.min_size:
+            return response
+
+        encoding = self.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            content = brotli.compress(response.content, quality=self.brotli_quality)
+        else:
+            content = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # The compressed body is not byte-for-byte the entity the strong ETag named
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    @staticmethod
+    def negotiate(accept_encoding):
+        """
+        'br' or 'gzip', whichever has the higher q-value (brotli on a tie), or None
+        """
+        weights = {}
+        for part in accept_encoding.split(','):
+            match = ACCEPT_ENCODING_RE.match(part)
+            if not match:
+                continue
+            try:
+                weights[match[1].lower()] = float(match[2]) if match[2] else 1.0
+            except ValueError:
+                continue
+
+        wildcard = weights.get('*', 0)
+        candidates = (['br'] if brotli else []) + ['gzip']
+        best = max(candidates, key=lambda coding: weights.get(coding, wildcard))
+        return best if weights.get(best, wildcard) > 0 else None
@@ -11,14 +11,14 @@ def populate_roster_numbers(apps, schema_editor):
     Artists = apps.get_model('main', 'Artists')
     
     # Get all artists ordered by creation date (earliest first)
-    artists = Artists.objects.all().order_by('created_at')
+    artists = list(Artists.objects.all().order_by('created_at').only('id'))
     
     # Assign roster numbers starting from 1
     for index, artist in enumerate(artists, start=1):
         artist.roster_number = index
-        artist.save(update_fields=['roster_number'])
+    Artists.objects.bulk_update(artists, ['roster_number'], batch_size=1000)
     
-    print(f"Assigned roster numbers to {artists.count()} artists")
+    print(f"Assigned roster numbers to {len(artists)} artists")
 
 
 def reverse_populate_roster_numbers(apps, schema_editor):
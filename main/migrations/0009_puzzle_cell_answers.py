@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:57
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0008_alter_albums_options_alter_artists_options_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="puzzle",
+            name="answers_built_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the per-cell answer sets were last materialized",
+                null=True,
+            ),
+        ),
+        migrations.CreateModel(
+            name="PuzzleCellAnswer",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("cell_index", models.CharField(max_length=10)),
+                (
+                    "artist",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="puzzle_answers",
+                        to="main.artists",
+                    ),
+                ),
+                (
+                    "puzzle",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cell_answers",
+                        to="main.puzzle",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Puzzle Cell Answer",
+                "verbose_name_plural": "Puzzle Cell Answers",
+                "unique_together": {("puzzle", "cell_index", "artist")},
+            },
+        ),
+    ]
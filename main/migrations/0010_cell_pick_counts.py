@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:59
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+def backfill_pick_counts(apps, schema_editor):
+    """
+    Seed the pick counters from the submissions that already exist
+    """
+    GameSubmission = apps.get_model("main", "GameSubmission")
+    CellPickCount = apps.get_model("main", "CellPickCount")
+
+    picks = (
+        GameSubmission.objects.values("puzzle_id", "cell_index", "selected_artist_id")
+        .annotate(count=models.Count("id"))
+        .order_by()
+    )
+    CellPickCount.objects.bulk_create(
+        (CellPickCount(**pick) for pick in picks.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0009_puzzle_cell_answers"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CellPickCount",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("cell_index", models.CharField(max_length=10)),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "puzzle",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pick_counts",
+                        to="main.puzzle",
+                    ),
+                ),
+                (
+                    "selected_artist",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pick_counts",
+                        to="main.artists",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Cell Pick Count",
+                "verbose_name_plural": "Cell Pick Counts",
+                "unique_together": {("puzzle", "cell_index", "selected_artist")},
+            },
+        ),
+        migrations.RunPython(backfill_pick_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:20
+
+from django.db import migrations
+
+TRIGRAM_INDEXES = {
+    "main_artists_name_trgm": "name",
+    "main_artists_genre_trgm": "spotify_primary_genre",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    GIN trigram indexes matching Django's icontains SQL (UPPER(col::text) LIKE ...)
+    Only PostgreSQL has them; other databases use the in-process search index.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for index_name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name} ON main_artists '
+            f'USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for index_name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {index_name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0011_puzzle_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
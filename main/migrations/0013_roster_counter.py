@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:11
+
+from django.db import migrations, models
+
+
+def seed_roster_counter(apps, schema_editor):
+    """
+    Number any artists still missing a roster number (by creation date) and
+    start the counter after the highest assigned number
+    """
+    Artists = apps.get_model("main", "Artists")
+    RosterCounter = apps.get_model("main", "RosterCounter")
+
+    last_value = (
+        Artists.objects.aggregate(max_roster=models.Max("roster_number"))["max_roster"]
+        or 0
+    )
+    missing = list(
+        Artists.objects.filter(roster_number__isnull=True)
+        .order_by("created_at")
+        .only("id")
+    )
+    for roster_number, artist in enumerate(missing, start=last_value + 1):
+        artist.roster_number = roster_number
+    Artists.objects.bulk_update(missing, ["roster_number"], batch_size=1000)
+    last_value += len(missing)
+
+    RosterCounter.objects.update_or_create(pk=1, defaults={"last_value": last_value})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0012_artist_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RosterCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_value", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Roster Counter",
+                "verbose_name_plural": "Roster Counter",
+            },
+        ),
+        migrations.RunPython(seed_roster_counter, migrations.RunPython.noop),
+    ]
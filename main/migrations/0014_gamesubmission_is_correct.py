@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0013_roster_counter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gamesubmission",
+            name="is_correct",
+            field=models.BooleanField(default=False),
+        ),
+    ]
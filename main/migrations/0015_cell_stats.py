@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:17
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+def backfill_cell_stats(apps, schema_editor):
+    """
+    Seed the per-cell totals from the submissions that already exist
+    """
+    GameSubmission = apps.get_model("main", "GameSubmission")
+    CellStats = apps.get_model("main", "CellStats")
+
+    cells = (
+        GameSubmission.objects.values("puzzle_id", "cell_index")
+        .annotate(
+            total_guesses=models.Count("id"),
+            correct_guesses=models.Count("id", filter=models.Q(is_correct=True)),
+            distinct_answers=models.Count("selected_artist", distinct=True),
+        )
+        .order_by()
+    )
+    CellStats.objects.bulk_create(
+        (CellStats(**cell) for cell in cells.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0014_gamesubmission_is_correct"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CellStats",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("cell_index", models.CharField(max_length=10)),
+                ("total_guesses", models.PositiveIntegerField(default=0)),
+                ("correct_guesses", models.PositiveIntegerField(default=0)),
+                ("distinct_answers", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "puzzle",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cell_stats",
+                        to="main.puzzle",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Cell Stats",
+                "verbose_name_plural": "Cell Stats",
+                "unique_together": {("puzzle", "cell_index")},
+            },
+        ),
+        migrations.RunPython(backfill_cell_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0015_cell_stats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="gamesubmission",
+            index=models.Index(
+                fields=["timestamp", "id"], name="submission_timestamp_id"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="gamesubmission",
+            index=models.Index(
+                fields=["puzzle", "timestamp", "id"], name="submission_puzzle_timestamp"
+            ),
+        ),
+    ]
@@ -1,8 +1,9 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 import uuid, re
-from .constants import GENRE_MAPPING
+from .constants import COUNTRY_CONTINENTS, COUNTRY_SUBREGIONS, GENRE_MAPPING
 
 # Create your models here.
 class Artists(models.Model):
@@ -35,6 +36,10 @@ class Artists(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     slug = models.SlugField(max_length=255, unique=True, editable=False, blank=True, null=True)
+    # Derived from origin_country and spotify_primary_genre on save, so groupings are indexed lookups
+    continent = models.CharField(max_length=50, blank=True, default='', db_index=True, editable=False)
+    subregion = models.CharField(max_length=50, blank=True, default='', db_index=True, editable=False)
+    genre_category = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
     
     class Meta:
         verbose_name = "Artist"
@@ -51,94 +56,99 @@ class Artists(models.Model):
     def get_disambiguator(self):
         return self.origin_country or str(self.debut_year)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so save() can tell what changed without re-reading the row
+        instance._loaded_values = dict(zip(field_names, values))
+        instance._loaded_name = instance._loaded_values.get('name')
+        return instance
+
+    def get_changed_fields(self):
+        """
+        Fields that differ from the values loaded from the database; None for new
+        artists or instances that weren't loaded from it
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        # Deferred fields could have been set without us seeing the old value
+        if self._state.adding or loaded is None or len(loaded) < len(self._meta.concrete_fields):
+            return None
+        return {name for name, value in loaded.items() if getattr(self, name) != value}
+
+    def derive_taxonomy(self):
+        """
+        Fill continent, subregion and genre_category from the country and genre
+        """
+        self.continent = COUNTRY_CONTINENTS.get(self.origin_country, '')
+        self.subregion = COUNTRY_SUBREGIONS.get(self.origin_country, '')
+        self.genre_category = self.normalized_genre or ''
+
     def save(self, *args, **kwargs):
+        from .slugs import SLUG_RETRIES, allocate_artist_slugs, is_slug_conflict
+
+        self.derive_taxonomy()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'origin_country', 'spotify_primary_genre'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'continent', 'subregion', 'genre_category'}
+
         # Handle slug generation
-        if not self.slug or self.name != Artists.objects.filter(pk=self.pk).first().name if self.pk else None:
-            base_slug = self.clean_slug(self.name)
-            slug = base_slug
-            counter = 1
-            while Artists.objects.filter(slug__iexact=slug).exclude(pk=self.pk).exists():
-                # For LISA vs LiSA, append disambiguator (country, etc.)
-                disambiguator = self.get_disambiguator()
-                slug = f"{base_slug}-{disambiguator.lower()}"
-                if Artists.objects.filter(slug__iexact=slug).exclude(pk=self.pk).exists():
-                    slug = f"{base_slug}-{disambiguator.lower()}-{counter}"
-                    counter += 1
-            self.slug = slug
+        loaded_name = getattr(self, '_loaded_name', None)
+        needs_slug = not self.slug or (loaded_name is not None and self.name != loaded_name)
+        if needs_slug:
+            allocate_artist_slugs([self])
         
         # Auto-assign roster number for new artists
-        if self.roster_number is None and self.pk is None:
-            # Get the highest existing roster number and add 1
-            max_roster = Artists.objects.aggregate(
-                max_roster=models.Max('roster_number')
-            )['max_roster']
-            self.roster_number = (max_roster or 0) + 1
+        if self.roster_number is None and self._state.adding:
+            self.roster_number = RosterCounter.reserve()
         
-        # Check if we should update the image from Spotify
-        should_fetch_image = (
-            self.spotify_id and  # Has Spotify ID
-            (not self.cached_image_url or  # No cached image
-             not self.pk or     # New artist being created
-             kwargs.get('force_image_update', False))  # Force update flag
-        )
+        # New artists and forced updates get their image from the background refresher,
+        # never from Spotify inside the save
+        force_image_update = kwargs.pop('force_image_update', False)
+        queue_image = self.spotify_id and (not self.cached_image_url or force_image_update)
         
-        # Save first to ensure the object exists
-        super().save(*args, **kwargs)
+        # Read by the post_save receivers to re-check only the affected categories
+        self._changed_fields = self.get_changed_fields()
         
-        # Fetch image from Spotify if needed
-        if should_fetch_image:
-            from .utils import fetch_artist_image_from_spotify
-            from django.utils import timezone
+        # Save first to ensure the object exists. A concurrent save may claim the
+        # same slug first; the unique index rejects ours and we allocate again
+        for attempt in range(SLUG_RETRIES + 1):
             try:
-                new_image_url = fetch_artist_image_from_spotify(self.spotify_id)
-                if new_image_url and new_image_url != self.cached_image_url:
-                    # Update cached image without triggering another save cycle
-                    Artists.objects.filter(pk=self.pk).update(
-                        cached_image_url=new_image_url,
-                        image_last_updated=timezone.now()
-                    )
-                    self.cached_image_url = new_image_url
-                    self.image_last_updated = timezone.now()
-            except Exception as e:
-                # Log error but don't fail the save operation
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Failed to fetch image for artist {self.name}: {e}")
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                break
+            except IntegrityError:
+                if not needs_slug or attempt == SLUG_RETRIES or not is_slug_conflict([self]):
+                    raise
+                allocate_artist_slugs([self])
+        self._loaded_name = self.name
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+        
+        if queue_image:
+            from .image_scheduler import image_scheduler
+            pk, spotify_id = self.pk, self.spotify_id
+            transaction.on_commit(lambda: image_scheduler.enqueue(pk, spotify_id))
     
+    @property
+    def image_is_stale(self):
+        from django.utils import timezone
+        from datetime import timedelta
+        from django.conf import settings
+
+        max_age = timedelta(hours=getattr(settings, 'IMAGE_MAX_AGE_HOURS', 24))
+        return not self.image_last_updated or timezone.now() - self.image_last_updated >= max_age
+
     @property
     def image(self):
         """
-        Automatically fetch and cache image from Spotify
-        Returns cached image if available and recent, otherwise fetches fresh
+        Return the cached image immediately (stale-while-revalidate).
+        Stale or missing images are queued for the background refresher
+        instead of calling Spotify inside the request.
         """
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        # If we have a cached image that's less than 24 hours old, use it
-        if (self.cached_image_url and self.image_last_updated and 
-            timezone.now() - self.image_last_updated < timedelta(hours=24)):
-            return self.cached_image_url
-        
-        # If we have a Spotify ID, try to fetch fresh image
-        if self.spotify_id:
-            from .utils import fetch_artist_image_from_spotify
-            try:
-                new_image_url = fetch_artist_image_from_spotify(self.spotify_id)
-                if new_image_url:
-                    # Update the cache
-                    Artists.objects.filter(pk=self.pk).update(
-                        cached_image_url=new_image_url,
-                        image_last_updated=timezone.now()
-                    )
-                    self.cached_image_url = new_image_url
-                    self.image_last_updated = timezone.now()
-                    return new_image_url
-            except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Failed to fetch fresh image for artist {self.name}: {e}")
+        if self.spotify_id and self.image_is_stale:
+            from .image_scheduler import image_scheduler
+            image_scheduler.record_stale_served()
+            image_scheduler.enqueue(self.pk, self.spotify_id)
         
-        # Fallback to cached image or None
         return self.cached_image_url
     
     
@@ -152,6 +162,41 @@ class Artists(models.Model):
             return mapped_genre
         return genre
 
+class RosterCounter(models.Model):
+    """
+    Single-row counter holding the last roster number handed out
+    """
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Roster Counter"
+        verbose_name_plural = "Roster Counter"
+
+    def __str__(self):
+        return f"Last roster number: {self.last_value}"
+
+    @classmethod
+    def reserve(cls, count=1):
+        """
+        Atomically reserve `count` consecutive roster numbers and return the first.
+        The increment takes the row lock, so concurrent callers get disjoint blocks.
+        """
+        with transaction.atomic():
+            counter = cls.objects.filter(pk=1)
+            if not counter.update(last_value=models.F('last_value') + count):
+                try:
+                    with transaction.atomic():
+                        # First use: continue from whatever is already assigned
+                        max_roster = Artists.objects.aggregate(
+                            max_roster=models.Max('roster_number')
+                        )['max_roster']
+                        cls.objects.create(pk=1, last_value=(max_roster or 0) + count)
+                except IntegrityError:
+                    # Another transaction created the row first
+                    counter.update(last_value=models.F('last_value') + count)
+            return counter.values_list('last_value', flat=True).get() - count + 1
+
+
 class Labels(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255, unique=True)
@@ -263,7 +308,9 @@ class Puzzle(models.Model):
     creator_pick_3_3 = models.ForeignKey(Artists, on_delete=models.SET_NULL, null=True, blank=True, related_name='pick_3_3')
 
     is_active = models.BooleanField(default=True)
+    answers_built_at = models.DateTimeField(blank=True, null=True, help_text="When the per-cell answer sets were last materialized")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Puzzle"
@@ -272,18 +319,214 @@ class Puzzle(models.Model):
     def __str__(self):
         return f"Puzzle for {self.puzzle_date}"
     
+class PuzzleCellAnswer(models.Model):
+    """
+    Materialized answer set: one row per valid artist for each cell of a puzzle
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    puzzle = models.ForeignKey(Puzzle, on_delete=models.CASCADE, related_name='cell_answers')
+    cell_index = models.CharField(max_length=10)  # '1,1', '1,2', etc.
+    artist = models.ForeignKey(Artists, on_delete=models.CASCADE, related_name='puzzle_answers')
+    
+    class Meta:
+        unique_together = ['puzzle', 'cell_index', 'artist']
+        verbose_name = "Puzzle Cell Answer"
+        verbose_name_plural = "Puzzle Cell Answers"
+    
+    def __str__(self):
+        return f"{self.puzzle.puzzle_date} - {self.cell_index} - {self.artist.name}"
+    
 class GameSubmission(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user_id = models.CharField(max_length=255)
     puzzle = models.ForeignKey(Puzzle, on_delete=models.CASCADE, related_name='submissions')
     cell_index = models.CharField(max_length=10)  # '1,1', '1,2', etc.
     selected_artist = models.ForeignKey(Artists, on_delete=models.CASCADE)
+    is_correct = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         unique_together = ['user_id', 'puzzle', 'selected_artist']  # Prevent repetition
+        indexes = [
+            # Keyset pagination for exports and cursor listings
+            models.Index(fields=['timestamp', 'id'], name='submission_timestamp_id'),
+            models.Index(fields=['puzzle', 'timestamp', 'id'], name='submission_puzzle_timestamp'),
+        ]
         verbose_name = "Game Submission"
         verbose_name_plural = "Game Submissions"
     
     def __str__(self):
-        return f"{self.user_id} - {self.puzzle.puzzle_date} - {self.cell_index}"
\ No newline at end of file
+        return f"{self.user_id} - {self.puzzle.puzzle_date} - {self.cell_index}"
+
+    def save(self, *args, **kwargs):
+        # Keep the pick counter in the same transaction as the insert
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                new_answer = CellPickCount.record_pick(self.puzzle_id, self.cell_index, self.selected_artist_id)
+                CellStats.record(
+                    self.puzzle_id, self.cell_index, correct=int(self.is_correct), distinct=int(new_answer)
+                )
+
+
+class CellPickCount(models.Model):
+    """
+    How many times an artist has been picked for a cell, maintained on submission
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    puzzle = models.ForeignKey(Puzzle, on_delete=models.CASCADE, related_name='pick_counts')
+    cell_index = models.CharField(max_length=10)  # '1,1', '1,2', etc.
+    selected_artist = models.ForeignKey(Artists, on_delete=models.CASCADE, related_name='pick_counts')
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['puzzle', 'cell_index', 'selected_artist']
+        verbose_name = "Cell Pick Count"
+        verbose_name_plural = "Cell Pick Counts"
+
+    def __str__(self):
+        return f"{self.puzzle.puzzle_date} - {self.cell_index} - {self.selected_artist.name}: {self.count}"
+
+    @classmethod
+    def record_pick(cls, puzzle_id, cell_index, artist_id, amount=1):
+        """
+        Atomically add `amount` picks, creating the counter row on first pick.
+        Returns True if this created the counter, i.e. the artist is a new answer.
+        """
+        counter = cls.objects.filter(puzzle_id=puzzle_id, cell_index=cell_index, selected_artist_id=artist_id)
+        if counter.update(count=models.F('count') + amount):
+            return False
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    puzzle_id=puzzle_id, cell_index=cell_index, selected_artist_id=artist_id, count=amount
+                )
+            return True
+        except IntegrityError:
+            # Another transaction created the row first
+            counter.update(count=models.F('count') + amount)
+            return False
+
+    @classmethod
+    def record_picks(cls, puzzle_id, picks):
+        """
+        Add one pick for each distinct (cell_index, artist_id) pair with one UPDATE
+        and one INSERT, falling back to record_pick if a counter appears meanwhile.
+        Returns the pairs whose counters were created (new answers).
+        """
+        picks = set(picks)
+        if not picks:
+            return set()
+        matches = models.Q()
+        for cell_index, artist_id in picks:
+            matches |= models.Q(cell_index=cell_index, selected_artist_id=artist_id)
+        existing = {
+            (cell_index, artist_id): pk for pk, cell_index, artist_id in cls.objects.filter(
+                matches, puzzle_id=puzzle_id
+            ).values_list('pk', 'cell_index', 'selected_artist_id')
+        }
+        cls.objects.filter(pk__in=existing.values()).update(count=models.F('count') + 1)
+
+        missing = picks - existing.keys()
+        try:
+            with transaction.atomic():
+                cls.objects.bulk_create([
+                    cls(puzzle_id=puzzle_id, cell_index=cell_index, selected_artist_id=artist_id, count=1)
+                    for cell_index, artist_id in missing
+                ])
+        except IntegrityError:
+            missing = {
+                (cell_index, artist_id) for cell_index, artist_id in missing
+                if cls.record_pick(puzzle_id, cell_index, artist_id)
+            }
+        return missing
+
+
+class CellStats(models.Model):
+    """
+    Running guess totals per puzzle cell, maintained on submission so the stats
+    endpoint never aggregates the submissions table
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    puzzle = models.ForeignKey(Puzzle, on_delete=models.CASCADE, related_name='cell_stats')
+    cell_index = models.CharField(max_length=10)  # '1,1', '1,2', etc.
+    total_guesses = models.PositiveIntegerField(default=0)
+    correct_guesses = models.PositiveIntegerField(default=0)
+    distinct_answers = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['puzzle', 'cell_index']
+        verbose_name = "Cell Stats"
+        verbose_name_plural = "Cell Stats"
+
+    def __str__(self):
+        return f"{self.puzzle.puzzle_date} - {self.cell_index}: {self.correct_guesses}/{self.total_guesses}"
+
+    @classmethod
+    def record(cls, puzzle_id, cell_index, guesses=1, correct=0, distinct=0):
+        """
+        Atomically add to a cell's totals (negative values undo), creating the row
+        on the first guess
+        """
+        stats = cls.objects.filter(puzzle_id=puzzle_id, cell_index=cell_index)
+        changes = {
+            'total_guesses': models.F('total_guesses') + guesses,
+            'correct_guesses': models.F('correct_guesses') + correct,
+            'distinct_answers': models.F('distinct_answers') + distinct,
+        }
+        if stats.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    puzzle_id=puzzle_id, cell_index=cell_index,
+                    total_guesses=guesses, correct_guesses=correct, distinct_answers=distinct
+                )
+        except IntegrityError:
+            # Another transaction created the row first
+            stats.update(**changes)
+
+
+class ImageRefreshJob(models.Model):
+    """
+    A batch of artists whose images an admin asked to refresh. Worked through in
+    the background by main.image_jobs; progress is written after every batch.
+    """
+    STATUSES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("cancelled", "Cancelled"),
+        ("failed", "Failed"),
+    ]
+    ACTIVE_STATUSES = ("pending", "running")
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUSES, default="pending", db_index=True)
+    artist_ids = models.JSONField(default=list, help_text="Artists to refresh, in processing order")
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    cancel_requested = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True, help_text="Last time a worker reported progress")
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Image Refresh Job"
+        verbose_name_plural = "Image Refresh Jobs"
+
+    def __str__(self):
+        return f"Image refresh of {self.total} artist(s) ({self.get_status_display()})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
@@ -0,0 +1,244 @@
+"""
+Pagination for the large list endpoints
+Page-number pagination stays the default. Clients opt in to keyset pagination
+with ?pagination=cursor, which walks an indexed, stable ordering instead of
+COUNT(*) + OFFSET. ?count=approximate swaps the exact count for an estimate in
+either mode, so the cost of a page doesn't grow with the table.
+
+The cursor records the last row's value for every ordering field, ending with
+the primary key, so rows that tie on the leading fields are neither skipped
+nor repeated between pages.
+"""
+from base64 import b64decode, b64encode
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+import binascii
+import json
+
+
+def approximate_count(queryset):
+    """
+    Planner row estimate on PostgreSQL; elsewhere an exact count capped at
+    APPROXIMATE_COUNT_CAP rows. Returns (count, is_exact).
+    """
+    queryset = queryset.order_by()
+    if connections[queryset.db].vendor == 'postgresql':
+        plan = json.loads(queryset.explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows']), False
+
+    cap = getattr(settings, 'APPROXIMATE_COUNT_CAP', 10000)
+    count = queryset[:cap + 1].count()
+    return min(count, cap), count <= cap
+
+
+class ApproximatePage(Page):
+    def has_next(self):
+        # The count may be short of the real total, so a full page might not be the last
+        if self.paginator.count_is_exact:
+            return super().has_next()
+        return len(self.object_list) == self.paginator.per_page
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator whose count is an estimate; pages past the estimate stay reachable
+    """
+
+    @cached_property
+    def count(self):
+        count, self.count_is_exact = approximate_count(self.object_list)
+        return count
+
+    def validate_number(self, number):
+        if self.count and self.count_is_exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = self.object_list[bottom:bottom + self.per_page]
+        if number > 1 and not self.count_is_exact and not len(object_list):
+            raise EmptyPage(self.error_messages['no_results'])
+        return self._get_page(object_list, number, self)
+
+    def _get_page(self, *args, **kwargs):
+        return ApproximatePage(*args, **kwargs)
+
+
+class KeysetPagination:
+    """
+    Cursor pagination over an ascending ordering, with the primary key appended
+    as a tie-breaker. The leading field may be nullable; its nulls sort last on
+    every database. The other fields must not be nullable.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering, page_size):
+        self.ordering = list(ordering)
+        if self.ordering[-1] not in ('pk', 'id'):
+            self.ordering.append('pk')
+        self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        opts = queryset.model._meta
+        self.fields = [opts.pk if name == 'pk' else opts.get_field(name) for name in self.ordering]
+        position, reverse = self.decode_cursor(request)
+
+        lead = self.fields[0]
+        ordering = [('-' if reverse else '') + field.name for field in self.fields[1:]]
+        if lead.null:
+            ordering.insert(0, F(lead.name).desc(nulls_first=True) if reverse else F(lead.name).asc(nulls_last=True))
+        else:
+            ordering.insert(0, ('-' if reverse else '') + lead.name)
+        rows = self._fetch(queryset.order_by(*ordering), position, reverse, self.page_size + 1)
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.first_position = self._position(rows[0]) if rows else position
+        self.last_position = self._position(rows[-1]) if rows else position
+        return rows
+
+    def _fetch(self, queryset, position, reverse, limit):
+        if position is None:
+            return list(queryset[:limit])
+        lead = self.fields[0]
+        if not lead.null:
+            return list(queryset.filter(self._beyond(position, reverse))[:limit])
+
+        # Nulls form a block after the non-null values; query each side of it on
+        # its own so both stay index range scans
+        at_null = position[0] is None
+        section = queryset.filter(**{f'{lead.name}__isnull': at_null})
+        rows = list(section.filter(self._beyond(position, reverse))[:limit])
+        if len(rows) < limit and at_null == reverse:
+            rows += list(queryset.filter(**{f'{lead.name}__isnull': not at_null})[:limit - len(rows)])
+        return rows
+
+    def _beyond(self, position, reverse):
+        """
+        Rows strictly after `position` in the ordering (before it if `reverse`),
+        compared field by field: (a > x) or (a = x and b > y) or ...
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(self.fields, position):
+            if value is None:
+                # Only the leading field can be null; _fetch keeps to the null section
+                equal &= Q(**{f'{field.name}__isnull': True})
+                continue
+            condition |= equal & Q(**{f"{field.name}__{'lt' if reverse else 'gt'}": value})
+            equal &= Q(**{field.name: value})
+        return condition
+
+    def _position(self, row):
+        if isinstance(row, dict):
+            return [row[field.attname] for field in self.fields]
+        return [getattr(row, field.attname) for field in self.fields]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            data = json.loads(b64decode(encoded.encode('ascii'), validate=True))
+            values = data['p']
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            if any(value is None for value in values[1:]):
+                raise ValueError
+            position = [
+                None if value is None else field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+            return position, bool(data.get('r'))
+        except (binascii.Error, UnicodeError, TypeError, KeyError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        # isoformat() keeps full microsecond precision, which DjangoJSONEncoder would truncate
+        data = json.dumps(
+            {'p': position, 'r': reverse} if reverse else {'p': position},
+            default=lambda value: value.isoformat() if hasattr(value, 'isoformat') else str(value),
+        )
+        return replace_query_param(self.base_url, self.cursor_query_param, b64encode(data.encode()).decode('ascii'))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.last_position, False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.first_position, True)
+
+
+class OptInCursorPagination(PageNumberPagination):
+    """
+    PageNumberPagination unless the request asks for ?pagination=cursor;
+    subclasses set cursor_ordering to an indexed ascending ordering (the
+    primary key is added as a tie-breaker)
+    """
+    cursor_ordering = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.approximate = request.query_params.get('count') == 'approximate'
+        self.cursor = None
+        if request.query_params.get('pagination') == 'cursor':
+            self.cursor = KeysetPagination(self.cursor_ordering, self.get_page_size(request))
+            if self.approximate:
+                self.approximate_count, self.count_is_exact = approximate_count(queryset)
+            return self.cursor.paginate_queryset(queryset, request, view)
+
+        self.django_paginator_class = ApproximateCountPaginator if self.approximate else Paginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor is None:
+            response = super().get_paginated_response(data)
+            if self.approximate:
+                response.data['count_is_approximate'] = not self.page.paginator.count_is_exact
+            return response
+
+        body = {'next': self.cursor.get_next_link(), 'previous': self.cursor.get_previous_link()}
+        if self.approximate:
+            body['count'] = self.approximate_count
+            body['count_is_approximate'] = not self.count_is_exact
+        body['results'] = data
+        return Response(body)
+
+
+class ArtistPagination(OptInCursorPagination):
+    cursor_ordering = ('roster_number',)
+
+
+class PuzzlePagination(OptInCursorPagination):
+    cursor_ordering = ('puzzle_date',)
+
+
+class SubmissionPagination(OptInCursorPagination):
+    cursor_ordering = ('timestamp', 'id')
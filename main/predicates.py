@@ -0,0 +1,228 @@
+"""
+Compiled category predicates for Musidoku
+Turns a Categories row into a reusable object that can check an artist in memory
+and produce the equivalent Q expression for database filtering
+"""
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from .models import Artists
+import json
+
+
+def _text(value):
+    return str(value).lower()
+
+
+# Python equivalents of the Django lookups we allow in validation_logic
+LOOKUP_CHECKS = {
+    'exact': lambda actual, expected: actual == expected,
+    'iexact': lambda actual, expected: _text(actual) == _text(expected),
+    'contains': lambda actual, expected: str(expected) in str(actual),
+    'icontains': lambda actual, expected: _text(expected) in _text(actual),
+    'startswith': lambda actual, expected: str(actual).startswith(str(expected)),
+    'istartswith': lambda actual, expected: _text(actual).startswith(_text(expected)),
+    'endswith': lambda actual, expected: str(actual).endswith(str(expected)),
+    'iendswith': lambda actual, expected: _text(actual).endswith(_text(expected)),
+    'in': lambda actual, expected: actual in expected,
+    'gt': lambda actual, expected: actual > expected,
+    'gte': lambda actual, expected: actual >= expected,
+    'lt': lambda actual, expected: actual < expected,
+    'lte': lambda actual, expected: actual <= expected,
+    'range': lambda actual, expected: expected[0] <= actual <= expected[1],
+}
+
+
+class CategoryPredicate:
+    """
+    A compiled category check.
+
+    `check` evaluates an artist instance in memory (None when the category can only
+    be answered by the database, e.g. lookups across relations) and `q` is the
+    equivalent filter on Artists (None when the check cannot be pushed down).
+    """
+
+    def __init__(self, category, check=None, q=None, description='', error=None, joins=False, field=None):
+        self.category_id = category.pk
+        self.updated_at = category.updated_at
+        self.check = check
+        self.q = q
+        self.description = description
+        self.error = error
+        # True when `q` spans a multi-valued relation and may duplicate rows
+        self.joins = joins
+        # The concrete Artists field the check reads, so edits to other fields can skip
+        # it; None for relations and properties, which any change may affect
+        self.field = field if field and _get_concrete_field(field) is not None else None
+
+    @property
+    def in_memory(self):
+        return self.check is not None
+
+    @property
+    def pushdown(self):
+        return self.q is not None
+
+    def depends_on(self, changed_fields):
+        """
+        Whether an artist edit touching `changed_fields` (None: unknown or a new
+        artist) can change this check's answer
+        """
+        if changed_fields is None or self.joins or self.field is None:
+            return True
+        return self.field in changed_fields
+
+    def evaluate(self, artist):
+        """
+        Returns (is_valid, reason) for the given artist
+        """
+        if self.error:
+            return False, self.error
+
+        if self.check is not None:
+            return self.check(artist)
+
+        try:
+            if Artists.objects.filter(pk=artist.pk).filter(self.q).exists():
+                return True, "Artist matches validation logic"
+            return False, f"Artist does not match logic: {self.description}"
+        except Exception as e:
+            return False, f"Invalid validation_logic: {e}"
+
+    def matches(self, artist):
+        return self.evaluate(artist)[0]
+
+
+def _get_concrete_field(name):
+    try:
+        field = Artists._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.concrete else None
+
+
+def _compile_logic(category):
+    try:
+        logic = json.loads(category.validation_logic)
+        field_name = logic["field"]
+        lookup = logic["lookup"]
+        value = logic["value"]
+    except Exception as e:
+        return CategoryPredicate(category, error=f"Invalid validation_logic: {e}")
+
+    filter_expr = {f"{field_name}__{lookup}": value}
+    q = Q(**filter_expr)
+    description = str(filter_expr)
+
+    # Lookups across relations (or ones we don't mirror) are answered by the database
+    field = None
+    if '__' not in field_name:
+        try:
+            field = Artists._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            return CategoryPredicate(category, error=f"Invalid validation_logic: unknown field {field_name}")
+        if not field.concrete:
+            field = None
+
+    if lookup == 'isnull' and field is not None:
+        expected_null = bool(value)
+
+        def check(artist):
+            if (getattr(artist, field.attname) is None) == expected_null:
+                return True, "Artist matches validation logic"
+            return False, f"Artist does not match logic: {description}"
+
+        return CategoryPredicate(category, check=check, q=q, description=description, field=field_name)
+
+    compare = LOOKUP_CHECKS.get(lookup)
+    if field is None or compare is None:
+        return CategoryPredicate(
+            category, q=q, description=description, joins='__' in field_name, field=field_name
+        )
+
+    try:
+        if lookup in ('in', 'range'):
+            expected = [field.to_python(item) for item in value]
+        elif lookup in ('exact', 'gt', 'gte', 'lt', 'lte'):
+            expected = field.to_python(value)
+        else:
+            expected = value
+    except (TypeError, ValidationError) as e:
+        return CategoryPredicate(category, error=f"Invalid validation_logic: {e}")
+
+    def check(artist):
+        actual = getattr(artist, field.attname)
+        if actual is None:
+            # SQL comparisons against NULL never match, except `exact None`
+            matched = lookup == 'exact' and expected is None
+        else:
+            matched = expected is not None and compare(actual, expected)
+        if matched:
+            return True, "Artist matches validation logic"
+        return False, f"Artist does not match logic: {description}"
+
+    return CategoryPredicate(category, check=check, q=q, description=description, field=field_name)
+
+
+def _compile_field_value(category):
+    field_name = category.validation_field
+    value = category.validation_value
+    field = _get_concrete_field(field_name)
+
+    def check(artist):
+        # Get the value from the artist dynamically
+        artist_value = getattr(artist, field_name, None)
+        if artist_value is None:
+            return False, f"Artist does not have field {field_name}"
+
+        # For boolean fields
+        if isinstance(artist_value, bool):
+            expected = value is not None and value.lower() == "true"
+            return artist_value == expected, f"Expected {expected}, got {artist_value}"
+
+        # For other types (string, int, etc.)
+        return str(artist_value) == str(value), f"Expected {value}, got {artist_value}"
+
+    q = None
+    if field is not None:
+        if value is None:
+            q = Q(pk__in=[])
+        elif field.get_internal_type() == 'BooleanField':
+            q = Q(**{field_name: value.lower() == "true"})
+        else:
+            try:
+                q = Q(**{field_name: field.to_python(value)})
+            except ValidationError:
+                # Mirrors str(artist_value) == str(value): nothing can match
+                q = Q(pk__in=[])
+
+    return CategoryPredicate(category, check=check, q=q, description=f"{field_name}={value}", field=field_name)
+
+
+def compile_category(category):
+    """
+    Compile a category into a CategoryPredicate
+    """
+    if category.validation_logic:
+        return _compile_logic(category)
+    return _compile_field_value(category)
+
+
+_predicate_cache = {}
+
+
+def get_category_predicate(category):
+    """
+    Return the compiled predicate for a category, cached by id and updated_at
+    """
+    predicate = _predicate_cache.get(category.pk)
+    if predicate is None or predicate.updated_at != category.updated_at:
+        predicate = compile_category(category)
+        _predicate_cache[category.pk] = predicate
+    return predicate
+
+
+def clear_predicate_cache(category_id=None):
+    if category_id is None:
+        _predicate_cache.clear()
+    else:
+        _predicate_cache.pop(category_id, None)
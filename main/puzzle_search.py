@@ -0,0 +1,63 @@
+"""
+Candidate grid search for the puzzle generator
+Pure Python (no Django imports) so it can run inside process pool workers; grids are
+scored from a precomputed matrix of pairwise category intersection counts
+"""
+import random
+
+# Set in each worker by init_worker
+_pair_counts = None
+
+
+def init_worker(pair_counts):
+    global _pair_counts
+    _pair_counts = pair_counts
+
+
+def grid_counts(pair_counts, rows, columns):
+    return [pair_counts[row][column] for row in rows for column in columns]
+
+
+def search_grids(task):
+    """
+    Random search for grids that satisfy the solvability and difficulty rules.
+
+    `task` is (seed, options) where options holds min_answers, min_avg_answers,
+    max_avg_answers, attempts and candidates. Returns up to `candidates` distinct
+    (rows, columns, counts) tuples; the caller picks one that avoids repeats.
+    """
+    seed, options = task
+    pair_counts = _pair_counts
+    size = len(pair_counts)
+    rng = random.Random(seed)
+    min_answers = options['min_answers']
+    found = {}
+
+    if size < 6:
+        return []
+
+    for _ in range(options['attempts']):
+        rows = rng.sample(range(size), 3)
+        # Columns must give every row at least min_answers artists
+        usable = [
+            column for column in range(size)
+            if column not in rows and all(pair_counts[row][column] >= min_answers for row in rows)
+        ]
+        if len(usable) < 3:
+            continue
+
+        columns = rng.sample(usable, 3)
+        counts = grid_counts(pair_counts, rows, columns)
+        average = sum(counts) / len(counts)
+        if average < options['min_avg_answers']:
+            continue
+        if options['max_avg_answers'] is not None and average > options['max_avg_answers']:
+            continue
+
+        key = (frozenset(rows), frozenset(columns))
+        if key not in found:
+            found[key] = (tuple(rows), tuple(columns), counts)
+            if len(found) >= options['candidates']:
+                break
+
+    return list(found.values())
@@ -0,0 +1,34 @@
+"""
+JSON rendering for the API
+OrjsonRenderer produces the same bytes as DRF's JSONRenderer for compact
+output, but encodes with orjson when it is installed. Anything orjson can't
+handle natively (datetimes, Decimals, lazy strings, querysets) is passed to
+DRF's encoder, so the output format doesn't change.
+"""
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonRenderer(JSONRenderer):
+    # DRF formats datetimes differently from orjson (millisecond precision, 'Z' suffix)
+    orjson_options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=self.orjson_options)
+        except TypeError:
+            # Integers beyond 64 bits and the like; the stock encoder copes
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer, so the output is a strict JavaScript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
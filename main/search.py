@@ -0,0 +1,223 @@
+"""
+Artist search for Musidoku
+Ranked, prefix-first name search. On PostgreSQL it runs against trigram GIN indexes
+(see migration 0012); elsewhere an in-process n-gram index answers name and genre
+matches and keeps itself up to date through the Artists signals
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils import timezone
+from .models import Artists
+import heapq
+import threading
+
+MAX_GRAM = 3
+
+
+def _normalize(text):
+    return ' '.join(str(text).lower().split())
+
+
+def _grams(text):
+    """All substrings of length 1..MAX_GRAM"""
+    return {
+        text[start:start + size]
+        for size in range(1, MAX_GRAM + 1)
+        for start in range(len(text) - size + 1)
+    }
+
+
+def _rank(name, query):
+    """0 = name starts with the query, 1 = a word starts with it, 2 = anywhere"""
+    if name.startswith(query):
+        return 0
+    if f" {query}" in name:
+        return 1
+    return 2
+
+
+class ArtistNgramIndex:
+    """
+    Process-local n-gram index over artist names (plus a genre lookup table)
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.names = {}                   # artist id -> normalized name
+        self.grams = defaultdict(set)     # gram -> artist ids
+        self.genre_of = {}                # artist id -> normalized genre
+        self.genres = defaultdict(set)    # normalized genre -> artist ids
+        self.built_at = None
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def is_expired(self):
+        ttl = getattr(settings, 'ARTIST_INDEX_TTL', 300)
+        return not self.is_built or (timezone.now() - self.built_at).total_seconds() > ttl
+
+    def build(self):
+        rows = Artists.objects.values_list('id', 'name', 'spotify_primary_genre')
+        with self._lock:
+            self.names.clear()
+            self.grams.clear()
+            self.genre_of.clear()
+            self.genres.clear()
+            for artist_id, name, genre in rows.iterator(chunk_size=2000):
+                self._add(artist_id, name, genre)
+            self.built_at = timezone.now()
+        return self
+
+    def ensure_built(self):
+        if self.is_expired():
+            self.build()
+        return self
+
+    def _add(self, artist_id, name, genre):
+        name = _normalize(name)
+        self.names[artist_id] = name
+        for gram in _grams(name):
+            self.grams[gram].add(artist_id)
+        genre = _normalize(genre or '')
+        self.genre_of[artist_id] = genre
+        self.genres[genre].add(artist_id)
+
+    def _remove(self, artist_id):
+        name = self.names.pop(artist_id, None)
+        if name is None:
+            return
+        for gram in _grams(name):
+            self.grams[gram].discard(artist_id)
+        genre = self.genre_of.pop(artist_id)
+        self.genres[genre].discard(artist_id)
+
+    def update_artist(self, artist):
+        with self._lock:
+            self._remove(artist.id)
+            self._add(artist.id, artist.name, artist.spotify_primary_genre)
+
+    def remove_artist(self, artist_id):
+        with self._lock:
+            self._remove(artist_id)
+
+    def name_matches(self, query):
+        """
+        Ids of artists whose name contains the query
+        """
+        query = _normalize(query)
+        if not query:
+            return set()
+        if len(query) <= MAX_GRAM:
+            return set(self.grams.get(query, ()))
+
+        posting_lists = sorted(
+            (self.grams.get(query[start:start + MAX_GRAM], set()) for start in range(len(query) - MAX_GRAM + 1)),
+            key=len
+        )
+        candidates = set(posting_lists[0])
+        for posting in posting_lists[1:]:
+            candidates &= posting
+            if not candidates:
+                return candidates
+        return {artist_id for artist_id in candidates if query in self.names[artist_id]}
+
+    def genre_matches(self, query):
+        query = _normalize(query)
+        matches = set()
+        for genre, artist_ids in self.genres.items():
+            if query in genre:
+                matches |= artist_ids
+        return matches
+
+    def search(self, query, limit):
+        """
+        Ranked artist ids: name prefix first, then word prefix, then substring
+        """
+        normalized = _normalize(query)
+        return [
+            artist_id for rank, name, artist_id in heapq.nsmallest(
+                limit,
+                ((_rank(self.names[artist_id], normalized), self.names[artist_id], artist_id)
+                 for artist_id in self.name_matches(normalized)),
+            )
+        ]
+
+
+artist_ngram_index = ArtistNgramIndex()
+
+
+def uses_database_index():
+    backend = getattr(settings, 'ARTIST_SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        return connection.vendor == 'postgresql'
+    return backend == 'database'
+
+
+def get_search_limit(value):
+    """
+    Clamp a ?limit= value to ARTIST_SEARCH_MAX_LIMIT
+    """
+    default = getattr(settings, 'ARTIST_SEARCH_DEFAULT_LIMIT', 10)
+    maximum = getattr(settings, 'ARTIST_SEARCH_MAX_LIMIT', 50)
+    try:
+        limit = int(value) if value else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def _rank_annotation(query):
+    return Case(
+        When(name__istartswith=query, then=Value(0)),
+        When(name__icontains=f" {query}", then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+
+
+def suggest_artists(query, limit):
+    """
+    Ranked autocomplete results as a queryset of at most `limit` artists
+    """
+    query = query.strip()
+    if uses_database_index():
+        return Artists.objects.filter(name__icontains=query).annotate(
+            search_rank=_rank_annotation(query)
+        ).order_by('search_rank', 'name', 'pk')[:limit]
+
+    artist_ids = artist_ngram_index.ensure_built().search(query, limit)
+    order = Case(
+        *[When(id=artist_id, then=Value(position)) for position, artist_id in enumerate(artist_ids)],
+        output_field=IntegerField(),
+    )
+    return Artists.objects.filter(id__in=artist_ids).order_by(order) if artist_ids else Artists.objects.none()
+
+
+def search_artists(queryset, query):
+    """
+    Filter a queryset by name, genre, debut year or country code, with
+    name-prefix matches first
+    """
+    query = query.strip()
+    if uses_database_index():
+        matches = Q(name__icontains=query) | Q(spotify_primary_genre__icontains=query)
+    else:
+        index = artist_ngram_index.ensure_built()
+        matches = Q(id__in=index.name_matches(query) | index.genre_matches(query))
+
+    # Years and country codes still match anywhere ("99" finds 1999, "u" finds
+    # AU and US), resolved against their few distinct values so the filter
+    # is an IN lookup rather than icontains on every row
+    if query.isdigit() and len(query) <= 4:
+        years = Artists.objects.order_by().values_list('debut_year', flat=True).distinct()
+        matches |= Q(debut_year__in=[year for year in years if year is not None and query in str(year)])
+    if len(query) <= 2 and query.isalpha():
+        codes = Artists.objects.order_by().values_list('origin_country', flat=True).distinct()
+        matches |= Q(origin_country__in=[code for code in codes if query.upper() in code.upper()])
+
+    return queryset.filter(matches).annotate(
+        search_rank=_rank_annotation(query)
+    ).order_by('search_rank', 'name', 'pk')
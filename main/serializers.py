@@ -1,7 +1,11 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Categories, Puzzle, Artists, GameSubmission
+from .metrics import TimedSerializerMixin, time_serialization
 
-class ArtistSerializer(serializers.ModelSerializer):
+class ArtistSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     normalized_genre = serializers.CharField(source='spotify_primary_genre', read_only=True)
     
     class Meta:
@@ -10,13 +14,53 @@ class ArtistSerializer(serializers.ModelSerializer):
                   'spotify_id', 'spotify_primary_genre', 'normalized_genre', 'image',
                   'uses_stage_name', 'has_grammy_win', 'has_hot100_entry', 'is_deceased', 'is_disbanded']
         
-class CategorySerializer(serializers.ModelSerializer):
+# Columns read by serialize_artist_values; output keys follow ArtistSerializer.Meta.fields
+ARTIST_VALUE_FIELDS = ['id', 'roster_number', 'name', 'artist_type', 'origin_country', 'debut_year',
+                       'spotify_id', 'spotify_primary_genre', 'cached_image_url', 'image_last_updated',
+                       'uses_stage_name', 'has_grammy_win', 'has_hot100_entry', 'is_deceased', 'is_disbanded']
+
+def serialize_artist_values(rows):
+    """
+    Same output as ArtistSerializer(many=True) for rows of
+    .values(*ARTIST_VALUE_FIELDS), without building model instances or going
+    through DRF fields. Stale images are still queued for the background refresher.
+    """
+    from .image_scheduler import image_scheduler
+
+    rows = list(rows)
+    with time_serialization():
+        stale_before = timezone.now() - timedelta(hours=getattr(settings, 'IMAGE_MAX_AGE_HOURS', 24))
+        data = []
+        for row in rows:
+            if row['spotify_id'] and (not row['image_last_updated'] or row['image_last_updated'] <= stale_before):
+                image_scheduler.record_stale_served()
+                image_scheduler.enqueue(row['id'], row['spotify_id'])
+            data.append({
+                'id': str(row['id']),
+                'roster_number': row['roster_number'],
+                'name': row['name'],
+                'artist_type': row['artist_type'],
+                'origin_country': row['origin_country'],
+                'debut_year': row['debut_year'],
+                'spotify_id': row['spotify_id'],
+                'spotify_primary_genre': row['spotify_primary_genre'],
+                'normalized_genre': row['spotify_primary_genre'],
+                'image': row['cached_image_url'],
+                'uses_stage_name': row['uses_stage_name'],
+                'has_grammy_win': row['has_grammy_win'],
+                'has_hot100_entry': row['has_hot100_entry'],
+                'is_deceased': row['is_deceased'],
+                'is_disbanded': row['is_disbanded'],
+            })
+        return data
+
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Categories
         fields = ['id', 'code', 'display_name', 'description', 'category_type',
                   'validation_field', 'validation_value', 'validation_logic', 'is_active']
 
-class PuzzleSerializer(serializers.ModelSerializer):
+class PuzzleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     categories= serializers.SerializerMethodField()
     
     class Meta:
@@ -31,25 +75,23 @@ class PuzzleSerializer(serializers.ModelSerializer):
                 CategorySerializer(obj.category_row_3).data
             ],
             'columns': [
-                CategorySerializer(obj.category_column_1).data,
-                CategorySerializer(obj.category_column_2).data,
-                CategorySerializer(obj.category_column_3).data
+                CategorySerializer(obj.category_col_1).data,
+                CategorySerializer(obj.category_col_2).data,
+                CategorySerializer(obj.category_col_3).data
             ]
         }
         
-class GameSubmissionSerializer(serializers.ModelSerializer):
+class GameSubmissionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     artist_name = serializers.CharField(source='selected_artist.name', read_only=True)
     
     class Meta:
         model = GameSubmission
         fields = ['id', 'user_id', 'puzzle', 'cell_index', 'selected_artist',
-                  'artist_name', 'is_correct', 'created_at', 'updated_at']
+                  'artist_name', 'is_correct', 'timestamp']
         
-class ValidateGuessSerializer(serializers.Serializer):
-    user_id = serializers.IntegerField()
-    puzzle_id = serializers.IntegerField()
-    cell_index = serializers.IntegerField()
-    artist_id = serializers.IntegerField()
+class GuessSerializer(serializers.Serializer):
+    cell_index = serializers.CharField(max_length=10)
+    selected_artist_id = serializers.UUIDField()
 
     def validate_cell_index(self, value):
         if not value or ',' not in str(value):
@@ -62,4 +104,15 @@ class ValidateGuessSerializer(serializers.Serializer):
                 raise serializers.ValidationError("Cell index must be between 1,1 and 3,3.")
         except ValueError:
             raise serializers.ValidationError("Cell index must be a valid string with comma-separated integers.")
-        return value
\ No newline at end of file
+        return value
+
+
+class ValidateGuessSerializer(GuessSerializer):
+    user_id = serializers.CharField(max_length=255)
+    puzzle_id = serializers.UUIDField()
+
+
+class ValidateGuessesSerializer(serializers.Serializer):
+    user_id = serializers.CharField(max_length=255)
+    puzzle_id = serializers.UUIDField()
+    guesses = GuessSerializer(many=True, min_length=1, max_length=9)
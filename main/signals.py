@@ -1,31 +1,163 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Artists
-import logging
+from .models import (
+    Artists, ArtistLabels, Albums, AlbumCollabs, Categories, Puzzle, GameSubmission, CellPickCount, CellStats
+)
+from .bitset_index import artist_index
+from .search import artist_ngram_index
+
+
+# Saves that only touch these fields can't change which cells an artist answers
+IMAGE_FIELDS = {'cached_image_url', 'image_last_updated'}
+
+@receiver(post_save, sender=Puzzle)
+def build_puzzle_answer_sets(sender, instance, **kwargs):
+    """
+    Materialize the per-cell answer sets whenever a puzzle is saved or activated
+    """
+    from .logic import PuzzleManager
+    transaction.on_commit(lambda: PuzzleManager.build_answer_sets(instance))
+
+
+@receiver(post_save, sender=Categories)
+def refresh_category_answer_sets(sender, instance, **kwargs):
+    """
+    Rebuild answer sets of puzzles that use an edited category
+    """
+    from .logic import PuzzleManager
+    transaction.on_commit(lambda: PuzzleManager.refresh_answer_sets_for_category(instance))
+
+
+@receiver(post_save, sender=Artists)
+def refresh_artist_answer_sets(sender, instance, update_fields=None, **kwargs):
+    """
+    Re-evaluate an added or edited artist against the puzzles whose categories
+    read the fields that changed
+    """
+    if update_fields and set(update_fields) <= IMAGE_FIELDS:
+        return
+    changed_fields = getattr(instance, '_changed_fields', None)
+    if changed_fields is not None:
+        changed_fields = changed_fields - IMAGE_FIELDS - {'updated_at'}
+        if not changed_fields:
+            return
+    from .logic import PuzzleManager
+    transaction.on_commit(lambda: PuzzleManager.refresh_answer_sets_for_artist(instance, changed_fields))
+
+
+def refresh_related_artists(artist_ids):
+    """
+    Re-check artists whose labels or albums changed against every category; the
+    relation-based ones read those tables, not the artist row
+    """
+    from .logic import PuzzleManager
+
+    def refresh():
+        # Artists deleted in the same transaction have nothing left to refresh
+        for artist in Artists.objects.filter(pk__in=list(artist_ids)):
+            PuzzleManager.refresh_answer_sets_for_artist(artist, None)
+            if artist_index.is_built:
+                artist_index.update_artist(artist)
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=ArtistLabels)
+@receiver(post_delete, sender=ArtistLabels)
+def refresh_label_artist(sender, instance, **kwargs):
+    refresh_related_artists([instance.artist_id])
+
+
+@receiver(post_save, sender=Albums)
+@receiver(post_delete, sender=Albums)
+def refresh_album_artists(sender, instance, **kwargs):
+    # Album fields are also read through the collaborators' collab_albums relation
+    artist_ids = {instance.primary_artist_id}
+    artist_ids.update(AlbumCollabs.objects.filter(album_id=instance.pk).values_list('collab_artist_id', flat=True))
+    refresh_related_artists(artist_ids)
+
+
+@receiver(post_save, sender=AlbumCollabs)
+@receiver(post_delete, sender=AlbumCollabs)
+def refresh_collab_artist(sender, instance, **kwargs):
+    refresh_related_artists([instance.collab_artist_id_id])
 
-logger = logging.getLogger(__name__)
 
 @receiver(post_save, sender=Artists)
-def update_artist_image_on_save(sender, instance, created, **kwargs):
-    """
-    Update artist image when an artist is saved
-    Only for new artists or when spotify_id changes
-    """
-    if created and instance.spotify_id and not instance.cached_image_url:
-        # For new artists, try to fetch image synchronously but with timeout protection
-        try:
-            from .utils import fetch_artist_image_from_spotify
-            from django.utils import timezone
-            
-            new_image_url = fetch_artist_image_from_spotify(instance.spotify_id)
-            if new_image_url:
-                # Update the cache directly in the database
-                Artists.objects.filter(pk=instance.pk).update(
-                    cached_image_url=new_image_url,
-                    image_last_updated=timezone.now()
-                )
-                logger.info(f"Updated image for new artist: {instance.name}")
-                
-        except Exception as e:
-            logger.warning(f"Could not fetch image for new artist {instance.name}: {e}")
-            # Don't fail the save operation if image fetch fails
\ No newline at end of file
+def update_artist_index(sender, instance, update_fields=None, **kwargs):
+    if artist_index.is_built and not (update_fields and set(update_fields) <= IMAGE_FIELDS):
+        artist_index.update_artist(instance)
+
+
+@receiver(post_delete, sender=Artists)
+def remove_artist_from_index(sender, instance, **kwargs):
+    if artist_index.is_built:
+        artist_index.remove_artist(instance.pk)
+
+
+@receiver(post_save, sender=Artists)
+def update_artist_search_index(sender, instance, update_fields=None, **kwargs):
+    if artist_ngram_index.is_built and not (update_fields and set(update_fields) <= IMAGE_FIELDS):
+        artist_ngram_index.update_artist(instance)
+
+
+@receiver(post_delete, sender=Artists)
+def remove_artist_from_search_index(sender, instance, **kwargs):
+    if artist_ngram_index.is_built:
+        artist_ngram_index.remove_artist(instance.pk)
+
+
+@receiver(post_save, sender=Categories)
+def update_category_index(sender, instance, **kwargs):
+    if artist_index.is_built:
+        artist_index.update_category(instance)
+
+
+@receiver(post_delete, sender=Categories)
+def remove_category_from_index(sender, instance, **kwargs):
+    if artist_index.is_built:
+        artist_index.remove_category(instance.pk)
+
+
+@receiver(post_delete, sender=GameSubmission)
+def release_pick_count(sender, instance, **kwargs):
+    """
+    Keep the pick counters and cell stats in step when submissions are removed
+    """
+    CellPickCount.record_pick(instance.puzzle_id, instance.cell_index, instance.selected_artist_id, amount=-1)
+    # Drop emptied counters so a later pick counts as a new distinct answer again
+    last_pick, _ = CellPickCount.objects.filter(
+        puzzle_id=instance.puzzle_id, cell_index=instance.cell_index,
+        selected_artist_id=instance.selected_artist_id, count__lte=0
+    ).delete()
+    CellStats.record(
+        instance.puzzle_id, instance.cell_index,
+        guesses=-1, correct=-int(instance.is_correct), distinct=-last_pick
+    )
+
+
+@receiver(post_save, sender=Puzzle)
+@receiver(post_delete, sender=Puzzle)
+def invalidate_today_puzzle_on_puzzle_change(sender, instance, **kwargs):
+    from .logic import PuzzleManager
+    PuzzleManager.invalidate_today_puzzle(instance.puzzle_date)
+
+
+@receiver(post_save, sender=Puzzle)
+@receiver(post_delete, sender=Puzzle)
+def invalidate_cached_puzzle(sender, instance, **kwargs):
+    from .logic import PuzzleManager
+    PuzzleManager.invalidate_puzzle_cache([instance.pk])
+
+
+@receiver(post_save, sender=Artists)
+@receiver(post_delete, sender=Artists)
+def invalidate_cached_artist(sender, instance, **kwargs):
+    from .logic import PuzzleManager
+    PuzzleManager.invalidate_artist_cache(instance.pk)
+
+
+@receiver(post_save, sender=Categories)
+def invalidate_today_puzzle_on_category_change(sender, instance, **kwargs):
+    from .logic import PuzzleManager
+    PuzzleManager.invalidate_today_puzzle()
@@ -0,0 +1,98 @@
+"""
+Slug allocation for Artists
+Slugs for a whole batch of artists are resolved from one query for the colliding
+candidates, and LISA/LiSA-style disambiguation happens in memory. The unique index
+on slug is the final arbiter: writers retry allocation on IntegrityError.
+"""
+from django.db.models import Q
+
+# Numbered-slug prefixes OR'ed into one query; keeps SQLite below its expression depth limit
+PREFIXES_PER_QUERY = 200
+
+# Times a writer re-allocates after losing a race for a slug
+SLUG_RETRIES = 3
+
+
+def base_slug(artist):
+    return artist.clean_slug(artist.name)
+
+
+def _taken_slugs(slugs, exclude_ids):
+    """
+    Which of the candidate slugs are already used by other artists
+    """
+    from .models import Artists
+
+    return set(Artists.objects.filter(slug__in=slugs).exclude(pk__in=exclude_ids).values_list('slug', flat=True))
+
+
+def _taken_numbered_slugs(prefixes, exclude_ids):
+    """
+    Existing '<prefix>-N' slugs for the (rare) artists whose plain and
+    disambiguated slugs are both taken
+    """
+    from .models import Artists
+
+    prefixes = sorted(prefixes)
+    taken = set()
+    for start in range(0, len(prefixes), PREFIXES_PER_QUERY):
+        collisions = Q()
+        for prefix in prefixes[start:start + PREFIXES_PER_QUERY]:
+            collisions |= Q(slug__startswith=f"{prefix}-")
+        taken.update(
+            Artists.objects.filter(collisions).exclude(pk__in=exclude_ids).values_list('slug', flat=True)
+        )
+    return taken
+
+
+def allocate_artist_slugs(artists):
+    """
+    Assign a unique slug to every artist in the list (in place). The plain and
+    disambiguated candidates for the whole batch are checked in one indexed query.
+    """
+    if not artists:
+        return
+    exclude_ids = [artist.pk for artist in artists if artist.pk]
+    candidates = [
+        (base_slug(artist), f"{base_slug(artist)}-{artist.get_disambiguator().lower()}")
+        for artist in artists
+    ]
+    taken = _taken_slugs({slug for pair in candidates for slug in pair}, exclude_ids)
+
+    # Artists that will need a numbered slug, counting duplicates within the batch
+    needs_number = set()
+    claimed = set(taken)
+    for base, disambiguated in candidates:
+        if base not in claimed:
+            claimed.add(base)
+        elif disambiguated not in claimed:
+            claimed.add(disambiguated)
+        else:
+            needs_number.add(disambiguated)
+    if needs_number:
+        taken |= _taken_numbered_slugs(needs_number, exclude_ids)
+
+    for artist, (base, disambiguated) in zip(artists, candidates):
+        slug = base
+        if slug in taken:
+            # For LISA vs LiSA, append disambiguator (country, etc.)
+            slug = disambiguated
+            if slug in taken:
+                counter = 1
+                while f"{disambiguated}-{counter}" in taken:
+                    counter += 1
+                slug = f"{disambiguated}-{counter}"
+        taken.add(slug)
+        artist.slug = slug
+
+
+def is_slug_conflict(artists):
+    """
+    True if another row now holds one of these artists' slugs, i.e. an
+    IntegrityError came from losing a slug race rather than another constraint
+    """
+    from .models import Artists
+
+    return Artists.objects.filter(
+        slug__in=[artist.slug for artist in artists]
+    ).exclude(pk__in=[artist.pk for artist in artists]).exists()
@@ -1,3 +1,1336 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs, urlsplit
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, IntegrityError
+from django.db.models import Count, Q, QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from .bitset_index import artist_index
+from .exports import export_chunks, iter_submissions
+from .image_jobs import cancel_jobs, claim_next_job, enqueue_image_refresh, run_job
+from .logic import CELL_INDEXES, PUZZLE_CATEGORY_FIELDS, GameValidator, PuzzleManager
+from .middleware import CompressionMiddleware
+from .models import (
+    AlbumCollabs, Albums, ArtistLabels, Artists, Categories, CellPickCount, CellStats, GameSubmission,
+    ImageRefreshJob, Labels, Puzzle, PuzzleCellAnswer, RosterCounter,
+)
+from .pagination import KeysetPagination
+from .predicates import LOOKUP_CHECKS, compile_category, get_category_predicate
+from .search import artist_ngram_index, search_artists, suggest_artists
+from .serializers import ARTIST_VALUE_FIELDS, ArtistSerializer, serialize_artist_values
+from .slugs import allocate_artist_slugs
+from .utils import reset_spotify_clients
+from . import metrics, slugs
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+
+def make_artist(name, **fields):
+    values = {
+        'artist_type': 'Solo',
+        'origin_country': 'US',
+        'debut_year': 2000,
+        'spotify_id': '',
+        'spotify_primary_genre': 'pop',
+    }
+    values.update(fields)
+    return Artists.objects.create(name=name, **values)
+
+
+def make_category(code, field, value, **fields):
+    return Categories.objects.create(
+        code=code,
+        display_name=code.replace('_', ' ').title(),
+        category_type=fields.pop('category_type', 'other'),
+        validation_field=field,
+        validation_value=value,
+        **fields
+    )
+
+
+def make_puzzle(puzzle_date=None, rows=None, cols=None, **fields):
+    """
+    A puzzle over the given row/column categories, or a default grid of
+    country rows and artist type / debut year columns
+    """
+    rows = rows or [
+        make_category('from_us', 'origin_country', 'US'),
+        make_category('from_gb', 'origin_country', 'GB'),
+        make_category('from_ca', 'origin_country', 'CA'),
+    ]
+    cols = cols or [
+        make_category('solo', 'artist_type', 'Solo'),
+        make_category('group', 'artist_type', 'Group'),
+        make_category('debut_2000', 'debut_year', '2000'),
+    ]
+    return Puzzle.objects.create(
+        puzzle_date=puzzle_date or date.today(),
+        category_row_1=rows[0], category_row_2=rows[1], category_row_3=rows[2],
+        category_col_1=cols[0], category_col_2=cols[1], category_col_3=cols[2],
+        **fields
+    )
+
+
+class CategoryPredicateTests(TestCase):
+    # (field, lookup, value) for every lookup in LOOKUP_CHECKS. SQLite's LIKE
+    # ignores case, so the case-sensitive text probes only use values whose
+    # case can't change the answer there.
+    LOGIC_CASES = [
+        ('name', 'exact', 'Alpha'),
+        ('debut_year', 'exact', 2000),
+        ('is_deceased', 'exact', True),
+        ('name', 'iexact', 'ALPHA'),
+        ('name', 'contains', 'lph'),
+        ('name', 'icontains', 'ALP'),
+        ('name', 'startswith', 'Be'),
+        ('name', 'istartswith', 'al'),
+        ('name', 'endswith', 'pha'),
+        ('name', 'iendswith', 'MMA'),
+        ('origin_country', 'in', ['US', 'GB']),
+        ('debut_year', 'in', ['1990', 2010]),
+        ('debut_year', 'gt', 2000),
+        ('debut_year', 'gte', '2000'),
+        ('debut_year', 'lt', 2000),
+        ('debut_year', 'lte', 2000),
+        ('debut_year', 'range', [1995, 2005]),
+        ('is_deceased', 'isnull', True),
+        ('is_deceased', 'isnull', False),
+    ]
+
+    FIELD_VALUE_CASES = [
+        ('origin_country', 'US'),
+        ('debut_year', '2000'),
+        ('debut_year', 'not-a-year'),
+        ('has_grammy_win', 'true'),
+        ('has_grammy_win', 'False'),
+        ('is_deceased', 'false'),
+        ('artist_type', None),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        make_artist('Alpha', debut_year=2000, has_grammy_win=True, is_deceased=False)
+        make_artist('alphabet', origin_country='GB', debut_year=1990)
+        make_artist('Beta Alpha', origin_country='KR', debut_year=2010, is_deceased=True)
+        make_artist('GAMMA', artist_type='Group', origin_country='JP', debut_year=1995, is_deceased=None)
+        make_artist('delta', origin_country='CA', debut_year=2005, has_grammy_win=True)
+        cls.artists = list(Artists.objects.all())
+
+    def assertMatchesQuery(self, category):
+        predicate = compile_category(category)
+        self.assertIsNone(predicate.error)
+        self.assertTrue(predicate.in_memory and predicate.pushdown)
+        in_memory = {artist.pk for artist in self.artists if predicate.evaluate(artist)[0]}
+        in_database = set(Artists.objects.filter(predicate.q).values_list('pk', flat=True))
+        self.assertEqual(in_memory, in_database)
+        return in_memory
+
+    def test_every_lookup_is_covered(self):
+        self.assertLessEqual(set(LOOKUP_CHECKS), {lookup for _, lookup, _ in self.LOGIC_CASES})
+
+    def test_logic_checks_match_query(self):
+        for i, (field, lookup, value) in enumerate(self.LOGIC_CASES):
+            with self.subTest(field=field, lookup=lookup, value=value):
+                category = make_category(
+                    f'logic_{i}', field, None,
+                    validation_logic=json.dumps({'field': field, 'lookup': lookup, 'value': value}),
+                )
+                self.assertTrue(self.assertMatchesQuery(category))
+
+    def test_field_value_checks_match_query(self):
+        for i, (field, value) in enumerate(self.FIELD_VALUE_CASES):
+            with self.subTest(field=field, value=value):
+                self.assertMatchesQuery(make_category(f'value_{i}', field, value))
+
+    def test_invalid_logic_is_an_error(self):
+        for i, logic in enumerate(['not json', '{"field": "name"}', '{"field": "nope", "lookup": "exact", "value": 1}']):
+            predicate = compile_category(make_category(f'bad_{i}', 'name', None, validation_logic=logic))
+            self.assertTrue(predicate.error)
+            self.assertEqual(predicate.evaluate(self.artists[0])[0], False)
+
+    def test_cache_follows_updated_at(self):
+        category = make_category('from_us', 'origin_country', 'US')
+        predicate = get_category_predicate(category)
+        self.assertIs(get_category_predicate(category), predicate)
+        category.validation_value = 'GB'
+        category.save()
+        self.assertIsNot(get_category_predicate(category), predicate)
+
+    def test_valid_artists_for_cell(self):
+        solo = make_category('solo', 'artist_type', 'Solo')
+        # normalized_genre is a property, so this check can only run in Python
+        pop = make_category('pop', 'normalized_genre', 'pop')
+        self.assertFalse(get_category_predicate(pop).pushdown)
+        for row, column in ((solo, pop), (pop, solo), (solo, make_category('from_us', 'origin_country', 'US'))):
+            expected = {
+                artist.pk for artist in self.artists
+                if GameValidator.validate_artist_for_categories(artist, row, column)[0]
+            }
+            actual = set(GameValidator.get_valid_artists_for_cell(row, column).values_list('pk', flat=True))
+            self.assertEqual(actual, expected)
+            self.assertTrue(actual)
+
+
+class AnswerSetTests(TestCase):
+    def setUp(self):
+        self.us_solo = make_artist('US Solo', origin_country='US', debut_year=2000)
+        self.gb_group = make_artist('GB Group', origin_country='GB', artist_type='Group', debut_year=1990)
+        self.ca_solo = make_artist('CA Solo', origin_country='CA', debut_year=2010)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.puzzle = make_puzzle()
+
+    def answers(self, puzzle=None):
+        cells = {cell_index: set() for cell_index in CELL_INDEXES}
+        for cell_index, artist_id in PuzzleCellAnswer.objects.filter(
+            puzzle=puzzle or self.puzzle
+        ).values_list('cell_index', 'artist_id'):
+            cells[cell_index].add(artist_id)
+        return cells
+
+    def expected(self, puzzle=None):
+        puzzle = puzzle or self.puzzle
+        return {
+            cell_index: set(GameValidator.get_valid_artists_for_cell(
+                *PuzzleManager.get_cell_categories(puzzle, cell_index)
+            ).values_list('pk', flat=True))
+            for cell_index in CELL_INDEXES
+        }
+
+    def test_saving_a_puzzle_builds_its_answer_sets(self):
+        self.puzzle.refresh_from_db()
+        self.assertIsNotNone(self.puzzle.answers_built_at)
+        answers = self.answers()
+        self.assertEqual(answers, self.expected())
+        self.assertEqual(answers['1,1'], {self.us_solo.pk})
+        self.assertEqual(answers['1,3'], {self.us_solo.pk})
+        self.assertEqual(answers['2,2'], {self.gb_group.pk})
+        self.assertEqual(answers['3,1'], {self.ca_solo.pk})
+
+    def test_new_artist_is_added_to_live_puzzles(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer = make_artist('Newcomer', origin_country='GB', debut_year=2000)
+        answers = self.answers()
+        self.assertEqual(answers, self.expected())
+        self.assertIn(newcomer.pk, answers['2,1'])
+        self.assertIn(newcomer.pk, answers['2,3'])
+
+    def test_edited_artist_moves_between_cells(self):
+        self.us_solo.origin_country = 'CA'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.us_solo.save()
+        answers = self.answers()
+        self.assertEqual(answers, self.expected())
+        self.assertNotIn(self.us_solo.pk, answers['1,1'])
+        self.assertIn(self.us_solo.pk, answers['3,1'])
+
+    def test_image_updates_do_not_refresh(self):
+        self.us_solo.cached_image_url = 'https://i.scdn.co/image/abc'
+        with mock.patch.object(PuzzleManager, 'refresh_answer_sets_for_artist') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.us_solo.save(update_fields=['cached_image_url'])
+            with self.captureOnCommitCallbacks(execute=True):
+                self.us_solo.save()
+        refresh.assert_not_called()
+
+    def test_edits_to_fields_no_category_reads_are_skipped(self):
+        before = self.answers()
+        self.us_solo.name = 'Renamed'
+        with mock.patch.object(GameValidator, 'validate_artist_for_categories') as validate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.us_solo.save()
+        validate.assert_not_called()
+        self.assertEqual(self.answers(), before)
+
+    def test_only_cells_reading_the_changed_field_are_patched(self):
+        self.us_solo.debut_year = 2001
+        with self.captureOnCommitCallbacks(execute=True):
+            self.us_solo.save()
+        answers = self.answers()
+        self.assertEqual(answers, self.expected())
+        self.assertEqual(answers['1,1'], {self.us_solo.pk})
+        self.assertEqual(answers['1,3'], set())
+
+    def test_category_edit_rebuilds_live_and_marks_old_puzzles_stale(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            old = make_puzzle(
+                date.today() - timedelta(days=30),
+                rows=[self.puzzle.category_row_1, self.puzzle.category_row_2, self.puzzle.category_row_3],
+                cols=[self.puzzle.category_col_1, self.puzzle.category_col_2, self.puzzle.category_col_3],
+            )
+        category = self.puzzle.category_row_1
+        category.validation_value = 'CA'
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+
+        self.puzzle.refresh_from_db()
+        self.assertIsNotNone(self.puzzle.answers_built_at)
+        self.assertEqual(self.answers()['1,1'], {self.ca_solo.pk})
+        old.refresh_from_db()
+        self.assertIsNone(old.answers_built_at)
+
+        # Stale puzzles rebuild on next access
+        self.assertTrue(PuzzleManager.is_valid_answer(old, '1,1', self.ca_solo.pk))
+        old.refresh_from_db()
+        self.assertIsNotNone(old.answers_built_at)
+        self.assertEqual(self.answers(old), self.expected(old))
+
+    def relation_puzzle(self, row):
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_puzzle(
+                date.today() - timedelta(days=1),
+                rows=[row, self.puzzle.category_row_2, self.puzzle.category_row_3],
+                cols=[self.puzzle.category_col_1, self.puzzle.category_col_2, self.puzzle.category_col_3],
+            )
+
+    def test_label_changes_refresh_relation_categories(self):
+        label = Labels.objects.create(name='Big Label')
+        puzzle = self.relation_puzzle(make_category('big_label', 'label', None, validation_logic=json.dumps(
+            {'field': 'label_relationships__label__name', 'lookup': 'exact', 'value': 'Big Label'}
+        )))
+        self.assertFalse(PuzzleManager.check_answer(puzzle, '1,1', self.us_solo)[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            signing = ArtistLabels.objects.create(artist=self.us_solo, label=label)
+        self.assertEqual(
+            PuzzleManager.check_answer(puzzle, '1,1', self.us_solo),
+            (True, "Artist is valid for both row and column categories."),
+        )
+        self.assertEqual(self.answers(puzzle), self.expected(puzzle))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            signing.delete()
+        self.assertFalse(PuzzleManager.check_answer(puzzle, '1,1', self.us_solo)[0])
+
+    def test_album_changes_refresh_collaborators(self):
+        puzzle = self.relation_puzzle(make_category('number_one_collab', 'album', None, validation_logic=json.dumps(
+            {'field': 'collab_albums__album__has_number_one', 'lookup': 'exact', 'value': True}
+        )))
+        with self.captureOnCommitCallbacks(execute=True):
+            album = Albums.objects.create(primary_artist=self.gb_group, title='Duets')
+            AlbumCollabs.objects.create(album=album, collab_artist_id=self.us_solo)
+        self.assertFalse(PuzzleManager.check_answer(puzzle, '1,1', self.us_solo)[0])
+
+        album.has_number_one = True
+        with self.captureOnCommitCallbacks(execute=True):
+            album.save()
+        self.assertTrue(PuzzleManager.check_answer(puzzle, '1,1', self.us_solo)[0])
+
+    def test_property_categories_follow_the_fields_they_derive_from(self):
+        puzzle = self.relation_puzzle(make_category('k_pop', 'normalized_genre', 'K-Pop'))
+        self.assertFalse(PuzzleManager.check_answer(puzzle, '1,1', self.us_solo)[0])
+        self.us_solo.spotify_primary_genre = 'K-pop'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.us_solo.save()
+        self.assertTrue(PuzzleManager.check_answer(puzzle, '1,1', self.us_solo)[0])
+
+    def test_check_answer(self):
+        self.assertEqual(PuzzleManager.check_answer(self.puzzle, '1,1', self.us_solo)[0], True)
+        is_valid, reason = PuzzleManager.check_answer(self.puzzle, '2,2', self.us_solo)
+        self.assertFalse(is_valid)
+        self.assertIn('GB', reason)
+
+        # The answer set decides, even when the predicates would accept the artist
+        PuzzleCellAnswer.objects.filter(puzzle=self.puzzle, cell_index='1,1').delete()
+        PuzzleManager.invalidate_puzzle_cache([self.puzzle.pk])
+        self.assertEqual(
+            PuzzleManager.check_answer(self.puzzle, '1,1', self.us_solo),
+            (False, "Artist is not in the answer set for this cell."),
+        )
+
+
+class ArtistBitsetIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.us_solo = make_artist('US Solo')
+        cls.us_group = make_artist('US Group', artist_type='Group', debut_year=1995)
+        cls.gb_solo = make_artist('GB Solo', origin_country='GB')
+        cls.label = Labels.objects.create(name='Big Label')
+        ArtistLabels.objects.create(artist=cls.gb_solo, label=cls.label)
+        cls.from_us = make_category('from_us', 'origin_country', 'US')
+        cls.from_gb = make_category('from_gb', 'origin_country', 'GB')
+        cls.solo = make_category('solo', 'artist_type', 'Solo')
+        cls.debut_2000 = make_category('debut_2000', 'debut_year', '2000')
+        cls.big_label = make_category('big_label', 'label', None, validation_logic=json.dumps(
+            {'field': 'label_relationships__label__name', 'lookup': 'exact', 'value': 'Big Label'}
+        ))
+
+    def setUp(self):
+        artist_index.build()
+        self.addCleanup(artist_index.reset)
+
+    def assertIndexMatchesOrm(self):
+        categories = Categories.objects.filter(is_active=True)
+        for row in categories:
+            for column in categories:
+                with self.subTest(row=row.code, column=column.code):
+                    expected = set(GameValidator.get_valid_artists_for_cell(row, column).values_list('pk', flat=True))
+                    self.assertEqual(set(artist_index.cell_artist_ids(row, column)), expected)
+                    self.assertEqual(artist_index.cell_count(row, column), len(expected))
+
+    def test_cells_match_orm_predicates(self):
+        self.assertIndexMatchesOrm()
+        self.assertEqual(artist_index.cell_artist_ids(self.from_us, self.solo), [self.us_solo.pk])
+        self.assertEqual(artist_index.cell_artist_ids(self.big_label, self.debut_2000), [self.gb_solo.pk])
+
+    def test_artist_saves_and_deletes_keep_the_index_current(self):
+        newcomer = make_artist('US Newcomer')
+        self.assertIn(newcomer.pk, artist_index.cell_artist_ids(self.from_us, self.solo))
+
+        self.us_group.artist_type = 'Solo'
+        self.us_group.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            ArtistLabels.objects.create(artist=self.us_solo, label=self.label)
+        self.assertIndexMatchesOrm()
+
+        self.gb_solo.delete()
+        newcomer.delete()
+        self.assertIndexMatchesOrm()
+        self.assertEqual(artist_index.cell_artist_ids(self.big_label, self.from_us), [self.us_solo.pk])
+
+    def test_category_saves_keep_the_index_current(self):
+        self.from_gb.validation_value = 'US'
+        self.from_gb.save()
+        self.debut_2000.is_active = False
+        self.debut_2000.save()
+        make_category('group', 'artist_type', 'Group')
+        self.assertIndexMatchesOrm()
+        self.assertEqual(
+            set(artist_index.cell_artist_ids(self.from_gb, self.from_us)), {self.us_solo.pk, self.us_group.pk}
+        )
+
+        self.debut_2000.delete()
+        self.assertNotIn(self.debut_2000.pk, artist_index.bitsets)
+
+
+class GeneratePuzzlesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for country in ('US', 'GB', 'CA'):
+            for artist_type in ('Solo', 'Group'):
+                for debut_year in (1995, 2000):
+                    for i in range(2):
+                        make_artist(
+                            f'{country} {artist_type} {debut_year} {i}',
+                            origin_country=country, artist_type=artist_type, debut_year=debut_year,
+                        )
+        make_artist('AU Solo', origin_country='AU')
+        for code, field, value in [
+            ('from_us', 'origin_country', 'US'), ('from_gb', 'origin_country', 'GB'),
+            ('from_ca', 'origin_country', 'CA'), ('from_au', 'origin_country', 'AU'),
+            ('solo', 'artist_type', 'Solo'), ('group', 'artist_type', 'Group'),
+            ('debut_1995', 'debut_year', '1995'), ('debut_2000', 'debut_year', '2000'),
+        ]:
+            make_category(code, field, value)
+
+    def setUp(self):
+        artist_index.reset()
+        self.addCleanup(artist_index.reset)
+
+    def test_generated_cells_have_enough_answers(self):
+        start = date(2030, 1, 1)
+        out = StringIO()
+        call_command(
+            'generate_puzzles', start=start, days=5, min_answers=3, repeat_window=0, workers=1, seed=7, stdout=out
+        )
+        self.assertIn('Created 5 puzzle(s).', out.getvalue())
+
+        puzzles = Puzzle.objects.filter(puzzle_date__gte=start).order_by('puzzle_date')
+        self.assertEqual(len(puzzles), 5)
+        for puzzle in puzzles:
+            with self.subTest(puzzle_date=puzzle.puzzle_date):
+                categories = [getattr(puzzle, field) for field in PUZZLE_CATEGORY_FIELDS]
+                self.assertEqual(len({category.pk for category in categories}), 6)
+                self.assertNotIn('from_au', [category.code for category in categories])
+                answers = dict(PuzzleCellAnswer.objects.filter(puzzle=puzzle).values_list('cell_index').annotate(
+                    count=Count('artist')
+                ))
+                for cell_index in CELL_INDEXES:
+                    valid = GameValidator.get_valid_artists_for_cell(
+                        *PuzzleManager.get_cell_categories(puzzle, cell_index)
+                    ).count()
+                    self.assertGreaterEqual(valid, 3)
+                    self.assertEqual(answers.get(cell_index), valid)
+
+
+class PickCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.us_solo = make_artist('US Solo', origin_country='US', debut_year=2000)
+        cls.us_solo_2 = make_artist('Another US Solo', origin_country='US', debut_year=1990)
+        cls.gb_group = make_artist('GB Group', origin_country='GB', artist_type='Group')
+        cls.puzzle = make_puzzle()
+        PuzzleManager.build_answer_sets(cls.puzzle)
+
+    def submit(self, user_id, cell_index, artist):
+        return GameSubmission.objects.create(
+            user_id=user_id, puzzle=self.puzzle, cell_index=cell_index, selected_artist=artist,
+            is_correct=PuzzleManager.check_answer(self.puzzle, cell_index, artist)[0],
+        )
+
+    def assertCountersMatchSubmissions(self):
+        """
+        The incremental counters must equal aggregates recomputed from the submissions
+        """
+        submissions = GameSubmission.objects.filter(puzzle=self.puzzle)
+        picks = {
+            (row['cell_index'], row['selected_artist_id']): row['count']
+            for row in submissions.values('cell_index', 'selected_artist_id').annotate(count=Count('id'))
+        }
+        self.assertEqual(picks, {
+            (counter.cell_index, counter.selected_artist_id): counter.count
+            for counter in CellPickCount.objects.filter(puzzle=self.puzzle)
+        })
+
+        cells = {
+            row['cell_index']: (row['total'], row['correct'], row['distinct'])
+            for row in submissions.values('cell_index').annotate(
+                total=Count('id'), correct=Count('id', filter=Q(is_correct=True)),
+                distinct=Count('selected_artist', distinct=True),
+            )
+        }
+        stats = {
+            stats.cell_index: (stats.total_guesses, stats.correct_guesses, stats.distinct_answers)
+            for stats in CellStats.objects.filter(puzzle=self.puzzle)
+        }
+        self.assertEqual(cells, {cell: totals for cell, totals in stats.items() if totals != (0, 0, 0)})
+
+    def test_single_submissions(self):
+        self.submit('a', '1,1', self.us_solo)
+        self.submit('b', '1,1', self.us_solo)
+        self.submit('c', '1,1', self.us_solo_2)
+        self.submit('c', '2,2', self.gb_group)
+        self.submit('d', '2,2', self.us_solo)
+        self.assertCountersMatchSubmissions()
+        stats = CellStats.objects.get(puzzle=self.puzzle, cell_index='1,1')
+        self.assertEqual((stats.total_guesses, stats.correct_guesses, stats.distinct_answers), (3, 3, 2))
+
+    def test_batch_submission(self):
+        self.submit('a', '1,1', self.us_solo)
+        results = PuzzleManager.submit_guesses('b', self.puzzle, [
+            ('1,1', self.us_solo.pk), ('2,2', self.gb_group.pk), ('1,2', self.us_solo_2.pk),
+            ('1,3', self.us_solo.pk),
+        ])
+        self.assertEqual([result['is_valid'] for result in results], [True, True, False, False])
+        self.assertEqual(results[3]['reason'], 'You have already submitted this artist for this puzzle.')
+        self.assertCountersMatchSubmissions()
+        self.assertEqual(CellPickCount.objects.get(
+            puzzle=self.puzzle, cell_index='1,1', selected_artist=self.us_solo
+        ).count, 2)
+
+    def test_batch_endpoint(self):
+        response = self.client.post('/api/validate-guesses/', {
+            'user_id': 'a',
+            'puzzle_id': str(self.puzzle.pk),
+            'guesses': [
+                {'cell_index': '1,1', 'selected_artist_id': str(self.us_solo.pk)},
+                {'cell_index': '2,2', 'selected_artist_id': str(self.gb_group.pk)},
+            ],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['is_valid'] for result in response.json()['results']], [True, True])
+        self.assertCountersMatchSubmissions()
+
+    def test_batch_endpoint_reports_concurrent_repeat(self):
+        check_answer = PuzzleManager.check_answer
+
+        def concurrent_submit(puzzle, cell_index, artist, *args):
+            # Another request stores the same artist between validation and insert
+            if artist.pk == self.us_solo.pk:
+                GameSubmission.objects.create(
+                    user_id='a', puzzle=self.puzzle, cell_index='1,3', selected_artist=artist, is_correct=False
+                )
+            return check_answer(puzzle, cell_index, artist, *args)
+
+        with mock.patch.object(PuzzleManager, 'check_answer', side_effect=concurrent_submit):
+            response = self.client.post('/api/validate-guesses/', {
+                'user_id': 'a',
+                'puzzle_id': str(self.puzzle.pk),
+                'guesses': [
+                    {'cell_index': '1,1', 'selected_artist_id': str(self.us_solo.pk)},
+                    {'cell_index': '2,2', 'selected_artist_id': str(self.gb_group.pk)},
+                ],
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['is_valid'] for result in results], [False, True])
+        self.assertEqual(results[0]['reason'], 'You have already submitted this artist for this puzzle.')
+        self.assertEqual(GameSubmission.objects.filter(user_id='a').count(), 2)
+        self.assertCountersMatchSubmissions()
+
+    def test_deletes_release_counts(self):
+        first = self.submit('a', '1,1', self.us_solo)
+        self.submit('b', '1,1', self.us_solo)
+        last = self.submit('c', '1,1', self.us_solo_2)
+        self.submit('d', '2,2', self.gb_group)
+
+        first.delete()
+        self.assertCountersMatchSubmissions()
+        last.delete()
+        self.assertCountersMatchSubmissions()
+        # The emptied counter is gone, so picking the artist again is a new distinct answer
+        self.assertFalse(CellPickCount.objects.filter(selected_artist=self.us_solo_2).exists())
+        self.submit('e', '1,1', self.us_solo_2)
+        self.assertCountersMatchSubmissions()
+
+        GameSubmission.objects.filter(puzzle=self.puzzle).delete()
+        self.assertCountersMatchSubmissions()
+        self.assertFalse(CellPickCount.objects.exists())
+
+    def test_pick_rates_agree_with_stats(self):
+        self.submit('a', '1,1', self.us_solo)
+        self.submit('b', '1,1', self.us_solo_2)
+        PuzzleManager.submit_guesses('c', self.puzzle, [('1,1', self.us_solo.pk), ('2,2', self.gb_group.pk)])
+
+        rates = self.client.get(f'/api/puzzles/{self.puzzle.pk}/pick_rates/').json()['cells']
+        stats = self.client.get(f'/api/puzzles/{self.puzzle.pk}/stats/').json()['cells']
+        for cell_index in CELL_INDEXES:
+            with self.subTest(cell_index=cell_index):
+                self.assertEqual(rates[cell_index]['total_picks'], stats[cell_index]['total_guesses'])
+                self.assertEqual(
+                    {pick['artist_id']: pick['count'] for pick in rates[cell_index]['picks']},
+                    {pick['artist_id']: pick['count'] for pick in stats[cell_index]['top_picks']},
+                )
+        top = rates['1,1']['picks'][0]
+        self.assertEqual((top['artist_id'], top['count']), (str(self.us_solo.pk), 2))
+        self.assertAlmostEqual(top['percentage'], 200 / 3, places=1)
+
+
+class ArtistSlugTests(TestCase):
+    def test_collisions_are_disambiguated(self):
+        first = make_artist('LISA', origin_country='TH')
+        second = make_artist('LiSA', origin_country='JP')
+        third = make_artist('Lisa!', origin_country='JP')
+        fourth = make_artist('lisa', origin_country='JP')
+        self.assertEqual(
+            [artist.slug for artist in (first, second, third, fourth)],
+            ['lisa', 'lisa-jp', 'lisa-jp-1', 'lisa-jp-2'],
+        )
+
+    def test_batch_allocation_counts_duplicates_within_the_batch(self):
+        make_artist('Nova', origin_country='US')
+        batch = [
+            Artists(name=name, origin_country=country, debut_year=2000)
+            for name, country in [('Nova', 'US'), ('NOVA', 'US'), ('Nova', 'SE'), ('Orbit', 'US'), ('orbit', 'US')]
+        ]
+        with self.assertNumQueries(2):
+            allocate_artist_slugs(batch)
+        self.assertEqual(
+            [artist.slug for artist in batch],
+            ['nova-us', 'nova-us-1', 'nova-se', 'orbit', 'orbit-us'],
+        )
+
+    def test_rename_reallocates(self):
+        artist = make_artist('Old Name')
+        artist.debut_year = 2001
+        artist.save()
+        self.assertEqual(artist.slug, 'old-name')
+        artist.name = 'New Name'
+        artist.save()
+        self.assertEqual(Artists.objects.get(pk=artist.pk).slug, 'new-name')
+        # The old slug is free again
+        self.assertEqual(make_artist('Old Name').slug, 'old-name')
+
+    def test_save_retries_after_losing_a_slug_race(self):
+        make_artist('Racer', origin_country='US')
+        real_taken_slugs = slugs._taken_slugs
+        calls = []
+
+        def stale_read(*args):
+            # The first lookup misses the concurrent writer's row
+            calls.append(args)
+            return set() if len(calls) == 1 else real_taken_slugs(*args)
+
+        with mock.patch.object(slugs, '_taken_slugs', side_effect=stale_read):
+            artist = make_artist('Racer', origin_country='US')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(artist.slug, 'racer-us')
+        self.assertEqual(Artists.objects.filter(slug='racer').count(), 1)
+
+    def test_other_integrity_errors_are_not_retried(self):
+        existing = make_artist('Numbered')
+        with mock.patch.object(slugs, 'allocate_artist_slugs', wraps=allocate_artist_slugs) as allocate:
+            with self.assertRaises(IntegrityError):
+                make_artist('Someone Else', roster_number=existing.roster_number)
+        self.assertEqual(allocate.call_count, 1)
+
+
+class RosterCounterTests(TestCase):
+    def test_first_use_continues_from_assigned_numbers(self):
+        make_artist('Existing', roster_number=41)
+        RosterCounter.objects.all().delete()
+        self.assertEqual(RosterCounter.reserve(), 42)
+        self.assertEqual(RosterCounter.objects.get().last_value, 42)
+
+    def test_blocks_are_consecutive_and_disjoint(self):
+        RosterCounter.objects.update_or_create(pk=1, defaults={'last_value': 10})
+        self.assertEqual(RosterCounter.reserve(5), 11)
+        self.assertEqual(RosterCounter.reserve(), 16)
+        self.assertEqual(RosterCounter.reserve(3), 17)
+        self.assertEqual(RosterCounter.objects.get().last_value, 19)
+
+    def test_new_artists_are_numbered_in_order(self):
+        artists = [make_artist(f'Artist {i}') for i in range(3)]
+        numbers = [artist.roster_number for artist in artists]
+        self.assertEqual(numbers, list(range(numbers[0], numbers[0] + 3)))
+        # Explicit numbers and edits keep their number
+        self.assertEqual(make_artist('Pinned', roster_number=1000).roster_number, 1000)
+        artists[0].debut_year = 1999
+        artists[0].save()
+        self.assertEqual(Artists.objects.get(pk=artists[0].pk).roster_number, numbers[0])
+
+    def test_lost_race_to_create_the_counter(self):
+        RosterCounter.objects.update_or_create(pk=1, defaults={'last_value': 7})
+        real_update = QuerySet.update
+        calls = []
+
+        def row_not_there_yet(queryset, **kwargs):
+            # Our UPDATE ran before another transaction committed the counter row
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=row_not_there_yet):
+            self.assertEqual(RosterCounter.reserve(2), 8)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(RosterCounter.objects.get().last_value, 9)
+
+
+class ImportCatalogTests(TestCase):
+    def import_rows(self, kind, rows):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), f'{kind}.ndjson')
+        with open(path, 'w') as f:
+            f.writelines(json.dumps(row) + '\n' for row in rows)
+        out = StringIO()
+        call_command('import_catalog', kind, path, stdout=out)
+        return out.getvalue()
+
+    def artist_rows(self, count):
+        return [
+            {'name': f'Imported {i}', 'artist_type': 'Solo', 'origin_country': 'US', 'debut_year': 2001,
+             'spotify_id': f'{i:022d}', 'spotify_primary_genre': 'pop'}
+            for i in range(count)
+        ]
+
+    def test_existing_links_are_skipped(self):
+        artist = make_artist('Signed', spotify_id='5' * 22)
+        first = Labels.objects.create(name='First')
+        Labels.objects.create(name='Second')
+        ArtistLabels.objects.create(artist=artist, label=first)
+        out = self.import_rows('artist-labels', [
+            {'artist': artist.spotify_id, 'label': 'First'},
+            {'artist': artist.spotify_id, 'label': 'Second', 'is_primary': True},
+            {'artist': artist.spotify_id, 'label': 'Second'},
+        ])
+        self.assertIn('Imported 1 artist-labels', out)
+        self.assertIn('skipped 2 existing', out)
+        self.assertEqual(ArtistLabels.objects.filter(artist=artist).count(), 2)
+
+    def test_failed_chunk_releases_its_roster_numbers(self):
+        RosterCounter.objects.update_or_create(pk=1, defaults={'last_value': 10})
+        with mock.patch.object(Artists.objects, 'bulk_create', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                self.import_rows('artists', self.artist_rows(2))
+        self.assertEqual(RosterCounter.objects.get().last_value, 10)
+
+        self.import_rows('artists', self.artist_rows(2))
+        self.assertEqual(
+            sorted(Artists.objects.filter(name__startswith='Imported').values_list('roster_number', flat=True)),
+            [11, 12],
+        )
+
+
+class SubmissionExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.artist = make_artist('Export Artist')
+        cls.puzzle = make_puzzle()
+        cls.other_puzzle = make_puzzle(
+            date.today() - timedelta(days=1),
+            rows=[cls.puzzle.category_row_1, cls.puzzle.category_row_2, cls.puzzle.category_row_3],
+            cols=[cls.puzzle.category_col_1, cls.puzzle.category_col_2, cls.puzzle.category_col_3],
+        )
+        cls.submissions = [
+            GameSubmission.objects.create(
+                user_id=f'user-{i}', puzzle=cls.puzzle if i % 2 else cls.other_puzzle,
+                cell_index='1,1', selected_artist=cls.artist,
+            )
+            for i in range(7)
+        ]
+        # Shared timestamps, so paging has to break ties on id
+        GameSubmission.objects.update(timestamp=timezone.now())
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def test_pages_cover_every_row_once_in_order(self):
+        rows = list(iter_submissions(batch_size=2))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(len({row['id'] for row in rows}), 7)
+        keys = [(row['timestamp'], row['id']) for row in rows]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_puzzle_filter(self):
+        rows = list(iter_submissions(puzzle_id=str(self.puzzle.pk), batch_size=2))
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row['puzzle_id'] == self.puzzle.pk for row in rows))
+
+    def test_invalid_puzzle_id_raises_before_streaming(self):
+        with self.assertRaises(ValueError):
+            iter_submissions(puzzle_id='not-a-uuid')
+
+    def test_gzip_chunks_round_trip(self):
+        rows = list(iter_submissions())
+        body = gzip.decompress(b''.join(export_chunks(iter(rows), compress=True)))
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([line['id'] for line in lines], [str(row['id']) for row in rows])
+
+    def test_csv_has_header(self):
+        body = b''.join(export_chunks(iter_submissions(), output='csv')).decode()
+        lines = body.splitlines()
+        self.assertEqual(lines[0].split(','), ['id', 'user_id', 'puzzle_id', 'cell_index',
+                                               'selected_artist_id', 'is_correct', 'timestamp'])
+        self.assertEqual(len(lines), 8)
+
+    def test_view_requires_admin(self):
+        response = self.client.get('/api/submissions/export/')
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_view_streams_ndjson(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/api/submissions/export/', {'puzzle': str(self.puzzle.pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+    def test_view_rejects_bad_puzzle_id(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/api/submissions/export/', {'puzzle': 'not-a-uuid'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_rejects_bad_puzzle_id(self):
+        with self.assertRaises(CommandError):
+            call_command('export_submissions', puzzle='not-a-uuid', stdout=StringIO())
+
+    def test_command_writes_file(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'submissions.ndjson')
+        call_command('export_submissions', output=path, puzzle=str(self.puzzle.pk), stderr=StringIO())
+        with open(path) as f:
+            self.assertEqual(len(f.read().splitlines()), 3)
+
+
+class StubSpotifyHandler(BaseHTTPRequestHandler):
+    """
+    Token and /artists endpoints; answers the first /artists request with a 429
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, code, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_json(200, {'access_token': 'token', 'token_type': 'Bearer', 'expires_in': 3600})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        requests = self.server.artist_requests
+        requests.append((time.monotonic(), url.path, parse_qs(url.query).get('ids', [''])[0].split(',')))
+        if len(requests) == 1:
+            return self.send_json(429, {'error': {'status': 429, 'message': 'rate limited'}}, [('Retry-After', '1')])
+        self.send_json(200, {'artists': [
+            {'id': spotify_id, 'images': [{'url': f'https://i.scdn.co/image/{spotify_id}'}]}
+            for spotify_id in requests[-1][2]
+        ]})
+
+
+class UpdateArtistImagesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        old = now - timedelta(days=7)
+        cls.missing = make_artist('Missing', spotify_id='1' * 22)
+        cls.changed = make_artist(
+            'Changed', spotify_id='2' * 22, cached_image_url='https://i.scdn.co/image/old', image_last_updated=old
+        )
+        cls.unchanged = make_artist(
+            'Unchanged', spotify_id='3' * 22, cached_image_url=f'https://i.scdn.co/image/{"3" * 22}',
+            image_last_updated=old,
+        )
+        cls.fresh = make_artist(
+            'Fresh', spotify_id='4' * 22, cached_image_url='https://i.scdn.co/image/fresh', image_last_updated=now
+        )
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubSpotifyHandler)
+        self.server.artist_requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        base = f'http://127.0.0.1:{self.server.server_port}'
+        settings = override_settings(
+            SPOTIPY_CLIENT_ID='client', SPOTIPY_CLIENT_SECRET='secret',
+            SPOTIFY_API_URL=f'{base}/v1/', SPOTIFY_TOKEN_URL=f'{base}/api/token',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        reset_spotify_clients()
+        self.addCleanup(reset_spotify_clients)
+
+    def test_stale_run_against_stub(self):
+        out = StringIO()
+        with self.assertLogs('main.utils', 'WARNING') as logs:
+            call_command('update_artist_images', stale=True, batch_size=2, workers=1, stdout=out)
+        self.assertEqual(logs.output, ['WARNING:main.utils:Spotify returned 429, retrying in 1.0s'])
+
+        requests = self.server.artist_requests
+        self.assertEqual([path for at, path, ids in requests], ['/v1/artists/'] * 3)
+        # The rate-limited batch is retried after Retry-After, then the next batch follows
+        self.assertEqual(requests[0][2], requests[1][2])
+        self.assertGreaterEqual(requests[1][0] - requests[0][0], 1)
+        self.assertEqual(
+            sorted(sum((ids for at, path, ids in requests[1:]), [])),
+            [self.missing.spotify_id, self.changed.spotify_id, self.unchanged.spotify_id],
+        )
+        self.assertIn('updated 2 images, 0 errors', out.getvalue())
+
+        artists = Artists.objects.in_bulk([self.missing.pk, self.changed.pk, self.unchanged.pk, self.fresh.pk])
+        for artist in (self.missing, self.changed, self.unchanged):
+            with self.subTest(artist=artist.name):
+                self.assertEqual(artists[artist.pk].cached_image_url, f'https://i.scdn.co/image/{artist.spotify_id}')
+                self.assertGreater(artists[artist.pk].image_last_updated, self.fresh.image_last_updated)
+        self.assertEqual(artists[self.fresh.pk].cached_image_url, 'https://i.scdn.co/image/fresh')
+        self.assertEqual(artists[self.fresh.pk].image_last_updated, self.fresh.image_last_updated)
+
+    def test_delay_maps_onto_rate(self):
+        out = StringIO()
+        with mock.patch('main.management.commands.update_artist_images.RateLimiter') as rate_limiter:
+            call_command('update_artist_images', missing_only=True, delay=0.5, stdout=out)
+        rate_limiter.assert_called_once_with(2.0)
+        self.assertIn('--delay is deprecated; use --rate 2', out.getvalue())
+
+
+class ArtistSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.the_weeknd = make_artist('The Weeknd', origin_country='CA', debut_year=2010, spotify_primary_genre='r&b')
+        cls.weezer = make_artist('Weezer', debut_year=1994, spotify_primary_genre='rock')
+        cls.kylie = make_artist('Kylie Minogue', origin_country='AU', debut_year=1987)
+        cls.cwe = make_artist('Cweeky Sound', origin_country='GB', debut_year=1999, spotify_primary_genre='grime')
+
+    def setUp(self):
+        artist_ngram_index.build()
+
+    def search(self, query):
+        return list(search_artists(Artists.objects.all(), query))
+
+    def test_backends_agree(self):
+        expected = {
+            # Name prefix, then word prefix, then anywhere in the name
+            'wee': [self.weezer, self.the_weeknd, self.cwe],
+            'rock': [self.weezer],
+            '99': [self.cwe, self.weezer],
+            '199': [self.cwe, self.weezer],
+            '2010': [self.the_weeknd],
+            'a': [self.kylie, self.the_weeknd],
+            'gb': [self.cwe],
+        }
+        for backend in ('database', 'memory'):
+            with override_settings(ARTIST_SEARCH_BACKEND=backend):
+                for query, artists in expected.items():
+                    with self.subTest(backend=backend, query=query):
+                        self.assertEqual(self.search(query), artists)
+
+    def test_suggestions_are_ranked_and_limited(self):
+        for backend in ('database', 'memory'):
+            with override_settings(ARTIST_SEARCH_BACKEND=backend), self.subTest(backend=backend):
+                self.assertEqual(list(suggest_artists(' wee ', 2)), [self.weezer, self.the_weeknd])
+                self.assertEqual(list(suggest_artists('minogue', 10)), [self.kylie])
+                self.assertEqual(list(suggest_artists('zzz', 10)), [])
+
+    def test_memory_index_follows_saves_and_deletes(self):
+        with override_settings(ARTIST_SEARCH_BACKEND='memory'):
+            self.weezer.name = 'Rivers Cuomo'
+            self.weezer.save()
+            self.assertEqual(list(suggest_artists('wee', 10)), [self.the_weeknd, self.cwe])
+            self.assertEqual(list(suggest_artists('rivers', 10)), [self.weezer])
+            self.the_weeknd.delete()
+            self.assertEqual(list(suggest_artists('wee', 10)), [self.cwe])
+
+
+@override_settings(TODAY_PUZZLE_MAX_AGE=300)
+class TodayPuzzleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def get_today(self, **headers):
+        return self.client.get('/api/today-puzzle/', headers=headers)
+
+    def test_matching_etag_gets_304(self):
+        make_puzzle(timezone.now().date())
+        response = self.get_today()
+        self.assertEqual(response.status_code, 200)
+
+        revalidated = self.get_today(if_none_match=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+        self.assertEqual(self.get_today(if_none_match='"stale"').status_code, 200)
+
+    def test_saves_change_the_etag(self):
+        puzzle = make_puzzle(timezone.now().date())
+        etags = [self.get_today()['ETag']]
+
+        puzzle.is_active = False
+        puzzle.save()
+        etags.append(self.get_today()['ETag'])
+
+        category = puzzle.category_col_1
+        category.display_name = 'Solo Artist'
+        category.save()
+        response = self.get_today()
+        etags.append(response['ETag'])
+
+        self.assertEqual(len(set(etags)), 3)
+        self.assertEqual(response.json()['categories']['columns'][0]['display_name'], 'Solo Artist')
+        self.assertEqual(PuzzleManager.get_today_puzzle_payload()['etag'], etags[-1].strip('"'))
+
+    def test_max_age_is_capped_at_utc_midnight(self):
+        puzzle = None
+        for now, max_age in [
+            (datetime(2026, 3, 1, 12, 0, tzinfo=dt_timezone.utc), 300),
+            (datetime(2026, 3, 2, 23, 59, 0, tzinfo=dt_timezone.utc), 60),
+        ]:
+            with self.subTest(now=now), mock.patch('django.utils.timezone.now', return_value=now):
+                if puzzle is None:
+                    puzzle = make_puzzle(now.date())
+                else:
+                    puzzle.pk = None
+                    puzzle.puzzle_date = now.date()
+                    puzzle.save()
+                response = self.get_today()
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(f'max-age={max_age}', response['Cache-Control'])
+                self.assertIn('public', response['Cache-Control'])
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Repeated names and a few artists without a roster number
+        cls.artists = [make_artist(f'Artist {i % 3}') for i in range(9)]
+        Artists.objects.filter(pk__in=[cls.artists[2].pk, cls.artists[5].pk]).update(roster_number=None)
+
+    def walk(self, ordering, queryset, page_size=2):
+        """
+        Follow next links from the first page, then previous links back; returns both page lists
+        """
+        factory = APIRequestFactory()
+        forward, url = [], '/api/artists/'
+        while url:
+            paginator = KeysetPagination(ordering, page_size)
+            forward.append(paginator.paginate_queryset(queryset, Request(factory.get(url))))
+            url = paginator.get_next_link()
+            previous = paginator.get_previous_link()
+
+        backward = [forward[-1]]
+        url = previous
+        while url:
+            paginator = KeysetPagination(ordering, page_size)
+            backward.insert(0, paginator.paginate_queryset(queryset, Request(factory.get(url))))
+            url = paginator.get_previous_link()
+        return forward, backward
+
+    def test_nullable_leading_field_visits_every_row_once(self):
+        forward, backward = self.walk(('roster_number',), Artists.objects.all())
+        ids = [artist.pk for page in forward for artist in page]
+        self.assertEqual(sorted(ids), sorted(artist.pk for artist in self.artists))
+        self.assertEqual(len(ids), len(set(ids)))
+        # Numbered artists first, in roster order, then the unnumbered ones
+        numbers = [artist.roster_number for page in forward for artist in page]
+        self.assertEqual(numbers[-2:], [None, None])
+        self.assertEqual(numbers[:-2], sorted(numbers[:-2]))
+        self.assertEqual(backward, forward)
+
+    def test_ties_are_broken_by_primary_key(self):
+        queryset = Artists.objects.values('id', 'name')
+        forward, backward = self.walk(('name',), queryset)
+        rows = [row for page in forward for row in page]
+        self.assertEqual(rows, sorted(rows, key=lambda row: (row['name'], row['id'])))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(backward, forward)
+
+    def test_invalid_cursor_is_not_found(self):
+        paginator = KeysetPagination(('roster_number',), 2)
+        with self.assertRaises(NotFound):
+            paginator.paginate_queryset(
+                Artists.objects.all(), Request(APIRequestFactory().get('/api/artists/', {'cursor': 'bad'}))
+            )
+
+    def test_artist_endpoint_cursor(self):
+        response = self.client.get('/api/artists/', {'pagination': 'cursor'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertIsNone(body['next'])
+        self.assertIsNone(body['previous'])
+        self.assertEqual(len(body['results']), 9)
+
+    def test_page_number_order_is_stable(self):
+        body = self.client.get('/api/artists/').json()
+        names = [(artist['name'], artist['id']) for artist in body['results']]
+        self.assertEqual(names, sorted(names))
+
+
+class ArtistValuesSerializationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_artist('Plain')
+        make_artist('Imaged', spotify_id='0TnOYISbd1XYRBk9myaseg',
+                    cached_image_url='https://i.scdn.co/image/abc', image_last_updated=timezone.now())
+        make_artist('Nullable', artist_type='Group', uses_stage_name=None, is_deceased=None, is_disbanded=True,
+                    has_grammy_win=True, spotify_primary_genre='k-pop', origin_country='KR')
+
+    def test_matches_artist_serializer(self):
+        artists = Artists.objects.order_by('name', 'pk')
+        expected = ArtistSerializer(artists, many=True).data
+        actual = serialize_artist_values(artists.values(*ARTIST_VALUE_FIELDS))
+        self.assertEqual(actual, [dict(item) for item in expected])
+        self.assertEqual([list(item) for item in actual], [list(item) for item in expected])
+
+    def test_list_endpoint_matches_artist_serializer(self):
+        body = self.client.get('/api/artists/').json()
+        expected = ArtistSerializer(Artists.objects.order_by('name', 'pk'), many=True).data
+        self.assertEqual(body['results'], json.loads(json.dumps(expected)))
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = json.dumps([{'name': f'Artist {i}', 'genre': 'pop'} for i in range(200)]).encode()
+
+    def respond(self, path='/api/artists/', accept_encoding='gzip, deflate, br', content_type='application/json',
+                body=None):
+        middleware = CompressionMiddleware(lambda request: HttpResponse(body or self.body, content_type=content_type))
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware(request)
+
+    def test_prefers_brotli(self):
+        try:
+            import brotli
+        except ImportError:
+            self.skipTest('brotli is not installed')
+        response = self.respond()
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+
+    def test_gzip_by_q_value(self):
+        response = self.respond(accept_encoding='br;q=0.5, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+    def test_gzip_is_padded(self):
+        lengths = {len(self.respond(accept_encoding='gzip').content) for _ in range(10)}
+        self.assertGreater(len(lengths), 1)
+
+    def test_identity(self):
+        for accept_encoding in ('', 'identity', 'gzip;q=0, br;q=0', '*;q=0'):
+            response = self.respond(accept_encoding=accept_encoding)
+            self.assertFalse(response.has_header('Content-Encoding'), accept_encoding)
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(response.content, self.body)
+
+    def test_small_bodies_are_not_compressed(self):
+        response = self.respond(body=b'{"ok": true}')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_html_and_non_api_paths_are_left_alone(self):
+        html = b'<input type="hidden" name="csrfmiddlewaretoken" value="secret">' * 50
+        for path, content_type in (('/admin/', 'text/html'), ('/api/artists/', 'text/html'),
+                                   ('/admin/jsi18n/', 'application/json')):
+            response = self.respond(path=path, content_type=content_type, body=html)
+            self.assertFalse(response.has_header('Content-Encoding'), path)
+            self.assertFalse(response.has_header('Vary'), path)
+
+    def test_strong_etag_is_weakened(self):
+        middleware = CompressionMiddleware(lambda request: HttpResponse(
+            self.body, content_type='application/json', headers={'ETag': '"abc"'}
+        ))
+        response = middleware(RequestFactory().get('/api/today-puzzle/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+
+@override_settings(METRICS_TOKEN='scrape-token')
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    def get_metrics(self, **headers):
+        return self.client.get('/api/metrics', headers=headers)
+
+    def test_metrics_need_staff_or_token(self):
+        self.assertEqual(self.get_metrics().status_code, 403)
+        self.assertEqual(self.get_metrics(authorization='Bearer wrong-token').status_code, 403)
+        self.assertEqual(self.get_metrics(authorization='Bearer scrape-token').status_code, 200)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.get_metrics(authorization='Bearer ').status_code, 403)
+
+        user = get_user_model().objects.create_user('player', password='secret')
+        self.client.force_login(user)
+        self.assertEqual(self.get_metrics().status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.get_metrics().status_code, 200)
+
+    def test_requests_are_counted_per_view(self):
+        make_artist('Counted')
+        response = self.client.get('/api/artists/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.client.get('/api/artists/')
+        self.client.get('/api/today-puzzle/')
+        self.client.get('/admin/login/')
+
+        body = self.get_metrics(authorization='Bearer scrape-token').content.decode()
+        self.assertIn('musidoku_request_duration_seconds_count{view="artists-list"} 2', body)
+        self.assertIn('musidoku_request_duration_seconds_count{view="today-puzzle"} 1', body)
+        self.assertIn('musidoku_db_queries_bucket{view="artists-list",le="+Inf"} 2', body)
+        self.assertIn('musidoku_serializer_duration_seconds_sum{view="artists-list"}', body)
+        # Only API paths are measured
+        self.assertNotIn('view="admin', body)
+
+
+@override_settings(IMAGE_JOB_IN_PROCESS=False, IMAGE_JOB_STALE_SECONDS=300)
+class ImageRefreshJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.artists = [make_artist(f'Imageless {i}', spotify_id=f'{i:022d}') for i in range(5)]
+
+    def setUp(self):
+        self.requested = []
+        self.on_fetch = None
+        patches = [
+            mock.patch('main.utils.MAX_ARTISTS_PER_REQUEST', 2),
+            mock.patch('main.utils.get_spotify_client', return_value=object()),
+            mock.patch('main.utils.fetch_artist_images_batch', side_effect=self.fake_fetch),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def fake_fetch(self, spotify_ids, sp, rate_limiter=None):
+        self.requested.append(sorted(spotify_ids))
+        if self.on_fetch:
+            self.on_fetch(spotify_ids)
+        return {spotify_id: f'https://i.scdn.co/image/{spotify_id}' for spotify_id in spotify_ids}
+
+    def enqueue(self):
+        return enqueue_image_refresh(Artists.objects.filter(pk__in=[artist.pk for artist in self.artists]))
+
+    def test_claims_oldest_pending_job_once(self):
+        first, second = self.enqueue(), self.enqueue()
+        self.assertEqual(claim_next_job().pk, first.pk)
+        self.assertEqual(claim_next_job().pk, second.pk)
+        self.assertIsNone(claim_next_job())
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'running')
+        self.assertIsNotNone(first.heartbeat_at)
+
+    def test_runs_every_artist(self):
+        self.enqueue()
+        job = claim_next_job()
+        run_job(job)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.processed, job.updated, job.failed), (5, 5, 0))
+        self.assertEqual(len(self.requested), 3)
+        self.assertFalse(Artists.objects.filter(cached_image_url__isnull=True).exists())
+
+    def test_stale_running_job_resumes_after_last_batch(self):
+        job = self.enqueue()
+        started = timezone.now() - timedelta(hours=1)
+        ImageRefreshJob.objects.filter(pk=job.pk).update(
+            status='running', processed=2, started_at=started, heartbeat_at=started
+        )
+        job = claim_next_job()
+        self.assertEqual(job.started_at, started)
+        run_job(job)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.processed, 5)
+        requested = sum(self.requested, [])
+        self.assertEqual(requested, sorted(requested))
+        self.assertEqual(len(requested), 3)
+        self.assertNotIn(self.artists[0].spotify_id, requested)
+
+    def test_run_image_jobs_reclaims_stale_running_job(self):
+        job = self.enqueue()
+        stopped = timezone.now() - timedelta(hours=1)
+        ImageRefreshJob.objects.filter(pk=job.pk).update(
+            status='running', processed=2, started_at=stopped, heartbeat_at=stopped
+        )
+        out = StringIO()
+        call_command('run_image_jobs', once=True, stdout=out)
+        self.assertIn(f'Resuming job {job.pk}', out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('completed', 5))
+        self.assertEqual(len(sum(self.requested, [])), 3)
+
+    def test_live_running_job_is_not_claimed(self):
+        job = self.enqueue()
+        ImageRefreshJob.objects.filter(pk=job.pk).update(status='running', heartbeat_at=timezone.now())
+        self.assertIsNone(claim_next_job())
+
+    def test_cancel(self):
+        pending, live, stale = self.enqueue(), self.enqueue(), self.enqueue()
+        now = timezone.now()
+        ImageRefreshJob.objects.filter(pk=live.pk).update(status='running', heartbeat_at=now)
+        ImageRefreshJob.objects.filter(pk=stale.pk).update(status='running', heartbeat_at=now - timedelta(hours=1))
+
+        self.assertEqual(cancel_jobs(ImageRefreshJob.objects.all()), 3)
+        statuses = dict(ImageRefreshJob.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[pending.pk], 'cancelled')
+        self.assertEqual(statuses[stale.pk], 'cancelled')
+        # The live worker stops at its next batch
+        self.assertEqual(statuses[live.pk], 'running')
+        live.refresh_from_db()
+        self.assertTrue(live.cancel_requested)
+        run_job(live)
+        self.assertEqual(live.status, 'cancelled')
+        self.assertEqual(self.requested, [])
+
+    def test_worker_does_not_overwrite_stale_cancel(self):
+        self.enqueue()
+        job = claim_next_job()
+
+        def slow_last_batch(spotify_ids):
+            # The worker was only slow: the job looked stale and was cancelled during its last batch
+            if len(self.requested) == 3:
+                ImageRefreshJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+                cancel_jobs(ImageRefreshJob.objects.all())
+        self.on_fetch = slow_last_batch
+
+        run_job(job)
+        self.assertEqual(job.status, 'cancelled')
@@ -12,6 +12,9 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/today-puzzle/', TodayPuzzleView.as_view(), name='today-puzzle'),
     path('api/validate-guess/', ValidateGuessView.as_view(), name='validate-guess'),
-    path('api/user-submissions/<int:user_id>/<int:puzzle_id>/', UserSubmissionsView.as_view(), name='user-submissions'),
+    path('api/validate-guesses/', ValidateGuessesView.as_view(), name='validate-guesses'),
+    path('api/submissions/export/', SubmissionExportView.as_view(), name='submission-export'),
+    path('api/user-submissions/<str:user_id>/<uuid:puzzle_id>/', UserSubmissionsView.as_view(), name='user-submissions'),
+    path('api/metrics', MetricsView.as_view(), name='metrics'),
     path('api/spotify-auth/', SpotifyAuthURLView.as_view(), name='spotify-auth'),
 ]
\ No newline at end of file
@@ -1,18 +1,79 @@
 import spotipy
+from spotipy.cache_handler import MemoryCacheHandler
 from spotipy.oauth2 import SpotifyClientCredentials
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .metrics import record_spotify_call
+import requests
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_spotify_client():
+# Spotify's "Get Several Artists" endpoint accepts at most 50 IDs
+MAX_ARTISTS_PER_REQUEST = 50
+
+class PooledClientCredentials(SpotifyClientCredentials):
+    """
+    Client credentials manager shared by every thread in the process: the token is
+    kept in memory until it expires and only one thread refreshes it at a time
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._token_lock = threading.Lock()
+
+    def get_access_token(self, *args, **kwargs):
+        with self._token_lock:
+            return super().get_access_token(*args, **kwargs)
+
+
+_client_lock = threading.Lock()
+_credentials_manager = None
+_spotify_clients = {}
+
+def _build_session(retries):
     """
-    Create and return a Spotify client using client credentials flow
+    Keep-alive session with a connection pool sized for our worker threads
+    """
+    session = requests.Session()
+    max_retries = Retry(
+        total=3,
+        status=3,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'POST']),
+    ) if retries else 0
+    pool_size = getattr(settings, 'SPOTIFY_POOL_SIZE', 10)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.hooks['response'].append(_record_spotify_call)
+    return session
+
+def _record_spotify_call(response, *args, **kwargs):
+    # Time to response headers, attributed to the API request being served (if any)
+    record_spotify_call(response.elapsed.total_seconds())
+
+def get_spotify_client(retries=True):
+    """
+    Return the process-wide Spotify client using client credentials flow
     (no user authentication required for public data)
+
+    The client is created once and reused: the OAuth token is cached until it
+    expires and requests go through a pooled keep-alive session with explicit
+    connect/read timeouts. Pass retries=False for a client that surfaces 429s
+    immediately, e.g. when the caller honours Retry-After itself.
     """
+    global _credentials_manager
+
+    client = _spotify_clients.get(retries)
+    if client is not None:
+        return client
+
     try:
-        from django.conf import settings
-        
         # Check if settings are available
         if not hasattr(settings, 'SPOTIPY_CLIENT_ID') or not hasattr(settings, 'SPOTIPY_CLIENT_SECRET'):
             logger.error("Spotify credentials not found in settings")
@@ -22,19 +83,47 @@ def get_spotify_client():
             logger.error("Spotify credentials are empty")
             return None
         
-        client_credentials_manager = SpotifyClientCredentials(
-            client_id=settings.SPOTIPY_CLIENT_ID,
-            client_secret=settings.SPOTIPY_CLIENT_SECRET
+        timeout = (
+            getattr(settings, 'SPOTIFY_CONNECT_TIMEOUT', 3.05),
+            getattr(settings, 'SPOTIFY_READ_TIMEOUT', 10),
         )
-        sp = spotipy.Spotify(client_credentials_manager=client_credentials_manager)
-        return sp
-    except ImportError as e:
-        logger.error(f"Failed to import Spotify modules: {e}")
-        return None
+        with _client_lock:
+            client = _spotify_clients.get(retries)
+            if client is not None:
+                return client
+
+            if _credentials_manager is None:
+                _credentials_manager = PooledClientCredentials(
+                    client_id=settings.SPOTIPY_CLIENT_ID,
+                    client_secret=settings.SPOTIPY_CLIENT_SECRET,
+                    requests_session=_build_session(retries=True),
+                    requests_timeout=timeout,
+                    cache_handler=MemoryCacheHandler(),
+                )
+                # Overridable so the API can be pointed at a local stub server
+                _credentials_manager.OAUTH_TOKEN_URL = settings.SPOTIFY_TOKEN_URL
+
+            client = spotipy.Spotify(
+                client_credentials_manager=_credentials_manager,
+                requests_session=_build_session(retries),
+                requests_timeout=timeout,
+            )
+            client.prefix = settings.SPOTIFY_API_URL
+            _spotify_clients[retries] = client
+            return client
     except Exception as e:
         logger.error(f"Failed to create Spotify client: {e}")
         return None
 
+def reset_spotify_clients():
+    """
+    Drop the shared clients (e.g. after changing Spotify settings)
+    """
+    global _credentials_manager
+    with _client_lock:
+        _spotify_clients.clear()
+        _credentials_manager = None
+
 def fetch_artist_image_from_spotify(spotify_id):
     """
     Fetch the primary image URL for an artist from Spotify API
@@ -95,4 +184,78 @@ def update_artist_image(artist):
         logger.info(f"Updated cached image for artist: {artist.name}")
         return True
     
-    return False
\ No newline at end of file
+    return False
+
+class RateLimiter:
+    """
+    Thread-safe token bucket. `pause()` blocks every caller until a server-provided
+    Retry-After has elapsed.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self.blocked_until:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.blocked_until - now
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.blocked_until
+
+
+def fetch_artist_images_batch(spotify_ids, sp, rate_limiter=None, max_retries=5):
+    """
+    Fetch image URLs for up to 50 artists with a single API request
+
+    Args:
+        spotify_ids (list): Spotify artist IDs (at most MAX_ARTISTS_PER_REQUEST)
+        sp: Spotify client, ideally get_spotify_client(retries=False)
+        rate_limiter (RateLimiter): shared limiter; 429 responses pause it for Retry-After
+        max_retries (int): attempts for 429/5xx responses before giving up
+
+    Returns:
+        dict: spotify_id -> image URL (None when the artist has no image)
+    """
+    for attempt in range(max_retries + 1):
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            response = sp.artists(spotify_ids)
+            break
+        except spotipy.exceptions.SpotifyException as e:
+            retryable = e.http_status == 429 or (e.http_status or 0) >= 500
+            if not retryable or attempt == max_retries:
+                raise
+            retry_after = (e.headers or {}).get('Retry-After')
+            delay = float(retry_after) if retry_after else 2 ** attempt
+            logger.warning(f"Spotify returned {e.http_status}, retrying in {delay}s")
+            if rate_limiter:
+                rate_limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+    images = {}
+    for spotify_id, artist in zip(spotify_ids, response.get('artists') or []):
+        # Unknown IDs come back as null entries
+        artist_images = (artist or {}).get('images') or []
+        images[spotify_id] = artist_images[0]['url'] if artist_images else None
+    return images
\ No newline at end of file
@@ -1,22 +1,31 @@
 from django.shortcuts import render, redirect
 from django.conf import settings
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db.models import Q
-from django.http import HttpResponse
+from django.db import IntegrityError
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from spotipy import SpotifyOAuth
 import spotipy
+import hmac
 from .models import Artists, Categories, Puzzle, GameSubmission
 from .serializers import (
     ArtistSerializer, CategorySerializer, PuzzleSerializer, 
-    GameSubmissionSerializer, ValidateGuessSerializer
+    GameSubmissionSerializer, ValidateGuessSerializer, ValidateGuessesSerializer,
+    ARTIST_VALUE_FIELDS, serialize_artist_values
 )
 
-from .logic import GameValidator, PuzzleManager
+from .logic import PuzzleManager, PUZZLE_CATEGORY_FIELDS
+from .search import get_search_limit, search_artists, suggest_artists
+from .metrics import registry as metrics_registry
+from .pagination import ArtistPagination, PuzzlePagination, SubmissionPagination
+from .exports import EXPORT_FORMATS, export_chunks, iter_submissions, parse_bound
 
 sp_oauth = SpotifyOAuth(
     client_id=settings.SPOTIPY_CLIENT_ID,
@@ -29,7 +38,29 @@ def get_row_categories(puzzle):
     return [puzzle.category_row_1, puzzle.category_row_2, puzzle.category_row_3]
 
 def get_column_categories(puzzle):
-    return [puzzle.category_column_1, puzzle.category_column_2, puzzle.category_column_3]
+    return [puzzle.category_col_1, puzzle.category_col_2, puzzle.category_col_3]
+
+class IsAdminOrMetricsToken(permissions.BasePermission):
+    """
+    Staff users, or a scraper sending `Authorization: Bearer <METRICS_TOKEN>`
+    """
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if not token:
+            return False
+        scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip(), token)
+
+class MetricsView(APIView):
+    """
+    Per-view request histograms in Prometheus text format
+    """
+    permission_classes = [IsAdminOrMetricsToken]
+
+    def get(self, request):
+        return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 class SpotifyAuthURLView(APIView):
     def get(self, request):
@@ -39,6 +70,7 @@ class SpotifyAuthURLView(APIView):
 class ArtistViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Artists.objects.all()
     serializer_class = ArtistSerializer
+    pagination_class = ArtistPagination
     lookup_field = 'slug'
     
     def get_queryset(self):
@@ -46,23 +78,39 @@ class ArtistViewSet(viewsets.ReadOnlyModelViewSet):
         search = self.request.query_params.get('search', None)
         
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(debut_year__icontains=search) |
-                Q(origin_country__icontains=search) |
-                Q(spotify_primary_genre__icontains=search)
-            )
+            return search_artists(queryset, search)
         
-        return queryset.order_by('name')
+        return queryset.order_by('name', 'pk')
+
+    def list(self, request, *args, **kwargs):
+        # Large pages skip ArtistSerializer; the JSON is the same
+        queryset = self.filter_queryset(self.get_queryset()).values(*ARTIST_VALUE_FIELDS)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize_artist_values(page))
+        return Response(serialize_artist_values(queryset))
     
     @action(detail=False, methods=['get'])
     def search_suggestions(self, request):
         query = request.query_params.get('q', '')
-        if len(query) < 2:
+        if len(query.strip()) < 2:
             return Response([])
         
-        artists = Artists.objects.filter(name__icontains=query)[:10]
+        limit = get_search_limit(request.query_params.get('limit'))
+        artists = suggest_artists(query, limit).values(
+            'id', 'slug', 'name', 'roster_number', 'cached_image_url'
+        )
         
-        return Response(list(artists))
+        return Response([
+            {
+                'id': artist['id'],
+                'slug': artist['slug'],
+                'name': artist['name'],
+                'roster_number': artist['roster_number'],
+                'image': artist['cached_image_url'],
+            }
+            for artist in artists
+        ])
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Categories.objects.all()
@@ -70,8 +118,9 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 class PuzzleViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Puzzle.objects.all()
+    queryset = Puzzle.objects.select_related(*PUZZLE_CATEGORY_FIELDS).order_by('puzzle_date')
     serializer_class = PuzzleSerializer
+    pagination_class = PuzzlePagination
     
     @action(detail=True, methods=['get'])
     def valid_artists(self, request, pk=None):
@@ -86,24 +135,55 @@ class PuzzleViewSet(viewsets.ReadOnlyModelViewSet):
         row_category = row_categories[row - 1]
         column_category = column_categories[column - 1]
         
-        valid_artists = GameValidator.get_valid_artists_for_cell(row_category, column_category)
-        serializer = ArtistSerializer(valid_artists, many=True)
+        valid_artists = serialize_artist_values(
+            PuzzleManager.get_valid_artists(puzzle, f"{row},{column}").values(*ARTIST_VALUE_FIELDS)
+        )
         
         return Response({
             'row_category': CategorySerializer(row_category).data,
             'column_category': CategorySerializer(column_category).data,
-            'valid_artists': serializer.data,
-            'count': valid_artists.count()
+            'valid_artists': valid_artists,
+            'count': len(valid_artists)
+        })
+
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        puzzle = self.get_object()
+        try:
+            top = max(1, min(int(request.query_params.get('top', 5)), 50))
+        except ValueError:
+            top = 5
+        return Response({
+            'puzzle_id': puzzle.id,
+            'cells': PuzzleManager.get_puzzle_stats(puzzle, top=top)
+        })
+
+    @action(detail=True, methods=['get'])
+    def pick_rates(self, request, pk=None):
+        puzzle = self.get_object()
+        return Response({
+            'puzzle_id': puzzle.id,
+            'cells': PuzzleManager.get_pick_rates(puzzle)
         })
         
 class TodayPuzzleView(APIView):
     def get(self, request):
-        puzzle = PuzzleManager.get_today_puzzle()
-        if not puzzle:
+        payload = PuzzleManager.get_today_puzzle_payload()
+        if not payload:
             return Response({'error': 'No puzzle available for today.'}, status=status.HTTP_404_NOT_FOUND)
         
-        serializer = PuzzleSerializer(puzzle)
-        return Response(serializer.data)
+        etag = quote_etag(payload['etag'])
+        response = get_conditional_response(
+            request, etag=etag, last_modified=payload['last_modified']
+        ) or Response(payload['data'])
+        
+        # Clients and CDNs revalidate with the ETag after max-age, so edits show
+        # up quickly while unchanged puzzles are answered with 304s
+        max_age = min(settings.TODAY_PUZZLE_MAX_AGE, PuzzleManager.seconds_until_utc_midnight())
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(payload['last_modified'])
+        patch_cache_control(response, public=True, max_age=max_age)
+        return response
 
 class ValidateGuessView(APIView):
     def post(self,request):
@@ -117,36 +197,33 @@ class ValidateGuessView(APIView):
         cell_index = data['cell_index']
         selected_artist_id = data['selected_artist_id']
 
-        puzzle = get_object_or_404(Puzzle, id=puzzle_id, is_active=True)
-        artist = get_object_or_404(Artists, id=selected_artist_id)
+        # Puzzle, categories, answer sets and artist all come from cache, so the
+        # only database work on a hit is the submission insert
+        puzzle = PuzzleManager.get_cached_puzzle(puzzle_id)
+        if puzzle is None or not puzzle.is_active:
+            raise Http404("No active puzzle matches the given query.")
+        artist = PuzzleManager.get_cached_artist(selected_artist_id)
+        if artist is None:
+            raise Http404("No artist matches the given query.")
         
-        row, col = map(int, cell_index.split(','))
+        is_valid, reason = PuzzleManager.check_answer(puzzle, cell_index, artist)
         
-        row_categories = get_row_categories(puzzle)
-        column_categories = get_column_categories(puzzle)
-        
-        row_category = row_categories[row - 1]
-        column_category = column_categories[col - 1]
-        
-        is_valid, reason = GameValidator.validate_artist_for_categories(artist, row_category, column_category)
-        
-        existing_submission = GameSubmission.objects.filter(
-            user_id=user_id, puzzle=puzzle, selected_artist=artist
-        ).first()
-        
-        if existing_submission:
+        # unique_together rejects repeats; no racy pre-check
+        try:
+            submission = GameSubmission.objects.create(
+                user_id=user_id,
+                puzzle=puzzle,
+                cell_index=cell_index,
+                selected_artist=artist,
+                is_correct=is_valid
+            )
+        except IntegrityError:
+            if not GameSubmission.objects.filter(user_id=user_id, puzzle=puzzle, selected_artist=artist).exists():
+                raise
             return Response({
                 'is_valid': False,
                 'reason': 'You have already submitted this artist for this puzzle.'
             }, status=status.HTTP_400_BAD_REQUEST)
-            
-        submission = GameSubmission.objects.create(
-            user_id=user_id,
-            puzzle=puzzle,
-            cell_index=cell_index,
-            selected_artist=artist,
-            is_correct=is_valid
-        )
         
         return Response({
             'is_valid': is_valid,
@@ -155,17 +232,71 @@ class ValidateGuessView(APIView):
             'submission_id': submission.id
         })
     
+class ValidateGuessesView(APIView):
+    """
+    Validate and store up to 9 guesses for one user and puzzle in one request
+    """
+    def post(self, request):
+        serializer = ValidateGuessesSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        puzzle = PuzzleManager.get_cached_puzzle(data['puzzle_id'])
+        if puzzle is None or not puzzle.is_active:
+            raise Http404("No active puzzle matches the given query.")
+
+        guesses = [(guess['cell_index'], guess['selected_artist_id']) for guess in data['guesses']]
+        results = PuzzleManager.submit_guesses(data['user_id'], puzzle, guesses)
+
+        for result in results:
+            if 'artist' in result:
+                result['artist'] = ArtistSerializer(result['artist']).data
+        return Response({'results': results})
+
 class UserSubmissionsView(APIView):
     def get(self, request, user_id, puzzle_id):
         submissions = GameSubmission.objects.filter(
-            user_id=user_id, puzzle_id=puzzle_id).order_by('created_at')
+            user_id=user_id, puzzle_id=puzzle_id).order_by('timestamp', 'id')
 
         serializer = GameSubmissionSerializer(submissions, many=True)
         return Response(serializer.data)
 
+class SubmissionExportView(APIView):
+    """
+    Stream all submissions (optionally for one puzzle and/or a date range) as
+    NDJSON or CSV, gzipped with ?compress=gzip
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        output = params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            return Response({'output': f"Must be one of: {', '.join(EXPORT_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            since = parse_bound(params['since']) if params.get('since') else None
+            until = parse_bound(params['until'], end_of_day=True) if params.get('until') else None
+            rows = iter_submissions(puzzle_id=params.get('puzzle'), since=since, until=until)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        compress = params.get('compress') == 'gzip'
+        response = StreamingHttpResponse(
+            export_chunks(rows, output=output, compress=compress),
+            content_type='application/gzip' if compress else (
+                'text/csv' if output == 'csv' else 'application/x-ndjson'
+            ),
+        )
+        filename = f"submissions.{output}{'.gz' if compress else ''}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
 class GameSubmissionViewSet(viewsets.ModelViewSet):
-    queryset = GameSubmission.objects.all()
+    queryset = GameSubmission.objects.select_related('selected_artist').order_by('timestamp', 'id')
     serializer_class = GameSubmissionSerializer
+    pagination_class = SubmissionPagination
     
     def perform_create(self, serializer):
         user_id = self.request.data.get('user_id')
@@ -63,6 +63,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    'main.middleware.CompressionMiddleware',
+    'main.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -149,6 +151,15 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache (local memory unless CACHE_URL points at e.g. redis://)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+# Saves only clear the cache of the process that made them, so with the local memory
+# cache every entry expires after at most this many seconds. Point CACHE_URL at a
+# shared cache to keep the longer timeouts with multiple workers.
+LOCAL_CACHE_MAX_TIMEOUT = env.int('LOCAL_CACHE_MAX_TIMEOUT', default=30)
+
 # Django REST Framework settings
 # Django REST Framework
 REST_FRAMEWORK = {
@@ -156,7 +167,8 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'main.renderers.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50
@@ -186,4 +198,52 @@ CORS_ALLOW_HEADERS = [
 
 SPOTIPY_CLIENT_ID = env('SPOTIPY_CLIENT_ID')
 SPOTIPY_CLIENT_SECRET = env('SPOTIPY_CLIENT_SECRET')
-SPOTIPY_REDIRECT_URI = env('SPOTIPY_REDIRECT_URI')
\ No newline at end of file
+SPOTIPY_REDIRECT_URI = env('SPOTIPY_REDIRECT_URI')
+
+# Spotify endpoints (override to point at a local stub server in tests/benchmarks)
+SPOTIFY_API_URL = env('SPOTIFY_API_URL', default='https://api.spotify.com/v1/')
+SPOTIFY_TOKEN_URL = env('SPOTIFY_TOKEN_URL', default='https://accounts.spotify.com/api/token')
+SPOTIFY_CONNECT_TIMEOUT = env.float('SPOTIFY_CONNECT_TIMEOUT', default=3.05)
+SPOTIFY_READ_TIMEOUT = env.float('SPOTIFY_READ_TIMEOUT', default=10)
+SPOTIFY_POOL_SIZE = env.int('SPOTIFY_POOL_SIZE', default=10)
+
+# Artist images older than this are served as-is and refreshed in the background
+IMAGE_MAX_AGE_HOURS = env.int('IMAGE_MAX_AGE_HOURS', default=24)
+IMAGE_REFRESH_RATE = env.float('IMAGE_REFRESH_RATE', default=2)
+# Refresh stale images from a thread in each web process. Off by default: schedule
+# `manage.py update_artist_images --stale` instead so web workers never call Spotify
+IMAGE_REFRESH_IN_PROCESS = env.bool('IMAGE_REFRESH_IN_PROCESS', default=False)
+
+# Admin image refresh jobs are run by `manage.py run_image_jobs`, as a long-running
+# worker or from cron with --once; it also resumes jobs whose worker stopped. Only
+# set this to True on a long-lived server process: it starts a worker thread from
+# the request, which serverless deployments (vercel.json) freeze after responding
+IMAGE_JOB_IN_PROCESS = env.bool('IMAGE_JOB_IN_PROCESS', default=False)
+# A running job whose worker hasn't reported progress for this many seconds is
+# resumed by another worker, and cancelling it takes effect immediately
+IMAGE_JOB_STALE_SECONDS = env.int('IMAGE_JOB_STALE_SECONDS', default=300)
+
+# Bearer token a Prometheus scraper can send to read /api/metrics; staff users can always read it
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+# Seconds before the in-memory artist indexes (bitsets, search n-grams) are rebuilt from the database
+ARTIST_INDEX_TTL = env.int('ARTIST_INDEX_TTL', default=300)
+
+# Artist search: 'auto' uses the PostgreSQL trigram indexes when available and the
+# in-process n-gram index otherwise; 'database' or 'memory' force one of them
+ARTIST_SEARCH_BACKEND = env('ARTIST_SEARCH_BACKEND', default='auto')
+ARTIST_SEARCH_DEFAULT_LIMIT = env.int('ARTIST_SEARCH_DEFAULT_LIMIT', default=10)
+ARTIST_SEARCH_MAX_LIMIT = env.int('ARTIST_SEARCH_MAX_LIMIT', default=50)
+
+# Max-age for /api/today-puzzle/ before clients and CDNs revalidate with the ETag
+TODAY_PUZZLE_MAX_AGE = env.int('TODAY_PUZZLE_MAX_AGE', default=300)
+
+# Seconds puzzles, answer sets and artists stay cached for the guess endpoints
+GUESS_CACHE_TIMEOUT = env.int('GUESS_CACHE_TIMEOUT', default=300)
+
+# Only JSON responses under this path are compressed; HTML pages with CSRF tokens never are
+COMPRESSION_PATH_PREFIX = env('COMPRESSION_PATH_PREFIX', default='/api/')
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = env.int('COMPRESSION_MIN_SIZE', default=1024)
+# Brotli quality (0-11) for API responses; higher is smaller but costs more CPU per request
+COMPRESSION_BROTLI_QUALITY = env.int('COMPRESSION_BROTLI_QUALITY', default=5)